@@ -1,8 +1,11 @@
 """Application configuration settings."""
 import os
 from pathlib import Path
+from typing import Optional
 from pydantic_settings import BaseSettings
 
+from app.models.separation import SeparationProfile
+
 
 class Settings(BaseSettings):
     """Application settings with environment variable support."""
@@ -16,17 +19,79 @@ class Settings(BaseSettings):
     temp_dir: Path = base_dir / "temp"
     upload_dir: Path = temp_dir / "uploads"
     output_dir: Path = temp_dir / "outputs"
+    cache_dir: Path = temp_dir / "cache"
 
     # File limits
-    max_file_size_mb: int = 50
-    max_file_size_bytes: int = 50 * 1024 * 1024  # 50MB
+    # Room for hour-long sets (about 640MB as 16-bit stereo WAV); uploads are
+    # written to disk in chunks and long tracks separated in streaming mode
+    max_file_size_mb: int = 700
     supported_formats: list[str] = ["mp3", "wav", "m4a", "flac"]
 
     # Processing
     max_concurrent_jobs: int = 3
+    # "memory" or "sqlite" (shared by all server processes, survives restarts)
+    job_store: str = "memory"
+    job_store_path: Path = temp_dir / "jobs.db"
+    job_store_flush_interval_seconds: float = 1.0  # batching of progress writes
+    # "" runs jobs in the API process; "inprocess" or "redis" hands them to
+    # workers (python -m app.worker), which need the same upload/output dirs
+    job_broker: str = ""
+    redis_url: str = "redis://localhost:6379/0"
+    broker_prefix: str = "vocal-extractor"
+    broker_event_ttl_seconds: int = 86400
+    # A job whose worker stops renewing its lease is submitted again
+    broker_lease_seconds: float = 30.0
+    broker_max_redeliveries: int = 2
+    worker_concurrency: int = 0  # 0 = max_concurrent_jobs
     job_timeout_seconds: int = 600  # 10 minutes
     file_expiry_hours: int = 24
     preview_duration_seconds: int = 30
+    progress_updates_per_second: float = 2.0
+
+    # Queued jobs run shortest predicted time first. A class offset (in
+    # predicted seconds) ranks whole classes, and every second spent waiting
+    # counts as job_aging_rate seconds less work so long jobs still start.
+    job_priority_classes: dict[str, float] = {"interactive": 0.0, "batch": 1800.0}
+    default_priority_class: str = "interactive"
+    job_aging_rate: float = 1.0
+    # Clients (IP address or X-API-Key) share slots by deficit round-robin.
+    # Only keys listed in api_keys identify a client; others count as the IP.
+    api_keys: list[str] = []
+    # Proxies in front of the app that append to X-Forwarded-For (1 behind
+    # the ALB); the client IP is the entry that many hops from the right
+    trusted_proxy_hops: int = 0
+    fair_queue_quantum_seconds: float = 60.0
+    max_concurrent_jobs_per_client: int = 0  # 0 = no limit
+    max_queued_jobs_per_client: int = 0  # 0 = no limit
+
+    # Processing-time predictor (trained online from completed jobs)
+    predictor_prior_seconds_per_audio_second: float = 1.0
+    predictor_default_duration_seconds: float = 240.0
+    predictor_forgetting_factor: float = 0.98
+    # Reject new jobs whose predicted wait exceeds this (0 disables)
+    max_predicted_wait_seconds: float = 0
+
+    # Silent regions are muted instead of separated
+    silence_skip_enabled: bool = True
+    silence_threshold_db: float = -60.0
+    silence_min_duration_seconds: float = 2.0
+    silence_fade_ms: int = 50
+
+    # Longer tracks are decoded in windows so memory stays constant
+    streaming_threshold_seconds: float = 600.0
+
+    # Finished segments are checkpointed so interrupted jobs resume
+    checkpoint_enabled: bool = True
+    checkpoint_interval_segments: int = 8
+    separation_max_retries: int = 1
+
+    # Separation result cache
+    cache_enabled: bool = True
+    cache_max_size_mb: int = 2048
+    cache_eviction_policy: str = "lru"  # "lru" or "lfu"
+    # Separate and cache every model stem, not just the requested ones, so
+    # a later request for another stem of the same input is a hit
+    cache_all_stems: bool = False
 
     # Audio output
     output_format: str = "wav"
@@ -34,6 +99,70 @@ class Settings(BaseSettings):
 
     # Demucs model
     demucs_model: str = "htdemucs"
+    # "inprocess" keeps the model resident, "subprocess" runs `python -m demucs`
+    separation_backend: str = "inprocess"
+    preload_model: bool = True
+    torch_device: str = "cpu"
+    # "eager", "torchscript" or "onnx" (graphs from `python scripts/export_model.py`)
+    inference_backend: str = "eager"
+    exported_model_dir: Path = base_dir / "models"
+
+    # Stems a job can request from the Demucs models
+    available_stems: list[str] = ["drums", "bass", "other", "vocals"]
+
+    # Quality profiles selectable per job
+    default_profile: str = "balanced"
+    # Jobs without a profile fall back to "draft" while more than this many
+    # jobs are waiting for a slot (0 disables the degraded tier)
+    draft_under_load_queued_jobs: int = 0
+    separation_profiles: dict[str, SeparationProfile] = {
+        # Rough mono result at half the sample rate for instant previews
+        "draft": SeparationProfile(shifts=0, overlap=0.05, mono=True, sample_rate=22050),
+        # int8 weights of the default model; DiffQ models such as mdx_extra_q
+        # would need the diffq package, which demucs does not install
+        "fast": SeparationProfile(shifts=0, overlap=0.1, quantize=True),
+        "balanced": SeparationProfile(shifts=1, overlap=0.25),
+        "best": SeparationProfile(model="htdemucs_ft", shifts=2, overlap=0.25),
+    }
+
+    # Separation worker processes. 0 separates in the API process, where
+    # segments of all running jobs share one batcher. A worker process runs
+    # one job at a time, so with workers only a job's own segments batch.
+    separation_workers: int = 0
+    separation_worker_threads: int = 0  # 0 = rebalance the budget across active jobs
+    cpu_thread_budget: int = 0  # 0 = all cores
+    # Benchmark workers x threads splits at startup and keep the fastest
+    thread_autotune: bool = False
+    thread_autotune_splits: list[int] = [1, 2, 4]
+    thread_autotune_segments: int = 4
+
+    # Extraction pipeline stages (decode -> separate -> encode)
+    pipeline_decode_workers: int = 1
+    # 0 = one per separation worker, or max_concurrent_jobs without workers
+    pipeline_separate_workers: int = 0
+    pipeline_encode_workers: int = 1
+    pipeline_queue_size: int = 2
+    # Decoded audio and stems are handed to separation worker processes in
+    # shared memory (None = only when separation_workers > 0)
+    shared_buffers_enabled: Optional[bool] = None
+    shared_buffer_pool_mb: int = 512  # idle buffers kept for reuse
+
+    # Segments from concurrent jobs are batched into one forward pass (see
+    # separation_workers)
+    separation_batch_size: int = 4
+    separation_batch_wait_ms: float = 20.0
+
+    @property
+    def max_file_size_bytes(self) -> int:
+        """Upload size limit in bytes."""
+        return self.max_file_size_mb * 1024 * 1024
+
+    def get_profile(self, name: Optional[str] = None) -> SeparationProfile:
+        """Get a separation profile with its model resolved."""
+        profile = self.separation_profiles[name or self.default_profile]
+        if profile.model is None:
+            profile = profile.model_copy(update={"model": self.demucs_model})
+        return profile
 
     class Config:
         env_file = ".env"
@@ -45,3 +174,4 @@ settings = Settings()
 # Ensure directories exist
 settings.upload_dir.mkdir(parents=True, exist_ok=True)
 settings.output_dir.mkdir(parents=True, exist_ok=True)
+settings.cache_dir.mkdir(parents=True, exist_ok=True)
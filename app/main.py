@@ -1,4 +1,5 @@
 """Main FastAPI application entry point."""
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
@@ -9,7 +10,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.logging_config import logger
 from app.routers import api
+from app.services.broker import InProcessBroker, job_broker
 from app.services.cleanup import cleanup_service
+from app.services.job_manager import job_manager
+from app.services.job_store import job_store
+from app.services.pipeline import extraction_pipeline
+from app.services.separation_engine import SeparationEngineError
+from app.services.shared_buffers import shared_buffers
+from app.services.vocal_extractor import vocal_extractor
+from app.services.worker_pool import separation_pool
+from app.worker import JobWorker
 
 
 @asynccontextmanager
@@ -20,6 +30,35 @@ async def lifespan(app: FastAPI):
     logger.info(f"Upload directory: {settings.upload_dir}")
     logger.info(f"Output directory: {settings.output_dir}")
 
+    # Load the separation model once so the first job does not pay for it;
+    # with an external broker the workers run the jobs instead
+    loop = asyncio.get_running_loop()
+    runs_jobs = job_broker is None or isinstance(job_broker, InProcessBroker)
+    if not runs_jobs:
+        logger.info(f"Handing jobs to workers through {settings.job_broker}")
+    elif separation_pool.enabled:
+        await loop.run_in_executor(None, separation_pool.start)
+    elif settings.separation_backend == "inprocess" and settings.preload_model:
+        try:
+            await loop.run_in_executor(None, vocal_extractor.preload_model)
+        except SeparationEngineError as e:
+            logger.warning(f"Model preload failed, will retry on first job: {e}")
+
+    worker_task = None
+    if isinstance(job_broker, InProcessBroker):
+        worker = JobWorker(job_broker, settings.worker_concurrency or settings.max_concurrent_jobs)
+        worker_task = asyncio.create_task(worker.run())
+
+    # Pick up jobs a previous or crashed process left unfinished
+    job_manager.recover_jobs()
+
+    # Jobs of this process may be cancelled through another one
+    cancel_watch = None
+    if job_store.shared:
+        cancel_watch = asyncio.create_task(
+            job_manager.watch_cancel_requests(settings.job_store_flush_interval_seconds)
+        )
+
     # Start background cleanup task
     await cleanup_service.start_background_cleanup(interval_hours=1.0)
 
@@ -27,6 +66,17 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     await cleanup_service.stop_background_cleanup()
+    if cancel_watch:
+        cancel_watch.cancel()
+    if worker_task:
+        # As before, jobs still running are not waited for
+        worker_task.cancel()
+    await extraction_pipeline.stop()
+    await loop.run_in_executor(None, separation_pool.shutdown)
+    shared_buffers.close()
+    job_store.close()
+    if job_broker:
+        await job_broker.close()
     logger.info(f"Shutting down {settings.app_name}")
 
 # Create FastAPI application
@@ -13,6 +13,7 @@ class JobStatus(str, Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class JobType(str, Enum):
@@ -26,6 +27,11 @@ class Job(BaseModel):
     job_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     job_type: JobType
     status: JobStatus = JobStatus.PENDING
+    profile: Optional[str] = None
+    priority_class: Optional[str] = None
+    client_id: Optional[str] = None
+    preview_only: bool = False
+    stems: list[str] = ["vocals"]
     progress: float = Field(default=0.0, ge=0.0, le=100.0)
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
@@ -35,10 +41,12 @@ class Job(BaseModel):
     input_filename: Optional[str] = None
     input_url: Optional[str] = None
     input_file_path: Optional[str] = None
+    input_duration: Optional[float] = None
 
     # Output information
     output_file_path: Optional[str] = None
     output_filename: Optional[str] = None
+    output_files: dict[str, str] = {}
 
     # Error information
     error_message: Optional[str] = None
@@ -47,6 +55,12 @@ class Job(BaseModel):
     # Processing information
     estimated_duration: Optional[float] = None
     processing_time: Optional[float] = None
+    segments_done: int = 0
+    segments_total: Optional[int] = None
+    eta_seconds: Optional[float] = None
+    silence_skipped_seconds: Optional[float] = None
+    from_cache: bool = False
+    preview_ready: bool = False
 
     def update_status(self, status: JobStatus, progress: float = None) -> None:
         """Update job status and progress."""
@@ -65,6 +79,12 @@ class Job(BaseModel):
         self.error_details = details
         self.updated_at = datetime.now()
 
+    def cancel(self) -> None:
+        """Set job cancelled state."""
+        self.status = JobStatus.CANCELLED
+        self.eta_seconds = None
+        self.updated_at = datetime.now()
+
 
 class AudioFileInfo(BaseModel):
     """Audio file information model."""
@@ -94,7 +114,9 @@ class JobResponse(BaseModel):
     status: JobStatus
     progress: float
     message: Optional[str] = None
+    eta_seconds: Optional[float] = None
     download_url: Optional[str] = None
+    stem_urls: Optional[dict[str, str]] = None
     preview_url: Optional[str] = None
     error: Optional[str] = None
 
@@ -109,6 +131,18 @@ class UploadResponse(BaseModel):
 class YouTubeRequest(BaseModel):
     """Request model for YouTube processing."""
     url: str = Field(..., description="YouTube video URL")
+    profile: Optional[str] = Field(
+        default=None, description="Separation profile (draft, fast, balanced, best)"
+    )
+    priority_class: Optional[str] = Field(
+        default=None, description="Scheduling class (interactive, batch)"
+    )
+    preview_only: bool = Field(
+        default=False, description="Only separate the preview window"
+    )
+    stems: Optional[list[str]] = Field(
+        default=None, description="Stems to keep (drums, bass, other, vocals)"
+    )
 
 
 class ErrorResponse(BaseModel):
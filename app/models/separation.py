@@ -0,0 +1,24 @@
+"""Separation quality profile models."""
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class SeparationProfile(BaseModel):
+    """Named set of Demucs speed/quality settings."""
+    model: Optional[str] = Field(
+        default=None, description="Demucs model name (defaults to DEMUCS_MODEL)"
+    )
+    shifts: int = Field(default=1, ge=0, le=10)
+    overlap: float = Field(default=0.25, ge=0.0, lt=1.0)
+    segment: Optional[float] = Field(
+        default=None, gt=0.0, description="Segment length in seconds (model max if None)"
+    )
+    quantize: bool = Field(
+        default=False, description="Use dynamic int8 quantized CPU inference"
+    )
+    mono: bool = Field(
+        default=False, description="Separate a mono downmix (mono output)"
+    )
+    sample_rate: Optional[int] = Field(
+        default=None, ge=8000, description="Internal sample rate (model rate if None)"
+    )
@@ -1,7 +1,11 @@
 """API endpoints for vocal extraction."""
+import asyncio
+import hashlib
+import hmac
 from datetime import datetime, timedelta
 from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
 from fastapi.responses import FileResponse
 
 from app.config import settings
@@ -10,30 +14,110 @@ from app.models.job import (
     Job, JobType, JobStatus, JobResponse, UploadResponse,
     YouTubeRequest, ErrorResponse
 )
+from app.services.audio_io import probe_duration
 from app.services.file_processor import file_processor, FileProcessorError
 from app.services.youtube_downloader import youtube_downloader, YouTubeDownloaderError
-from app.services.job_manager import job_manager, JobManagerError
+from app.services.job_manager import job_manager, JobManagerError, ClientLimitError
+from app.services.vocal_extractor import vocal_extractor
 
 
 router = APIRouter(prefix="/api", tags=["API"])
 
 
+def _client_id(request: Request) -> str:
+    """
+    Identify the client for fair queuing.
+
+    A configured API key identifies its holder; anyone else is their IP
+    address. Behind trusted proxies the IP is taken from the entry the
+    nearest of them appended to X-Forwarded-For, so clients cannot pick
+    a fresh identity by sending their own header.
+    """
+    api_key = request.headers.get("X-API-Key")
+    if api_key and any(hmac.compare_digest(api_key, key) for key in settings.api_keys):
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    hops = settings.trusted_proxy_hops
+    if hops:
+        forwarded = [
+            host.strip()
+            for header in request.headers.getlist("X-Forwarded-For")
+            for host in header.split(",")
+        ]
+        if len(forwarded) >= hops:
+            return "ip:" + forwarded[-hops]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def _validate_profile(profile: Optional[str]) -> None:
+    """Reject unknown separation profiles."""
+    if profile is not None and profile not in settings.separation_profiles:
+        available = ", ".join(settings.separation_profiles)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown profile. Available: {available}"
+        )
+
+
+def _validate_priority_class(priority_class: Optional[str]) -> None:
+    """Reject unknown scheduling classes."""
+    if priority_class is not None and priority_class not in settings.job_priority_classes:
+        available = ", ".join(settings.job_priority_classes)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown priority class. Available: {available}"
+        )
+
+
+def _parse_stems(stems: Optional[list[str]]) -> list[str]:
+    """Validate requested stems (vocals only if none are given)."""
+    if not stems:
+        return ["vocals"]
+    unknown = [stem for stem in stems if stem not in settings.available_stems]
+    if unknown:
+        available = ", ".join(settings.available_stems)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown stem. Available: {available}"
+        )
+    # Keep request order, drop duplicates
+    return list(dict.fromkeys(stems))
+
+
 @router.post("/upload", response_model=UploadResponse)
 async def upload_file(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
+    request: Request,
+    file: UploadFile = File(...),
+    profile: Optional[str] = Form(None),
+    priority_class: Optional[str] = Form(None),
+    preview_only: bool = Form(False),
+    stems: Optional[str] = Form(None)
 ):
     """
     Upload audio file for vocal extraction.
 
     - Accepts MP3, WAV, M4A, FLAC formats
     - Max file size: 50MB
+    - Optional separation profile (draft, fast, balanced, best)
+    - Optional priority class (interactive, batch)
+    - preview_only stops after the preview window
+    - Optional comma-separated stems (drums, bass, other, vocals)
     - Returns job ID for tracking progress
     """
     # Validate file
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
 
+    _validate_profile(profile)
+    _validate_priority_class(priority_class)
+    requested_stems = _parse_stems(
+        [stem.strip() for stem in stems.split(",") if stem.strip()] if stems else None
+    )
+    client_id = _client_id(request)
+    try:
+        job_manager.check_client_limits(client_id)
+    except ClientLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
     if not file_processor.validate_file_format(file.filename):
         supported = ", ".join(settings.supported_formats)
         raise HTTPException(
@@ -44,7 +128,12 @@ async def upload_file(
     # Create job
     job = job_manager.create_job(
         job_type=JobType.FILE_UPLOAD,
-        input_filename=file.filename
+        input_filename=file.filename,
+        profile=profile,
+        priority_class=priority_class,
+        client_id=client_id,
+        preview_only=preview_only,
+        stems=requested_stems
     )
 
     try:
@@ -54,22 +143,39 @@ async def upload_file(
         )
         job.input_file_path = file_path
 
-        # Start processing in background
-        background_tasks.add_task(
-            job_manager.process_file_upload,
+        # Predict processing time and turn the job away if the wait is too long
+        loop = asyncio.get_running_loop()
+        duration = await loop.run_in_executor(None, probe_duration, Path(file_path))
+        job_manager.estimate_job(job.job_id, duration)
+        job_manager.check_admission(job.job_id)
+
+        # Start processing as soon as a slot is free
+        position = job_manager.enqueue_job(
             job.job_id,
+            job_manager.process_file_upload,
             file_path
         )
 
         return UploadResponse(
             job_id=job.job_id,
-            message="File uploaded successfully. Processing started.",
+            message=(
+                "File uploaded successfully. Processing started." if position == 0
+                else f"File uploaded successfully. Queued at position {position}."
+            ),
             filename=file.filename
         )
 
     except FileProcessorError as e:
         job_manager.set_job_error(job.job_id, str(e))
         raise HTTPException(status_code=400, detail=str(e))
+    except ClientLimitError as e:
+        job_manager.set_job_error(job.job_id, str(e))
+        file_processor.cleanup_job_files(job.job_id)
+        raise HTTPException(status_code=429, detail=str(e))
+    except JobManagerError as e:
+        job_manager.set_job_error(job.job_id, str(e))
+        file_processor.cleanup_job_files(job.job_id)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Upload error: {e}")
         job_manager.set_job_error(job.job_id, "Upload failed")
@@ -77,17 +183,27 @@ async def upload_file(
 
 
 @router.post("/youtube", response_model=UploadResponse)
-async def process_youtube(
-    background_tasks: BackgroundTasks,
-    request: YouTubeRequest
-):
+async def process_youtube(request: YouTubeRequest, http_request: Request):
     """
     Process YouTube URL for vocal extraction.
 
     - Accepts valid YouTube video URLs
     - Downloads audio and extracts vocals
+    - Optional separation profile (draft, fast, balanced, best)
+    - Optional priority class (interactive, batch)
+    - preview_only stops after the preview window
+    - Optional stems (drums, bass, other, vocals)
     - Returns job ID for tracking progress
     """
+    _validate_profile(request.profile)
+    _validate_priority_class(request.priority_class)
+    requested_stems = _parse_stems(request.stems)
+    client_id = _client_id(http_request)
+    try:
+        job_manager.check_client_limits(client_id)
+    except ClientLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
     # Validate URL
     if not youtube_downloader.validate_url(request.url):
         raise HTTPException(
@@ -98,30 +214,46 @@ async def process_youtube(
     # Create job
     job = job_manager.create_job(
         job_type=JobType.YOUTUBE_DOWNLOAD,
-        input_url=request.url
+        input_url=request.url,
+        profile=request.profile,
+        priority_class=request.priority_class,
+        client_id=client_id,
+        preview_only=request.preview_only,
+        stems=requested_stems
     )
 
     try:
         # Get video info first (quick validation)
         video_info = youtube_downloader.get_video_info(request.url)
         job.input_filename = video_info.get("title", "youtube_audio")
+        job_manager.estimate_job(job.job_id, video_info.get("duration"))
+        job_manager.check_admission(job.job_id)
 
-        # Start processing in background
-        background_tasks.add_task(
-            job_manager.process_youtube_download,
+        # Start processing as soon as a slot is free
+        position = job_manager.enqueue_job(
             job.job_id,
+            job_manager.process_youtube_download,
             request.url
         )
 
         return UploadResponse(
             job_id=job.job_id,
-            message="YouTube processing started.",
+            message=(
+                "YouTube processing started." if position == 0
+                else f"YouTube processing queued at position {position}."
+            ),
             filename=video_info.get("title", "youtube_audio")
         )
 
     except YouTubeDownloaderError as e:
         job_manager.set_job_error(job.job_id, str(e))
         raise HTTPException(status_code=400, detail=str(e))
+    except ClientLimitError as e:
+        job_manager.set_job_error(job.job_id, str(e))
+        raise HTTPException(status_code=429, detail=str(e))
+    except JobManagerError as e:
+        job_manager.set_job_error(job.job_id, str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"YouTube processing error: {e}")
         job_manager.set_job_error(job.job_id, "Processing failed")
@@ -134,6 +266,7 @@ async def get_job_status(job_id: str):
     Get job processing status.
 
     - Returns current status and progress
+    - Includes preview URL as soon as the preview window is separated
     - Includes download URL when complete
     """
     job = job_manager.get_job(job_id)
@@ -148,29 +281,66 @@ async def get_job_status(job_id: str):
 
     if job.status == JobStatus.COMPLETED:
         response.download_url = f"/api/download/{job_id}"
+        response.stem_urls = {
+            stem: f"/api/download/{job_id}/{stem}" for stem in job.output_files
+        } or None
         response.preview_url = f"/api/preview/{job_id}"
         response.message = "Processing complete"
     elif job.status == JobStatus.FAILED:
         response.error = job.error_message
         response.message = "Processing failed"
+    elif job.status == JobStatus.CANCELLED:
+        response.message = "Job cancelled"
     elif job.status == JobStatus.PROCESSING:
         response.message = "Extracting vocals..."
+        response.eta_seconds = job.eta_seconds
+        if job.preview_ready:
+            response.preview_url = f"/api/preview/{job_id}"
     elif job.status == JobStatus.DOWNLOADING:
         response.message = "Downloading from YouTube..."
     else:
-        response.message = "Waiting to process..."
+        position = job_manager.get_queue_position(job_id)
+        response.message = (
+            f"Queued at position {position}..." if position else "Waiting to process..."
+        )
+        wait = job_manager.get_estimated_wait_time(job_id) or 0.0
+        if job.estimated_duration is not None:
+            response.eta_seconds = round(wait + job.estimated_duration, 1)
 
     return response
 
 
-@router.get("/download/{job_id}")
-async def download_vocal(job_id: str):
+@router.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
     """
-    Download extracted vocal file.
+    Cancel a job.
 
-    - Only available for completed jobs
-    - Returns WAV file
+    - Stops the running download or separation and frees its slot
+    - Deletes partial files
+    - Fails for jobs that have already finished
+    - Jobs run by another server process are cancelled by that process
+      shortly after
     """
+    try:
+        job = job_manager.cancel_job(job_id)
+    except JobManagerError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return JobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        progress=job.progress,
+        message=(
+            "Job cancelled" if job.status == JobStatus.CANCELLED
+            else "Cancellation requested"
+        )
+    )
+
+
+def _download_response(job_id: str, stem: Optional[str] = None) -> FileResponse:
+    """Build the download response for a job's primary output or one stem."""
     job = job_manager.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -181,13 +351,14 @@ async def download_vocal(job_id: str):
             detail="Job not yet completed"
         )
 
-    if not job.output_file_path:
+    file_path = job.output_files.get(stem) if stem else job.output_file_path
+    if not file_path:
         raise HTTPException(
             status_code=404,
             detail="Output file not found"
         )
 
-    output_path = Path(job.output_file_path)
+    output_path = Path(file_path)
     if not output_path.exists():
         raise HTTPException(
             status_code=404,
@@ -200,7 +371,12 @@ async def download_vocal(job_id: str):
         c for c in (job.input_filename or "audio")
         if c.isalnum() or c in "._- "
     )[:50]
-    filename = f"{safe_name}_vocals_{timestamp}.wav"
+    if stem is None:
+        stem = next(
+            (name for name, path in job.output_files.items() if path == file_path),
+            "vocals"
+        )
+    filename = f"{safe_name}_{stem}_{timestamp}.wav"
 
     return FileResponse(
         path=str(output_path),
@@ -209,18 +385,50 @@ async def download_vocal(job_id: str):
     )
 
 
+@router.get("/download/{job_id}")
+async def download_vocal(job_id: str):
+    """
+    Download extracted vocal file.
+
+    - Only available for completed jobs
+    - Returns WAV file (first requested stem if vocals were not requested)
+    """
+    return _download_response(job_id)
+
+
+@router.get("/download/{job_id}/{stem}")
+async def download_stem(job_id: str, stem: str):
+    """
+    Download one separated stem.
+
+    - Only available for completed jobs that requested the stem
+    - Returns WAV file
+    """
+    if stem not in settings.available_stems:
+        raise HTTPException(status_code=404, detail="Unknown stem")
+    return _download_response(job_id, stem)
+
+
 @router.get("/preview/{job_id}")
 async def preview_vocal(job_id: str):
     """
     Stream preview of extracted vocal.
 
     - Limited to first 30 seconds
-    - Only available for completed jobs
+    - Available while processing once the preview window is separated
     """
     job = job_manager.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
+    # Written by the extractor before the rest of the track is done
+    early_preview_path = vocal_extractor.preview_path(job_id)
+    if job.preview_ready and early_preview_path.exists():
+        return FileResponse(
+            path=str(early_preview_path),
+            media_type="audio/wav"
+        )
+
     if job.status != JobStatus.COMPLETED:
         raise HTTPException(
             status_code=400,
@@ -259,6 +467,18 @@ async def preview_vocal(job_id: str):
     )
 
 
+@router.get("/profiles")
+async def list_profiles() -> dict:
+    """List available separation profiles."""
+    return {
+        "default": settings.default_profile,
+        "profiles": {
+            name: settings.get_profile(name).model_dump()
+            for name in settings.separation_profiles
+        },
+    }
+
+
 @router.get("/stats")
 async def get_stats() -> dict:
     """Get job processing statistics."""
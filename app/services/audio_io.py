@@ -0,0 +1,357 @@
+"""Low-level audio I/O helpers for the separation engine."""
+import json
+import subprocess
+import wave
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from app.services.silence import RMS_FRAME_LENGTH, frame_rms_db
+
+
+class AudioDecodeError(Exception):
+    """Custom exception for audio decoding errors."""
+    pass
+
+
+# Samples per channel written or decoded per chunk
+CHUNK_FRAMES = 441000
+
+
+def probe_duration(path: Path) -> Optional[float]:
+    """
+    Get audio duration in seconds with ffprobe.
+
+    Args:
+        path: Path to audio file
+
+    Returns:
+        Duration in seconds or None if unknown
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "json",
+        str(path)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        return float(json.loads(result.stdout)["format"]["duration"])
+    except (OSError, subprocess.SubprocessError, ValueError, KeyError):
+        return None
+
+
+def decode_to_file(path: Path, dest: Path, samplerate: int, channels: int) -> int:
+    """
+    Decode a file with ffmpeg to raw interleaved float32 PCM on disk.
+
+    Args:
+        path: Source file path
+        dest: Destination raw file path
+        samplerate: Decode sample rate in Hz
+        channels: Decode channel count
+
+    Returns:
+        Length in samples per channel
+
+    Raises:
+        AudioDecodeError: If decoding fails
+    """
+    cmd = [
+        "ffmpeg", "-v", "error", "-nostdin", "-y",
+        "-i", str(path),
+        "-f", "f32le",
+        "-ac", str(channels),
+        "-ar", str(samplerate),
+        str(dest)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError as e:
+        raise AudioDecodeError(f"Failed to start ffmpeg: {e}")
+    if result.returncode != 0 or not dest.exists():
+        raise AudioDecodeError(f"Failed to decode audio: {result.stderr.strip()}")
+    length = dest.stat().st_size // (4 * channels)
+    if length == 0:
+        raise AudioDecodeError(f"Failed to decode audio: {path}")
+    return length
+
+
+def open_decoder(path: Path, samplerate: int, channels: int) -> subprocess.Popen:
+    """
+    Start an ffmpeg process decoding to raw float32 PCM on stdout.
+
+    Args:
+        path: Source file path
+        samplerate: Decode sample rate in Hz
+        channels: Decode channel count
+
+    Returns:
+        Running ffmpeg process
+
+    Raises:
+        AudioDecodeError: If ffmpeg cannot be started
+    """
+    cmd = [
+        "ffmpeg", "-v", "error", "-nostdin",
+        "-i", str(path),
+        "-f", "f32le",
+        "-ac", str(channels),
+        "-ar", str(samplerate),
+        "-"
+    ]
+    try:
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        raise AudioDecodeError(f"Failed to start ffmpeg: {e}")
+
+
+def read_pcm_chunks(path: Path, samplerate: int, channels: int) -> Iterator[np.ndarray]:
+    """
+    Decode a file with ffmpeg chunk by chunk.
+
+    Args:
+        path: Source file path
+        samplerate: Decode sample rate in Hz
+        channels: Decode channel count
+
+    Yields:
+        Arrays of shape (samples, channels), valid until the next chunk
+
+    Raises:
+        AudioDecodeError: If decoding fails
+    """
+    process = open_decoder(path, samplerate, channels)
+    try:
+        while True:
+            data = process.stdout.read(CHUNK_FRAMES * channels * 4)
+            frames = len(data) // (channels * 4)
+            if frames == 0:
+                break
+            samples = np.frombuffer(data[:frames * channels * 4], dtype=np.float32)
+            yield samples.reshape(frames, channels)
+    except GeneratorExit:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode != 0:
+        raise AudioDecodeError(f"Failed to decode audio: {path}")
+
+
+class DecodedAudio:
+    """Track fully decoded into memory."""
+
+    def __init__(self, path: Path, wav: torch.Tensor, samplerate: int):
+        """
+        Initialize decoded audio.
+
+        Args:
+            path: Source file path
+            wav: Tensor of shape (channels, samples)
+            samplerate: Sample rate in Hz
+        """
+        self.path = path
+        self.samplerate = samplerate
+        self.channels, self.length = wav.shape
+        mono = wav.mean(0)
+        self.mean = mono.mean().item()
+        self.std = mono.std().item() + 1e-8
+        self.rms_db = frame_rms_db(mono)
+        # Normalized per window, so a mapped or shared input is never copied
+        self._wav = wav
+
+    @classmethod
+    def from_raw(
+        cls,
+        path: Path,
+        raw_path: Path,
+        samplerate: int,
+        channels: int
+    ) -> "DecodedAudio":
+        """
+        Open audio decoded ahead of time by decode_to_file.
+
+        Args:
+            path: Source file path
+            raw_path: Raw float32 PCM file
+            samplerate: Sample rate of the raw file
+            channels: Channel count of the raw file
+
+        Returns:
+            DecodedAudio reading the memory-mapped samples
+        """
+        samples = np.memmap(raw_path, dtype=np.float32, mode="c")
+        wav = torch.from_numpy(samples.reshape(-1, channels)).t()
+        return cls(path, wav, samplerate)
+
+    def window(self, start: int, length: int) -> torch.Tensor:
+        """Normalized, zero-padded segment (start may lie outside the track)."""
+        lo, hi = max(start, 0), min(start + length, self.length)
+        # Same normalization as the demucs CLI
+        segment = (self._wav[..., lo:hi] - self.mean) / self.std
+        pad_left = lo - start
+        pad_right = length - pad_left - segment.shape[-1]
+        if pad_left or pad_right:
+            segment = F.pad(segment, (pad_left, pad_right))
+        return segment
+
+    def close(self) -> None:
+        """Release decoded samples."""
+        self._wav = None
+
+
+class StreamingAudio:
+    """
+    Track decoded by ffmpeg on demand.
+
+    A first pass computes length, normalization statistics and RMS frames
+    without keeping samples. Windows must then be requested in increasing
+    order; only the samples still needed are kept in memory.
+    """
+
+    def __init__(self, path: Path, samplerate: int, channels: int):
+        """
+        Initialize streaming audio and run the statistics pass.
+
+        Args:
+            path: Source file path
+            samplerate: Decode sample rate in Hz
+            channels: Decode channel count
+        """
+        self.path = path
+        self.samplerate = samplerate
+        self.channels = channels
+        self._process: Optional[subprocess.Popen] = None
+        self._buffer = torch.zeros(channels, 0)
+        self._buffer_start = 0
+        self._scan()
+
+    def _open(self) -> subprocess.Popen:
+        """Start an ffmpeg process decoding to raw float32 PCM."""
+        return open_decoder(self.path, self.samplerate, self.channels)
+
+    def _read_chunk(self, process: subprocess.Popen) -> Optional[torch.Tensor]:
+        """Read the next chunk as a (channels, samples) tensor, None at EOF."""
+        data = process.stdout.read(CHUNK_FRAMES * self.channels * 4)
+        frames = len(data) // (self.channels * 4)
+        if frames == 0:
+            return None
+        samples = np.frombuffer(data[:frames * self.channels * 4], dtype=np.float32)
+        return torch.from_numpy(samples.copy()).view(frames, self.channels).t()
+
+    def _scan(self) -> None:
+        """Decode once to compute length, mean, std and RMS frames."""
+        process = self._open()
+        length = 0
+        total = 0.0
+        total_sq = 0.0
+        rms_frames = []
+        leftover = torch.zeros(0)
+        try:
+            while True:
+                chunk = self._read_chunk(process)
+                if chunk is None:
+                    break
+                mono = chunk.mean(0).double()
+                length += mono.shape[-1]
+                total += mono.sum().item()
+                total_sq += mono.pow(2).sum().item()
+
+                mono = torch.cat([leftover, mono.float()])
+                usable = mono.shape[-1] - mono.shape[-1] % RMS_FRAME_LENGTH
+                rms_frames.append(frame_rms_db(mono[:usable]))
+                leftover = mono[usable:]
+        finally:
+            process.stdout.close()
+            process.wait()
+
+        if process.returncode != 0 or length == 0:
+            raise AudioDecodeError(f"Failed to decode audio: {self.path}")
+
+        self.length = length
+        self.mean = total / length
+        variance = max(total_sq / length - self.mean ** 2, 0.0) * length / max(length - 1, 1)
+        self.std = variance ** 0.5 + 1e-8
+        self.rms_db = torch.cat(rms_frames) if rms_frames else torch.zeros(0)
+
+    def window(self, start: int, length: int) -> torch.Tensor:
+        """Normalized, zero-padded segment; starts must not decrease."""
+        if self._process is None:
+            self._process = self._open()
+
+        lo, hi = max(start, 0), min(start + length, self.length)
+        while self._buffer_start + self._buffer.shape[-1] < hi:
+            chunk = self._read_chunk(self._process)
+            if chunk is None:
+                break
+            self._buffer = torch.cat([self._buffer, chunk], dim=-1)
+            # Drop samples no later window needs
+            drop = min(lo - self._buffer_start, self._buffer.shape[-1])
+            if drop > 0:
+                self._buffer = self._buffer[:, drop:]
+                self._buffer_start += drop
+
+        segment = self._buffer[:, lo - self._buffer_start:hi - self._buffer_start]
+        segment = (segment - self.mean) / self.std
+        pad_left = lo - start
+        pad_right = length - pad_left - segment.shape[-1]
+        if pad_left or pad_right:
+            segment = F.pad(segment, (pad_left, pad_right))
+        return segment
+
+    def close(self) -> None:
+        """Stop the decoder process."""
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+        self._buffer = torch.zeros(self.channels, 0)
+
+
+def to_pcm16(audio: torch.Tensor, scale: float = 1.0) -> bytes:
+    """
+    Convert float audio to interleaved 16-bit PCM bytes.
+
+    Args:
+        audio: Tensor of shape (channels, samples)
+        scale: Gain applied before quantization
+
+    Returns:
+        Interleaved little-endian PCM data
+    """
+    pcm = (audio * scale).clamp(-1, 1).mul(32767).round().to(torch.int16)
+    return pcm.t().contiguous().numpy().tobytes()
+
+
+def write_wav(path: Path, audio: torch.Tensor, samplerate: int) -> None:
+    """
+    Write audio as a 16-bit WAV file through one buffered file handle.
+
+    Audio is converted in chunks so memory-mapped input is never fully
+    materialized, and rescaled (not clipped) if it exceeds full scale,
+    matching the demucs CLI default.
+
+    Args:
+        path: Destination file path
+        audio: Tensor of shape (channels, samples)
+        samplerate: Sample rate in Hz
+    """
+    length = audio.shape[-1]
+    peak = 0.0
+    for offset in range(0, length, CHUNK_FRAMES):
+        peak = max(peak, audio[..., offset:offset + CHUNK_FRAMES].abs().max().item())
+    scale = 1.0 / (1.01 * peak) if peak > 1.0 else 1.0
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(audio.shape[0])
+        f.setsampwidth(2)
+        f.setframerate(samplerate)
+        f.setnframes(length)
+        for offset in range(0, length, CHUNK_FRAMES):
+            f.writeframesraw(to_pcm16(audio[..., offset:offset + CHUNK_FRAMES], scale))
@@ -0,0 +1,403 @@
+"""Pluggable job broker between the API and worker processes."""
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
+
+from app.config import settings
+from app.logging_config import logger
+
+
+class BrokerError(Exception):
+    """Custom exception for job broker errors."""
+    pass
+
+
+# States reported by JobBroker.job_state
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_LOST = "lost"
+
+
+class JobBroker(ABC):
+    """
+    Interface of a job broker.
+
+    The API submits job messages ({"job", "handler", "args"}) and reads
+    each job's events, which are job snapshots published by the worker
+    running it. A worker holds a lease on every job it takes and renews
+    it while the job runs; a job that is neither queued nor leased was
+    lost with its worker and can be submitted again. Cancellations go the
+    other way: workers listen for them and can also ask whether a job was
+    cancelled before it was picked up.
+    """
+
+    def __init__(self, lease_seconds: float = 30.0):
+        """
+        Initialize broker.
+
+        Args:
+            lease_seconds: Time a worker's claim on a job lasts unless renewed
+        """
+        self.lease_seconds = lease_seconds
+
+    @abstractmethod
+    async def submit_job(self, message: dict) -> None:
+        """Queue a job message for the workers."""
+
+    @abstractmethod
+    async def next_job(self, timeout: float) -> Optional[dict]:
+        """
+        Take the next job message and a lease on it.
+
+        Args:
+            timeout: Seconds to wait for one
+
+        Returns:
+            Job message or None if none arrived in time
+        """
+
+    @abstractmethod
+    async def renew_lease(self, job_id: str) -> None:
+        """Extend this worker's lease on a running job."""
+
+    @abstractmethod
+    async def finish_job(self, job_id: str) -> None:
+        """Release a taken job once its final event is published."""
+
+    @abstractmethod
+    async def job_state(self, job_id: str) -> str:
+        """Check if a submitted job is queued, running or lost."""
+
+    @abstractmethod
+    async def remove_job(self, job_id: str) -> None:
+        """Drop every message of a job (before it is submitted again)."""
+
+    @abstractmethod
+    async def publish_event(self, job_id: str, event: dict) -> None:
+        """Publish a job snapshot to the job's event stream."""
+
+    @abstractmethod
+    def events(self, job_id: str, timeout: float) -> AsyncIterator[Optional[dict]]:
+        """
+        Iterate over a job's events in order, waiting for new ones.
+
+        Yields None whenever no event arrived for timeout seconds.
+        """
+
+    @abstractmethod
+    async def cancel_job(self, job_id: str) -> None:
+        """Tell the workers a job was cancelled."""
+
+    @abstractmethod
+    async def is_cancelled(self, job_id: str) -> bool:
+        """Check if a job was cancelled."""
+
+    @abstractmethod
+    def cancellations(self) -> AsyncIterator[str]:
+        """Iterate over IDs of jobs cancelled from now on."""
+
+    async def close(self) -> None:
+        """Release the broker's connections."""
+        pass
+
+
+class InProcessBroker(JobBroker):
+    """
+    Broker on asyncio queues, for a worker running in the API process.
+
+    Must be used from a single event loop. A job's event queue exists
+    from its submission until its reader stops; events published outside
+    that window are dropped.
+    """
+
+    def __init__(self, lease_seconds: float = 30.0):
+        """Initialize in-process broker."""
+        super().__init__(lease_seconds)
+        self._jobs: Optional[asyncio.Queue] = None
+        self._queued: set[str] = set()
+        self._leases: dict[str, float] = {}
+        self._events: dict[str, asyncio.Queue] = {}
+        self._cancelled: set[str] = set()
+        self._listeners: list[asyncio.Queue] = []
+
+    def _job_queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running loop
+        if self._jobs is None:
+            self._jobs = asyncio.Queue()
+        return self._jobs
+
+    async def submit_job(self, message: dict) -> None:
+        """Queue a job message for the workers."""
+        job_id = message["job"]["job_id"]
+        self._events.setdefault(job_id, asyncio.Queue())
+        self._queued.add(job_id)
+        await self._job_queue().put(message)
+
+    async def next_job(self, timeout: float) -> Optional[dict]:
+        """Take the next job message, or None after timeout seconds."""
+        while True:
+            try:
+                message = await asyncio.wait_for(self._job_queue().get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            job_id = message["job"]["job_id"]
+            if job_id in self._queued:
+                self._queued.discard(job_id)
+                self._leases[job_id] = time.monotonic() + self.lease_seconds
+                return message
+            # Removed while queued
+
+    async def renew_lease(self, job_id: str) -> None:
+        """Extend this worker's lease on a running job."""
+        self._leases[job_id] = time.monotonic() + self.lease_seconds
+
+    async def finish_job(self, job_id: str) -> None:
+        """Release a taken job once its final event is published."""
+        self._leases.pop(job_id, None)
+        self._cancelled.discard(job_id)
+
+    async def job_state(self, job_id: str) -> str:
+        """Check if a submitted job is queued, running or lost."""
+        if self._leases.get(job_id, 0.0) > time.monotonic():
+            return JOB_RUNNING
+        return JOB_QUEUED if job_id in self._queued else JOB_LOST
+
+    async def remove_job(self, job_id: str) -> None:
+        """Drop every message of a job (before it is submitted again)."""
+        self._queued.discard(job_id)
+        self._leases.pop(job_id, None)
+
+    async def publish_event(self, job_id: str, event: dict) -> None:
+        """Publish a job snapshot to the job's event stream."""
+        queue = self._events.get(job_id)
+        if queue is not None:
+            queue.put_nowait(event)
+
+    async def events(self, job_id: str, timeout: float) -> AsyncIterator[Optional[dict]]:
+        """Iterate over a job's events, yielding None after timeout seconds without one."""
+        queue = self._events.setdefault(job_id, asyncio.Queue())
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._events.pop(job_id, None)
+
+    async def cancel_job(self, job_id: str) -> None:
+        """Tell the workers a job was cancelled."""
+        if job_id in self._queued:
+            # Never picked up; no worker has to hear about it
+            self._queued.discard(job_id)
+            return
+        self._cancelled.add(job_id)
+        for listener in self._listeners:
+            listener.put_nowait(job_id)
+
+    async def is_cancelled(self, job_id: str) -> bool:
+        """Check if a job was cancelled."""
+        return job_id in self._cancelled
+
+    async def cancellations(self) -> AsyncIterator[str]:
+        """Iterate over IDs of jobs cancelled from now on."""
+        listener: asyncio.Queue = asyncio.Queue()
+        self._listeners.append(listener)
+        try:
+            while True:
+                yield await listener.get()
+        finally:
+            self._listeners.remove(listener)
+
+
+class RedisBroker(JobBroker):
+    """
+    Broker on a Redis-protocol server, for workers on other hosts.
+
+    Jobs are a list the workers move messages from into a processing
+    list, so a job taken by a worker that dies stays visible until the
+    API removes it and submits it again. A worker's lease is a key that
+    expires unless renewed. Each job's events are a list of their own, so
+    none are lost if the API reads them late, and they expire after the
+    event TTL. Cancellations are published on a channel and also recorded
+    in an expiring key for jobs still in the queue.
+
+    Works with redis-py's asyncio client or a compatible one such as
+    fakeredis.aioredis.FakeRedis.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "vocal-extractor",
+        event_ttl: int = 86400,
+        lease_seconds: float = 30.0,
+        client=None
+    ):
+        """
+        Initialize Redis broker.
+
+        Args:
+            url: Server URL (redis://host:port/db)
+            prefix: Prefix of every key and channel
+            event_ttl: Seconds event lists and cancellation marks are kept
+            lease_seconds: Time a worker's claim on a job lasts unless renewed
+            client: Async client to use instead of connecting to url
+        """
+        super().__init__(lease_seconds)
+        self.url = url
+        self.prefix = prefix
+        self.event_ttl = event_ttl
+        self._client = client
+        # Raw messages this worker took, to remove them from processing
+        self._taken: dict[str, str] = {}
+
+    @property
+    def client(self):
+        """Async client, connected on first use."""
+        if self._client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise BrokerError(
+                    "JOB_BROKER=redis requires the redis package (pip install redis)"
+                )
+            self._client = redis.from_url(self.url)
+        return self._client
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix,) + parts)
+
+    @property
+    def _lease_ms(self) -> int:
+        return max(1, int(self.lease_seconds * 1000))
+
+    async def submit_job(self, message: dict) -> None:
+        """Queue a job message for the workers."""
+        await self.client.lpush(self._key("jobs"), json.dumps(message))
+
+    async def next_job(self, timeout: float) -> Optional[dict]:
+        """Take the next job message, or None after timeout seconds."""
+        raw = await self.client.blmove(
+            self._key("jobs"), self._key("processing"), max(1, int(timeout)),
+            src="RIGHT", dest="LEFT"
+        )
+        if raw is None:
+            return None
+        message = json.loads(raw)
+        job_id = message["job"]["job_id"]
+        self._taken[job_id] = raw
+        await self.client.set(self._key("lease", job_id), 1, px=self._lease_ms)
+        return message
+
+    async def renew_lease(self, job_id: str) -> None:
+        """Extend this worker's lease on a running job."""
+        await self.client.set(self._key("lease", job_id), 1, px=self._lease_ms)
+
+    async def finish_job(self, job_id: str) -> None:
+        """Release a taken job once its final event is published."""
+        raw = self._taken.pop(job_id, None)
+        async with self.client.pipeline(transaction=True) as pipe:
+            if raw is not None:
+                pipe.lrem(self._key("processing"), 1, raw)
+            pipe.delete(self._key("lease", job_id), self._key("cancelled", job_id))
+            await pipe.execute()
+
+    async def _messages_of(self, key: str, job_id: str) -> list:
+        """Raw messages of a job in a list."""
+        return [
+            raw for raw in await self.client.lrange(key, 0, -1)
+            if json.loads(raw)["job"]["job_id"] == job_id
+        ]
+
+    async def job_state(self, job_id: str) -> str:
+        """Check if a submitted job is queued, running or lost."""
+        if await self.client.exists(self._key("lease", job_id)):
+            return JOB_RUNNING
+        if await self._messages_of(self._key("jobs"), job_id):
+            return JOB_QUEUED
+        return JOB_LOST
+
+    async def remove_job(self, job_id: str) -> None:
+        """Drop every message of a job (before it is submitted again)."""
+        for name in ("jobs", "processing"):
+            key = self._key(name)
+            for raw in await self._messages_of(key, job_id):
+                await self.client.lrem(key, 0, raw)
+        await self.client.delete(self._key("lease", job_id))
+
+    async def publish_event(self, job_id: str, event: dict) -> None:
+        """Publish a job snapshot to the job's event stream."""
+        key = self._key("events", job_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, json.dumps(event))
+            pipe.expire(key, self.event_ttl)
+            await pipe.execute()
+
+    async def events(self, job_id: str, timeout: float) -> AsyncIterator[Optional[dict]]:
+        """Iterate over a job's events, yielding None after timeout seconds without one."""
+        key = self._key("events", job_id)
+        try:
+            while True:
+                item = await self.client.blpop(key, timeout=max(1, int(timeout)))
+                yield json.loads(item[1]) if item else None
+        finally:
+            # Events published after the reader stopped are never read
+            await self.client.delete(key)
+
+    async def cancel_job(self, job_id: str) -> None:
+        """Tell the workers a job was cancelled."""
+        await self.client.set(self._key("cancelled", job_id), 1, ex=self.event_ttl)
+        await self.client.publish(self._key("cancel"), job_id)
+
+    async def is_cancelled(self, job_id: str) -> bool:
+        """Check if a job was cancelled."""
+        return bool(await self.client.exists(self._key("cancelled", job_id)))
+
+    async def cancellations(self) -> AsyncIterator[str]:
+        """Iterate over IDs of jobs cancelled from now on."""
+        channel = self._key("cancel")
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = message["data"]
+                yield data.decode() if isinstance(data, bytes) else data
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_broker() -> Optional[JobBroker]:
+    """
+    Create the job broker selected in settings.
+
+    Returns:
+        JobBroker, or None if jobs run in the API process
+    """
+    if settings.job_broker == "inprocess":
+        return InProcessBroker(settings.broker_lease_seconds)
+    if settings.job_broker == "redis":
+        return RedisBroker(
+            settings.redis_url,
+            settings.broker_prefix,
+            settings.broker_event_ttl_seconds,
+            settings.broker_lease_seconds
+        )
+    if settings.job_broker:
+        logger.warning(f"Unknown job broker {settings.job_broker!r}; running jobs in process")
+    return None
+
+
+# Singleton instance
+job_broker = create_broker()
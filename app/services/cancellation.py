@@ -0,0 +1,93 @@
+"""Cooperative job cancellation shared with separation worker processes."""
+import ctypes
+import threading
+
+
+class JobCancelledError(Exception):
+    """Raised by long-running work when its job has been cancelled."""
+    pass
+
+
+class CancellationRegistry:
+    """
+    Tracks cancelled jobs for work that polls between steps.
+
+    The API process keeps a local set. Worker processes cannot see it, so
+    cancelled job IDs are also written into a small shared ring buffer
+    that the worker initializer attaches to. Old entries are overwritten;
+    a slot only has to outlive the few seconds a job takes to notice.
+    """
+
+    SLOTS = 64
+    ID_LENGTH = 36  # uuid4 string
+
+    def __init__(self):
+        """Initialize cancellation registry."""
+        self._cancelled: set[str] = set()
+        self._shared = None
+        self._next_slot = 0
+        self._lock = threading.Lock()
+
+    def create_array(self, context):
+        """
+        Create the shared ring buffer for worker processes (once).
+
+        Args:
+            context: multiprocessing context the workers are started with
+
+        Returns:
+            Shared array to pass to the worker initializer
+        """
+        if self._shared is None:
+            self._shared = context.Array(ctypes.c_char, self.SLOTS * self.ID_LENGTH)
+        return self._shared
+
+    def attach(self, shared) -> None:
+        """Use a shared ring buffer created by the parent (in a worker)."""
+        self._shared = shared
+
+    def cancel(self, job_id: str) -> None:
+        """Mark a job as cancelled."""
+        with self._lock:
+            self._cancelled.add(job_id)
+            if self._shared is None:
+                return
+            encoded = job_id.encode()[:self.ID_LENGTH].ljust(self.ID_LENGTH, b"\0")
+            offset = self._next_slot * self.ID_LENGTH
+            self._next_slot = (self._next_slot + 1) % self.SLOTS
+        with self._shared.get_lock():
+            self._shared[offset:offset + self.ID_LENGTH] = encoded
+
+    def is_cancelled(self, job_id: str) -> bool:
+        """Check if a job has been cancelled."""
+        if job_id in self._cancelled:
+            return True
+        if self._shared is None:
+            return False
+        encoded = job_id.encode()[:self.ID_LENGTH].ljust(self.ID_LENGTH, b"\0")
+        # Copy under the lock so a slot being written is never seen half done
+        with self._shared.get_lock():
+            raw = self._shared.raw
+        return any(
+            raw[offset:offset + self.ID_LENGTH] == encoded
+            for offset in range(0, len(raw), self.ID_LENGTH)
+        )
+
+    def check(self, job_id: str) -> None:
+        """
+        Stop a job's work if it has been cancelled.
+
+        Raises:
+            JobCancelledError: If the job has been cancelled
+        """
+        if self.is_cancelled(job_id):
+            raise JobCancelledError(f"Job {job_id} was cancelled")
+
+    def clear(self, job_id: str) -> None:
+        """Forget a finished job (its shared slot ages out)."""
+        with self._lock:
+            self._cancelled.discard(job_id)
+
+
+# Singleton instance
+cancellation = CancellationRegistry()
@@ -0,0 +1,143 @@
+"""Chunk-level checkpoints for resumable separations."""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import torch
+
+from app.logging_config import logger
+
+
+class SeparationCheckpoint:
+    """
+    Persists the progress of one separation run.
+
+    The checkpoint directory holds:
+      - output.npy: memory-mapped output; samples before `committed` are final
+      - carry-{n}.pt: overlap-add accumulator for samples not yet final
+      - manifest.json: fingerprint of the run and the next segment index
+
+    The manifest is replaced atomically after its carry file is written, so a
+    crash at any point leaves either the previous or the new checkpoint.
+    """
+
+    MANIFEST_FILENAME = "manifest.json"
+    OUTPUT_FILENAME = "output.npy"
+
+    def __init__(self, directory: Path, fingerprint: dict):
+        """
+        Initialize checkpoint.
+
+        Args:
+            directory: Checkpoint directory for this job
+            fingerprint: Parameters that must match for a resume to be valid
+        """
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self._carry_file: Optional[str] = None
+
+    @property
+    def _manifest_path(self) -> Path:
+        return self.directory / self.MANIFEST_FILENAME
+
+    @property
+    def _output_path(self) -> Path:
+        return self.directory / self.OUTPUT_FILENAME
+
+    def load(self) -> Optional[dict]:
+        """
+        Load a previous checkpoint of the same run.
+
+        Returns:
+            Dict with next_index, committed, acc and weight, or None
+        """
+        if not self._manifest_path.exists() or not self._output_path.exists():
+            return None
+        try:
+            with open(self._manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("fingerprint") != self.fingerprint:
+                logger.info(f"Discarding stale checkpoint: {self.directory}")
+                self.clear()
+                return None
+            carry = torch.load(self.directory / manifest["carry_file"])
+        except (OSError, ValueError, KeyError, RuntimeError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.directory}: {e}")
+            self.clear()
+            return None
+
+        self._carry_file = manifest["carry_file"]
+        logger.info(
+            f"Resuming from checkpoint at segment {manifest['next_index']} "
+            f"({self.directory})"
+        )
+        return {
+            "next_index": manifest["next_index"],
+            "committed": manifest["committed"],
+            "acc": carry["acc"],
+            "weight": carry["weight"],
+        }
+
+    def open_output(self, shape: tuple, resume: bool) -> np.memmap:
+        """
+        Open the memory-mapped output buffer.
+
+        Args:
+            shape: Output shape (stems, channels, samples)
+            resume: Reuse the existing buffer instead of creating a new one
+
+        Returns:
+            float32 memmap of the given shape
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if resume:
+            return np.lib.format.open_memmap(self._output_path, mode="r+")
+        return np.lib.format.open_memmap(
+            self._output_path, mode="w+", dtype=np.float32, shape=shape
+        )
+
+    def save(
+        self,
+        output: np.memmap,
+        next_index: int,
+        committed: int,
+        acc: torch.Tensor,
+        weight: torch.Tensor
+    ) -> None:
+        """
+        Record that segments before next_index are done.
+
+        Args:
+            output: Output memmap to flush
+            next_index: Index of the first unfinished segment
+            committed: Samples before this offset are final in the output
+            acc: Overlap-add accumulator starting at committed
+            weight: Accumulated window weights starting at committed
+        """
+        output.flush()
+
+        carry_file = f"carry-{next_index}.pt"
+        torch.save({"acc": acc, "weight": weight}, self.directory / carry_file)
+
+        manifest = {
+            "fingerprint": self.fingerprint,
+            "next_index": next_index,
+            "committed": committed,
+            "carry_file": carry_file,
+        }
+        tmp_path = self._manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+        if self._carry_file and self._carry_file != carry_file:
+            (self.directory / self._carry_file).unlink(missing_ok=True)
+        self._carry_file = carry_file
+
+    def clear(self) -> None:
+        """Delete the checkpoint directory."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._carry_file = None
@@ -0,0 +1,34 @@
+"""Advisory file locks for state shared by several processes."""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive lock on a file's sidecar .lock file.
+
+    Processes sharing a directory (server processes, workers on a shared
+    volume) use it to read-modify-write state files without losing each
+    other's updates. Without fcntl (Windows) only threads are serialized,
+    by the callers' own locks.
+
+    Args:
+        path: State file to lock
+    """
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
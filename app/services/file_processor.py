@@ -22,6 +22,7 @@ class FileProcessor:
 
     SUPPORTED_FORMATS = settings.supported_formats
     MAX_FILE_SIZE = settings.max_file_size_bytes
+    UPLOAD_CHUNK_SIZE = 1024 * 1024
 
     def __init__(self):
         """Initialize file processor."""
@@ -67,6 +68,9 @@ class FileProcessor:
         """
         Save uploaded file to disk.
 
+        The file is copied in chunks and rejected as soon as it exceeds the
+        size limit, so large uploads are never held in memory.
+
         Args:
             file: Uploaded file object
             job_id: Job ID for creating unique filename
@@ -89,19 +93,21 @@ class FileProcessor:
         safe_filename = f"{job_id}.{extension}"
         file_path = self.upload_dir / safe_filename
 
-        # Read and validate size
-        content = await file.read()
-        file_size = len(content)
+        # Save file, validating its size as it arrives
+        file_size = 0
+        async with aiofiles.open(file_path, "wb") as f:
+            while chunk := await file.read(self.UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > self.MAX_FILE_SIZE:
+                    break
+                await f.write(chunk)
 
         if not self.validate_file_size(file_size):
+            file_path.unlink(missing_ok=True)
             raise FileProcessorError(
                 f"File size exceeds limit of {settings.max_file_size_mb}MB"
             )
 
-        # Save file
-        async with aiofiles.open(file_path, "wb") as f:
-            await f.write(content)
-
         logger.info(f"Saved uploaded file: {file_path} ({file_size} bytes)")
         return str(file_path), file_size
 
@@ -0,0 +1,348 @@
+"""Pluggable inference backends for Demucs segment forward passes."""
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import torch
+import torch.nn.functional as F
+from demucs.apply import apply_model, BagOfModels
+from demucs.pretrained import get_model
+
+from app.config import settings
+from app.logging_config import logger
+
+
+class InferenceBackendError(Exception):
+    """Custom exception for inference backend errors."""
+    pass
+
+
+BACKEND_EXTENSIONS = {"torchscript": ".ts", "onnx": ".onnx"}
+
+
+def segment_seconds(model: torch.nn.Module) -> float:
+    """Longest segment (in seconds) every sub-model can take in one pass."""
+    if isinstance(model, BagOfModels):
+        return min(float(sub_model.segment) for sub_model in model.models)
+    return float(model.segment)
+
+
+def quantize_model(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Apply dynamic int8 quantization to linear and recurrent layers.
+
+    Weights are stored as int8 and activations quantized on the fly, which
+    speeds up the transformer and LSTM layers on CPU. Convolutions stay in
+    float.
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        model,
+        {torch.nn.Linear, torch.nn.LSTM},
+        dtype=torch.qint8
+    )
+
+
+def artifact_path(model_key: str, backend: str) -> Path:
+    """Path of an exported model graph."""
+    name = model_key.replace(":", "-")
+    return settings.exported_model_dir / f"{name}{BACKEND_EXTENSIONS[backend]}"
+
+
+class _SegmentForward(torch.nn.Module):
+    """Wraps a model (or bag of models) as one fixed-length segment pass."""
+
+    def __init__(self, model: torch.nn.Module):
+        """Initialize wrapper."""
+        super().__init__()
+        self.model = model
+
+    def forward(self, mix: torch.Tensor) -> torch.Tensor:
+        """Separate a (batch, channels, samples) tensor."""
+        return apply_model(self.model, mix, shifts=0, split=False, progress=False)
+
+
+class InferenceBackend(ABC):
+    """
+    Runs batched segment forward passes.
+
+    Exposes the model attributes the engine needs (samplerate,
+    audio_channels, sources) so exported backends do not have to load the
+    eager model at all.
+    """
+
+    name = "base"
+
+    def __init__(self, metadata: dict):
+        """
+        Initialize backend.
+
+        Args:
+            metadata: samplerate, audio_channels, sources, segment_length and
+                batch_size (None if the batch dimension is dynamic)
+        """
+        self.samplerate: int = metadata["samplerate"]
+        self.audio_channels: int = metadata["audio_channels"]
+        self.sources: list[str] = list(metadata["sources"])
+        self.segment_length: int = metadata["segment_length"]
+        self.batch_size: Optional[int] = metadata.get("batch_size")
+
+    @property
+    def fixed_shape(self) -> bool:
+        """Whether segments must be exactly segment_length long."""
+        return True
+
+    def forward(self, batch: torch.Tensor) -> torch.Tensor:
+        """
+        Run the model on a batch of segments.
+
+        Args:
+            batch: Tensor of shape (batch, channels, samples)
+
+        Returns:
+            Tensor of shape (batch, sources, channels, samples)
+        """
+        size = batch.shape[0]
+        if self.batch_size and size > self.batch_size:
+            return torch.cat([
+                self.forward(part) for part in batch.split(self.batch_size)
+            ])
+        if self.batch_size and size < self.batch_size:
+            # Graphs traced with a fixed batch get zero padding
+            batch = F.pad(batch, (0, 0, 0, 0, 0, self.batch_size - size))
+        with torch.no_grad():
+            return self._forward(batch)[:size]
+
+    @abstractmethod
+    def _forward(self, batch: torch.Tensor) -> torch.Tensor:
+        """
+        Run the model on a batch that matches the backend's batch size.
+
+        Args:
+            batch: Tensor of shape (batch, channels, samples)
+
+        Returns:
+            Tensor of shape (batch, sources, channels, samples)
+        """
+
+
+class EagerBackend(InferenceBackend):
+    """Eager PyTorch execution of the Demucs model."""
+
+    name = "eager"
+
+    def __init__(self, model: torch.nn.Module, device: str):
+        """
+        Initialize eager backend.
+
+        Args:
+            model: Loaded Demucs model in eval mode
+            device: Torch device
+        """
+        super().__init__({
+            "samplerate": model.samplerate,
+            "audio_channels": model.audio_channels,
+            "sources": model.sources,
+            "segment_length": int(segment_seconds(model) * model.samplerate),
+        })
+        self.model = model
+        self.device = device
+
+    @property
+    def fixed_shape(self) -> bool:
+        """Eager models accept any segment up to the maximum length."""
+        return False
+
+    def _forward(self, batch: torch.Tensor) -> torch.Tensor:
+        """Run the eager model on the batch."""
+        return apply_model(
+            self.model,
+            batch,
+            device=self.device,
+            shifts=0,
+            split=False,
+            progress=False
+        ).cpu()
+
+
+class TorchScriptBackend(InferenceBackend):
+    """Runs a traced TorchScript graph."""
+
+    name = "torchscript"
+
+    def __init__(self, path: Path, metadata: dict):
+        """Load a TorchScript graph exported by scripts/export_model.py."""
+        super().__init__(metadata)
+        self.module = torch.jit.load(str(path), map_location="cpu")
+        self.module.eval()
+
+    def _forward(self, batch: torch.Tensor) -> torch.Tensor:
+        """Run the TorchScript graph on the batch."""
+        return self.module(batch)
+
+
+class OnnxBackend(InferenceBackend):
+    """Runs an ONNX graph with ONNX Runtime's CPU execution provider."""
+
+    name = "onnx"
+
+    def __init__(self, path: Path, metadata: dict):
+        """Load an ONNX graph exported by scripts/export_model.py."""
+        super().__init__(metadata)
+        try:
+            import onnxruntime
+        except ImportError:
+            raise InferenceBackendError(
+                "onnxruntime is not installed (pip install onnxruntime)"
+            )
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = torch.get_num_threads()
+        self.session = onnxruntime.InferenceSession(
+            str(path), options, providers=["CPUExecutionProvider"]
+        )
+
+    def _forward(self, batch: torch.Tensor) -> torch.Tensor:
+        """Run the ONNX Runtime session on the batch."""
+        (sources,) = self.session.run(["sources"], {"mix": batch.numpy()})
+        return torch.from_numpy(sources)
+
+
+def load_eager_model(model_name: str, quantize: bool, device: str) -> torch.nn.Module:
+    """
+    Load a pretrained Demucs model in eval mode.
+
+    Raises:
+        InferenceBackendError: If the model cannot be loaded
+    """
+    try:
+        model = get_model(model_name)
+    except Exception as e:
+        raise InferenceBackendError(f"Failed to load model {model_name}: {e}")
+    model.to(device)
+    model.eval()
+    if quantize:
+        if device != "cpu":
+            logger.warning("Quantized inference is CPU only, using float model")
+        else:
+            model = quantize_model(model)
+    return model
+
+
+def load_backend(
+    backend: str,
+    model_name: str,
+    model_key: str,
+    quantize: bool,
+    device: str
+) -> InferenceBackend:
+    """
+    Create the configured inference backend for a model.
+
+    Exported backends fall back to eager execution if no exported graph
+    exists for the model.
+
+    Args:
+        backend: "eager", "torchscript" or "onnx"
+        model_name: Pretrained Demucs model name
+        model_key: Resident model key (includes the quantization variant)
+        quantize: Apply dynamic int8 quantization (eager only)
+        device: Torch device
+
+    Returns:
+        Ready inference backend
+
+    Raises:
+        InferenceBackendError: If the backend cannot be created
+    """
+    if backend in BACKEND_EXTENSIONS:
+        path = artifact_path(model_key, backend)
+        metadata_path = path.with_suffix(".json")
+        if path.exists() and metadata_path.exists():
+            with open(metadata_path, encoding="utf-8") as f:
+                metadata = json.load(f)
+            if backend == "torchscript":
+                return TorchScriptBackend(path, metadata)
+            return OnnxBackend(path, metadata)
+        logger.warning(
+            f"No exported {backend} graph for {model_key} "
+            f"(run scripts/export_model.py), using eager backend"
+        )
+    elif backend != "eager":
+        raise InferenceBackendError(f"Unknown inference backend: {backend}")
+
+    return EagerBackend(load_eager_model(model_name, quantize, device), device)
+
+
+def export_model(
+    model_name: str,
+    backend: str,
+    quantize: bool = False,
+    batch_size: Optional[int] = None
+) -> Path:
+    """
+    Export a Demucs model as a serialized segment graph.
+
+    Args:
+        model_name: Pretrained Demucs model name
+        backend: "torchscript" or "onnx"
+        quantize: Export the dynamic int8 variant (TorchScript only)
+        batch_size: Batch size the graph is traced with
+
+    Returns:
+        Path to the exported graph
+
+    Raises:
+        InferenceBackendError: If export fails
+    """
+    if backend not in BACKEND_EXTENSIONS:
+        raise InferenceBackendError(f"Cannot export to backend: {backend}")
+    if quantize and backend == "onnx":
+        raise InferenceBackendError("Dynamic int8 models can only be exported to TorchScript")
+
+    model = load_eager_model(model_name, quantize, "cpu")
+    batch_size = batch_size or settings.separation_batch_size
+    segment_length = int(segment_seconds(model) * model.samplerate)
+    example = torch.zeros(batch_size, model.audio_channels, segment_length)
+    wrapper = _SegmentForward(model).eval()
+
+    model_key = f"{model_name}:int8" if quantize else model_name
+    path = artifact_path(model_key, backend)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    logger.info(f"Exporting {model_key} to {backend}: {path}")
+    try:
+        with torch.no_grad():
+            if backend == "torchscript":
+                traced = torch.jit.trace(wrapper, example, check_trace=False)
+                traced = torch.jit.freeze(traced)
+                traced.save(str(path))
+            else:
+                torch.onnx.export(
+                    wrapper,
+                    example,
+                    str(path),
+                    input_names=["mix"],
+                    output_names=["sources"],
+                    dynamic_axes={"mix": {0: "batch"}, "sources": {0: "batch"}},
+                    opset_version=17,
+                )
+    except Exception as e:
+        path.unlink(missing_ok=True)
+        raise InferenceBackendError(f"Export of {model_key} to {backend} failed: {e}")
+
+    metadata = {
+        "model": model_name,
+        "quantize": quantize,
+        "samplerate": model.samplerate,
+        "audio_channels": model.audio_channels,
+        "sources": list(model.sources),
+        "segment_length": segment_length,
+        # Traced TorchScript graphs keep the example batch size
+        "batch_size": batch_size if backend == "torchscript" else None,
+    }
+    with open(path.with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+    logger.info(f"Exported {model_key} ({backend}) to {path}")
+    return path
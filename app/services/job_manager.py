@@ -1,15 +1,29 @@
 """Job management service for handling processing tasks."""
 import asyncio
+import heapq
+import itertools
+import time
+from contextlib import aclosing
 from datetime import datetime, timedelta
-from typing import Optional, Callable
+from functools import partial
+from pathlib import Path
+from typing import Optional, Callable, Awaitable
 from collections import deque
 import threading
 
 from app.config import settings
 from app.logging_config import logger
 from app.models.job import Job, JobStatus, JobType
+from app.services.audio_io import probe_duration
+from app.services.broker import JOB_LOST, job_broker
+from app.services.cancellation import cancellation
 from app.services.file_processor import file_processor, FileProcessorError
+from app.services.job_store import job_store, JobStoreError
 from app.services.youtube_downloader import youtube_downloader, YouTubeDownloaderError
+from app.services.pipeline import extraction_pipeline
+from app.services.result_cache import result_cache
+from app.services.thread_budget import thread_budget
+from app.services.time_predictor import time_predictor
 from app.services.vocal_extractor import vocal_extractor, VocalExtractorError
 
 
@@ -18,14 +32,82 @@ class JobManagerError(Exception):
     pass
 
 
+class ClientLimitError(JobManagerError):
+    """A client has reached its queued job limit."""
+    pass
+
+
+class _ClientQueue:
+    """Queued jobs and fair-share accounting of one client."""
+
+    def __init__(self):
+        # Heap of (key, sequence, job_id); cancelled entries are skipped
+        self.heap: list[tuple[float, int, str]] = []
+        self.queued = 0
+        self.running = 0
+        self.deficit = 0.0
+        self.consumed_seconds = 0.0
+        # When the client last went idle while in debt
+        self.idle_since: Optional[float] = None
+
+    def forgive_debt(self, now: float, rate: float) -> None:
+        """Reduce the debt by the time spent idle."""
+        if self.idle_since is not None:
+            idle = now - self.idle_since
+            self.deficit = min(0.0, self.deficit + idle * rate)
+            self.idle_since = now
+
+
 class JobManager:
-    """Service for managing processing jobs with queuing support."""
+    """
+    Service for managing processing jobs with queuing support.
+
+    Every client (IP address or API key) has its own queue, a heap keyed
+    by class offset + predicted processing time + aging_rate * enqueue
+    time. For any two waiting jobs the difference of (class offset +
+    predicted time - aging_rate * time waited) equals the difference of
+    their keys at every instant, so the static key gives shortest-job-first
+    with aging in O(log n) per operation.
+
+    Clients share the slots by deficit round-robin: each turn a client
+    earns fair_queue_quantum_seconds of credit and starts its next job
+    once the credit covers the job's predicted time. When a job finishes
+    the client is charged for the slot time it actually used, so a client
+    whose jobs run longer than predicted waits longer for the next one.
+    That debt is forgiven while the client is idle, and idle clients are
+    forgotten once they owe nothing.
+    """
+
+    # Client of jobs created without one
+    ANONYMOUS_CLIENT = "anonymous"
+    # Queue positions may lag this long behind the queue
+    QUEUE_ORDER_REFRESH_SECONDS = 1.0
+    # Slot-seconds of debt forgiven per second a client is idle
+    DEBT_FORGIVENESS_RATE = 1.0
+    # Idle clients are looked for at most this often
+    CLIENT_SWEEP_SECONDS = 60.0
 
     def __init__(self):
         """Initialize job manager."""
         self._jobs: dict[str, Job] = {}
-        self._processing_queue: deque = deque()
+        self._clients: dict[str, _ClientQueue] = {}
+        # Clients with queued jobs, in round-robin order
+        self._processing_queue: deque[str] = deque()
+        self._sequence = itertools.count()
+        self._clients_swept = 0.0
+        # Snapshot of the dispatch order, rebuilt at most once per
+        # QUEUE_ORDER_REFRESH_SECONDS after the queue changed
+        self._queue_order: list[str] = []
+        self._queue_ranks: dict[str, int] = {}
+        self._queue_prefix_seconds: list[float] = [0.0]
+        self._queue_dirty = False
+        self._queue_built = 0.0
+        # Predicted seconds of all queued jobs
+        self._queued_seconds = 0.0
+        # job_id -> (handler, args, client_id, predicted seconds)
+        self._pending: dict[str, tuple[Callable[..., Awaitable], tuple, str, float]] = {}
         self._active_jobs: int = 0
+        self._tasks: dict[str, asyncio.Task] = {}
         self._max_concurrent = settings.max_concurrent_jobs
         self._lock = threading.Lock()
 
@@ -43,6 +125,7 @@ class JobManager:
         job = Job(job_type=job_type, **kwargs)
         with self._lock:
             self._jobs[job.job_id] = job
+        job_store.save(job)
         logger.info(f"Created job: {job.job_id} ({job_type.value})")
         return job
 
@@ -50,26 +133,35 @@ class JobManager:
         """
         Get job by ID.
 
+        Jobs run by this process are returned live; others (e.g. from
+        another server process) are read from the job store.
+
         Args:
             job_id: Job ID to retrieve
 
         Returns:
             Job object or None if not found
         """
-        return self._jobs.get(job_id)
+        return self._jobs.get(job_id) or job_store.get(job_id)
 
-    def update_job_progress(self, job_id: str, progress: float) -> None:
+    def update_job_progress(self, job_id: str, progress: float, **details) -> None:
         """
         Update job progress.
 
         Args:
             job_id: Job ID to update
             progress: Progress percentage (0-100)
+            **details: Extra progress fields reported by the extractor
+                (e.g. segments_done, eta_seconds)
         """
         job = self.get_job(job_id)
         if job:
             job.progress = min(max(progress, 0), 100)
+            for key, value in details.items():
+                if key in Job.model_fields:
+                    setattr(job, key, value)
             job.updated_at = datetime.now()
+            job_store.save_progress(job)
 
     def update_job_status(
         self,
@@ -88,6 +180,7 @@ class JobManager:
         job = self.get_job(job_id)
         if job:
             job.update_status(status, progress)
+            job_store.save(job)
             logger.info(f"Job {job_id} status: {status.value}")
 
     def set_job_error(
@@ -105,8 +198,9 @@ class JobManager:
             details: Optional error details
         """
         job = self.get_job(job_id)
-        if job:
+        if job and job.status != JobStatus.CANCELLED:
             job.set_error(message, details)
+            job_store.save(job)
             logger.error(f"Job {job_id} failed: {message}")
 
     def set_job_output(self, job_id: str, output_path: str) -> None:
@@ -122,20 +216,470 @@ class JobManager:
             job.output_file_path = output_path
             job.output_filename = output_path.split("/")[-1]
 
+    def set_job_outputs(self, job_id: str, output_files: dict[str, str]) -> str:
+        """
+        Set job output files per stem.
+
+        Args:
+            job_id: Job ID to update
+            output_files: Mapping of stem name to output file path
+
+        Returns:
+            Primary output path (vocals if requested, else the first stem)
+        """
+        primary = output_files.get("vocals") or next(iter(output_files.values()))
+        job = self.get_job(job_id)
+        if job:
+            job.output_files = dict(output_files)
+        self.set_job_output(job_id, primary)
+        return primary
+
+    def cancel_job(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued or running job.
+
+        A queued job is dropped from the queue; a running job's task is
+        cancelled, which frees its slot for the next queued job. Work
+        already handed to a thread or worker process stops at its next
+        segment or download progress update. Partial files are deleted.
+        A job owned by another server process sharing the job store is
+        left to that process, which is asked to cancel it.
+
+        Args:
+            job_id: Job ID to cancel
+
+        Returns:
+            Cancelled Job object (still running if cancellation was only
+            requested) or None if not found
+
+        Raises:
+            JobManagerError: If the job has already finished
+        """
+        job = self.get_job(job_id)
+        if not job:
+            return None
+        if job.status in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED):
+            raise JobManagerError(f"Job already {job.status.value}")
+        with self._lock:
+            local = job_id in self._jobs
+        if not local:
+            try:
+                job_store.request_cancel(job_id)
+            except JobStoreError as e:
+                raise JobManagerError(str(e))
+            logger.info(f"Requested cancellation of job {job_id} from its owning process")
+            return job
+
+        cancellation.cancel(job_id)
+        job.cancel()
+        job_store.save(job)
+        with self._lock:
+            pending = self._pending.pop(job_id, None)
+            if pending:
+                self._queue_dirty = True
+                # Reset when empty so rounding errors cannot accumulate
+                self._queued_seconds = self._queued_seconds - pending[3] if self._pending else 0.0
+                client = self._clients[pending[2]]
+                client.queued -= 1
+                # Rebuild once stale entries dominate the heap
+                if len(client.heap) > 2 * client.queued + 64:
+                    client.heap = [entry for entry in client.heap if entry[2] in self._pending]
+                    heapq.heapify(client.heap)
+            task = self._tasks.get(job_id)
+        if task:
+            task.cancel()
+
+        try:
+            file_processor.cleanup_job_files(job_id)
+        except OSError as e:
+            logger.warning(f"Could not delete files of cancelled job {job_id}: {e}")
+        logger.info(f"Job {job_id} cancelled")
+        return job
+
+    async def watch_cancel_requests(self, interval: float) -> None:
+        """
+        Cancel jobs that other processes sharing the job store were asked to.
+
+        Args:
+            interval: Seconds between checks
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            job_ids = await loop.run_in_executor(None, job_store.take_cancel_requests)
+            for job_id in job_ids:
+                try:
+                    self.cancel_job(job_id)
+                except JobManagerError:
+                    # Finished in the meantime
+                    pass
+
+    def check_client_limits(self, client_id: Optional[str]) -> None:
+        """
+        Reject a new job from a client that has too many queued jobs.
+
+        Args:
+            client_id: Client identifier
+
+        Raises:
+            ClientLimitError: If the client is at its queued job limit
+        """
+        limit = settings.max_queued_jobs_per_client
+        with self._lock:
+            client = self._clients.get(client_id or self.ANONYMOUS_CLIENT)
+            queued = client.queued if client else 0
+        if limit and queued >= limit:
+            raise ClientLimitError(
+                f"Too many queued jobs (limit {limit}), try again later"
+            )
+
+    def enqueue_job(
+        self,
+        job_id: str,
+        handler: Callable[..., Awaitable],
+        *args
+    ) -> int:
+        """
+        Queue a job; it starts as soon as a processing slot is free.
+
+        Jobs are ordered by their priority class and predicted processing
+        time (call estimate_job first), with aging, and clients take turns.
+        Must be called from the event loop.
+
+        Args:
+            job_id: Job ID
+            handler: Coroutine function run as handler(job_id, *args)
+            *args: Extra handler arguments
+
+        Returns:
+            Queue position (0 if the job started immediately)
+
+        Raises:
+            ClientLimitError: If the client is at its queued job limit
+        """
+        job = self.get_job(job_id)
+        client_id = (job.client_id if job else None) or self.ANONYMOUS_CLIENT
+        self.check_client_limits(client_id)
+        predicted = self._predicted_seconds(job)
+        key = self._queue_key(job, predicted)
+        with self._lock:
+            now = time.monotonic()
+            self._forget_idle_clients(now)
+            self._pending[job_id] = (handler, args, client_id, predicted)
+            client = self._clients.setdefault(client_id, _ClientQueue())
+            client.forgive_debt(now, self.DEBT_FORGIVENESS_RATE)
+            client.idle_since = None
+            heapq.heappush(client.heap, (key, next(self._sequence), job_id))
+            client.queued += 1
+            if client_id not in self._processing_queue:
+                self._processing_queue.append(client_id)
+            self._queue_dirty = True
+            self._queued_seconds += predicted
+        self._dispatch()
+        return self.get_queue_position(job_id)
+
+    def _forget_idle_clients(self, now: float) -> None:
+        """Drop idle clients whose debt has been forgiven (lock held)."""
+        if now - self._clients_swept < self.CLIENT_SWEEP_SECONDS:
+            return
+        self._clients_swept = now
+        for client_id, client in list(self._clients.items()):
+            if client.idle_since is None:
+                continue
+            client.forgive_debt(now, self.DEBT_FORGIVENESS_RATE)
+            if client.deficit >= 0:
+                del self._clients[client_id]
+
+    def _client_idle(self, client_id: str, client: _ClientQueue, now: float) -> None:
+        """Forget a client with nothing queued or running, unless in debt (lock held)."""
+        if client.deficit >= 0:
+            del self._clients[client_id]
+        else:
+            client.idle_since = now
+
+    def _predicted_seconds(self, job: Optional[Job]) -> float:
+        """Predicted processing time of a job being queued."""
+        if not job:
+            return time_predictor.predict(None, None)
+        return job.estimated_duration or time_predictor.predict(
+            job.input_duration, job.profile
+        )
+
+    def _queue_key(self, job: Optional[Job], predicted: float) -> float:
+        """Heap key of a job being queued now."""
+        priority_class = (job.priority_class if job else None) or settings.default_priority_class
+        offset = settings.job_priority_classes.get(priority_class, 0.0)
+        return offset + predicted + settings.job_aging_rate * time.monotonic()
+
+    def _peek(self, client: _ClientQueue) -> Optional[str]:
+        """Next queued job of a client, dropping cancelled entries (lock held)."""
+        while client.heap and client.heap[0][2] not in self._pending:
+            heapq.heappop(client.heap)
+        return client.heap[0][2] if client.heap else None
+
+    def _next_job(self) -> Optional[str]:
+        """Pick the next job by deficit round-robin over clients (lock held)."""
+        limit = settings.max_concurrent_jobs_per_client
+        quantum = max(settings.fair_queue_quantum_seconds, 1.0)
+        while self._processing_queue:
+            eligible = False
+            for _ in range(len(self._processing_queue)):
+                if not self._processing_queue:
+                    break
+                client_id = self._processing_queue[0]
+                client = self._clients[client_id]
+                job_id = self._peek(client)
+                if job_id is None:
+                    # No credit is banked while idle, but debt is kept
+                    self._processing_queue.popleft()
+                    client.deficit = min(client.deficit, 0.0)
+                    if not client.running:
+                        self._client_idle(client_id, client, time.monotonic())
+                    continue
+                if limit and client.running >= limit:
+                    self._processing_queue.rotate(-1)
+                    continue
+                eligible = True
+                cost = self._pending[job_id][3]
+                if cost <= client.deficit:
+                    # The client keeps its turn while its credit lasts
+                    heapq.heappop(client.heap)
+                    client.deficit -= cost
+                    return job_id
+                client.deficit += quantum
+                self._processing_queue.rotate(-1)
+            if not eligible:
+                return None
+        return None
+
+    def _dispatch(self) -> None:
+        """Start queued jobs while slots are free."""
+        while True:
+            with self._lock:
+                if self._active_jobs >= self._max_concurrent:
+                    return
+                job_id = self._next_job()
+                if job_id is None:
+                    return
+                handler, args, client_id, predicted = self._pending.pop(job_id)
+                client = self._clients[client_id]
+                client.queued -= 1
+                client.running += 1
+                self._queue_dirty = True
+                self._queued_seconds = self._queued_seconds - predicted if self._pending else 0.0
+                self._active_jobs += 1
+                active = self._active_jobs
+            job = self._jobs.get(job_id)
+            if job and job.profile is None and self._under_load():
+                # Degraded tier: a rough draft instead of a long wait. Decided
+                # here so jobs run by workers see it in their snapshot.
+                job.profile = "draft"
+                job.eta_seconds = None
+                job.estimated_duration = round(
+                    time_predictor.predict(job.input_duration, job.profile, active), 1
+                )
+                job_store.save(job)
+                logger.info(f"Job {job_id} degraded to draft profile under load")
+            if job_broker is not None:
+                task = asyncio.create_task(self._run_on_worker(job_id, handler, args))
+            else:
+                task = asyncio.create_task(handler(job_id, *args))
+            with self._lock:
+                self._tasks[job_id] = task
+            task.add_done_callback(
+                partial(self._on_job_done, job_id, client_id, predicted, time.monotonic())
+            )
+            logger.info(f"Job {job_id} started ({active}/{self._max_concurrent} slots)")
+
+    def _on_job_done(
+        self,
+        job_id: str,
+        client_id: str,
+        predicted: float,
+        started: float,
+        task: asyncio.Task
+    ) -> None:
+        """Free a finished or cancelled job's slot and start the next job."""
+        now = time.monotonic()
+        used = now - started
+        with self._lock:
+            self._tasks.pop(job_id, None)
+            client = self._clients[client_id]
+            client.running -= 1
+            client.consumed_seconds += used
+            # Charge the slot time actually used instead of the prediction
+            client.deficit -= used - predicted
+            if (
+                not client.running
+                and not client.queued
+                and client_id not in self._processing_queue
+            ):
+                self._client_idle(client_id, client, now)
+        self._decrement_active()
+        if not task.cancelled():
+            error = task.exception()
+            # JobManagerError is already recorded on the job
+            if error is not None and not isinstance(error, JobManagerError):
+                logger.error(f"Job {job_id} crashed: {error}")
+        self._dispatch()
+
+    async def _run_on_worker(
+        self,
+        job_id: str,
+        handler: Callable[..., Awaitable],
+        args: tuple
+    ) -> None:
+        """
+        Hand a dispatched job to a worker and mirror its progress.
+
+        The job keeps its slot here until the worker reports a final
+        status, so queuing and fair sharing stay with the API. A job lost
+        with its worker (no lease and no longer queued) is submitted
+        again, up to broker_max_redeliveries times, and then failed.
+        Cancelling this task forwards the cancellation to the worker.
+        """
+        job = self.get_job(job_id)
+        if not job:
+            return
+        message = {
+            "job": job.model_dump(mode="json"),
+            "handler": handler.__name__,
+            "args": list(args),
+        }
+        try:
+            for delivery in range(settings.broker_max_redeliveries + 1):
+                if delivery:
+                    logger.warning(f"Worker running job {job_id} was lost, submitting again")
+                    await job_broker.remove_job(job_id)
+                await job_broker.submit_job(message)
+                if await self._follow_worker(job):
+                    break
+            else:
+                await job_broker.remove_job(job_id)
+                self.set_job_error(job_id, "Processing failed", "Worker stopped responding")
+        except asyncio.CancelledError:
+            await job_broker.cancel_job(job_id)
+            raise
+        if job.status == JobStatus.FAILED:
+            raise JobManagerError(job.error_message or "Processing failed")
+
+    async def _follow_worker(self, job: Job) -> bool:
+        """
+        Apply a submitted job's events until it finishes.
+
+        Returns:
+            True if the job finished, False if its worker was lost
+        """
+        missed = 0
+        async with aclosing(job_broker.events(job.job_id, job_broker.lease_seconds)) as events:
+            async for event in events:
+                if event is not None:
+                    missed = 0
+                    self._apply_snapshot(job, event)
+                    if job.status in (
+                        JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED
+                    ):
+                        return True
+                    continue
+                # A worker may be between taking the job and its lease;
+                # only a second silent interval means it is gone
+                if await job_broker.job_state(job.job_id) == JOB_LOST:
+                    missed += 1
+                    if missed >= 2:
+                        return False
+                else:
+                    missed = 0
+        return False
+
+    def _apply_snapshot(self, job: Job, snapshot: dict) -> None:
+        """Copy a worker's job snapshot onto the local job."""
+        if job.status == JobStatus.CANCELLED:
+            return
+        update = Job.model_validate(snapshot)
+        for field in Job.model_fields:
+            if field != "job_id":
+                setattr(job, field, getattr(update, field))
+        if job.status in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED):
+            job_store.save(job)
+        else:
+            job_store.save_progress(job)
+
+    def adopt_job(self, snapshot: dict) -> bool:
+        """
+        Track a job received from the broker (in a worker).
+
+        Args:
+            snapshot: Job as submitted by the API
+
+        Returns:
+            True if a local copy was created (release it with forget_job),
+            False if this process already runs the API that owns the job
+        """
+        job = Job.model_validate(snapshot)
+        with self._lock:
+            if job.job_id in self._jobs:
+                return False
+            self._jobs[job.job_id] = job
+        job_store.save(job)
+        return True
+
+    def forget_job(self, job_id: str) -> None:
+        """Drop a worker's local copy of a finished job."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        cancellation.clear(job_id)
+
     def get_queue_position(self, job_id: str) -> int:
         """
         Get job position in queue.
 
+        Positions come from a snapshot of the dispatch order that is at
+        most QUEUE_ORDER_REFRESH_SECONDS old; a job queued since then is
+        placed behind every other queued job.
+
         Args:
             job_id: Job ID to check
 
         Returns:
             Queue position (0 if not in queue or processing)
         """
-        try:
-            return list(self._processing_queue).index(job_id) + 1
-        except ValueError:
-            return 0
+        with self._lock:
+            if job_id not in self._pending:
+                return 0
+            self._refresh_queue_order()
+            rank = self._queue_ranks.get(job_id)
+            return rank + 1 if rank is not None else len(self._pending)
+
+    def _refresh_queue_order(self) -> None:
+        """
+        Rebuild the dispatch order snapshot if it is stale (lock held).
+
+        Clients' queues are interleaved in round-robin order. Rebuilding
+        sorts every queue, so it is rate-limited instead of running on
+        every enqueue or status poll.
+        """
+        now = time.monotonic()
+        if not self._queue_dirty or now - self._queue_built < self.QUEUE_ORDER_REFRESH_SECONDS:
+            return
+        queues = [
+            [
+                job_id for _, _, job_id in sorted(self._clients[client_id].heap)
+                if job_id in self._pending
+            ]
+            for client_id in self._processing_queue
+        ]
+        self._queue_order = [
+            queue[rank]
+            for rank in range(max(map(len, queues), default=0))
+            for queue in queues
+            if rank < len(queue)
+        ]
+        self._queue_ranks = {job_id: rank for rank, job_id in enumerate(self._queue_order)}
+        self._queue_prefix_seconds = list(itertools.accumulate(
+            (self._pending[job_id][3] for job_id in self._queue_order), initial=0.0
+        ))
+        self._queue_dirty = False
+        self._queue_built = now
 
     def get_estimated_wait_time(self, job_id: str) -> Optional[float]:
         """
@@ -147,27 +691,202 @@ class JobManager:
         Returns:
             Estimated wait time in seconds or None
         """
-        position = self.get_queue_position(job_id)
-        if position > 0:
-            # Rough estimate: 3 minutes per job
-            return position * 180
-        return None
+        with self._lock:
+            pending = self._pending.get(job_id)
+            if pending is None:
+                return None
+            self._refresh_queue_order()
+            rank = self._queue_ranks.get(job_id)
+            if rank is not None:
+                ahead = self._queue_prefix_seconds[rank]
+            else:
+                ahead = self._queued_seconds - pending[3]
+        return self._backlog_seconds(ahead)
+
+    def _remaining_seconds(self, job: Job) -> float:
+        """Predicted remaining processing time of a job."""
+        if job.status == JobStatus.PROCESSING and job.eta_seconds is not None:
+            return job.eta_seconds
+        estimated = job.estimated_duration or time_predictor.predict(
+            job.input_duration, job.profile
+        )
+        return estimated * (1 - job.progress / 100)
+
+    def _backlog_seconds(self, queued_seconds: float) -> float:
+        """
+        Predicted time until a slot frees up for a job behind queued work.
+
+        Running jobs' remaining time and the predicted time of the queued
+        jobs ahead are spread over the concurrent slots.
+
+        Args:
+            queued_seconds: Predicted seconds of the queued jobs ahead
+        """
+        with self._lock:
+            running = [self._jobs.get(job_id) for job_id in self._tasks]
+        total = queued_seconds + sum(
+            self._remaining_seconds(job) for job in running if job
+        )
+        return total / max(1, self._max_concurrent)
+
+    def estimate_job(self, job_id: str, duration: Optional[float]) -> Optional[float]:
+        """
+        Record a job's input duration and predict its processing time.
+
+        Args:
+            job_id: Job ID to update
+            duration: Input duration in seconds (None if unknown)
+
+        Returns:
+            Predicted processing time in seconds or None if job not found
+        """
+        job = self.get_job(job_id)
+        if not job:
+            return None
+        if duration:
+            job.input_duration = duration
+        with self._lock:
+            load = self._active_jobs + 1
+        job.estimated_duration = round(
+            time_predictor.predict(job.input_duration, job.profile, load), 1
+        )
+        job_store.save_progress(job)
+        return job.estimated_duration
+
+    def check_admission(self, job_id: str) -> None:
+        """
+        Reject a job whose predicted wait exceeds the configured limit.
+
+        Args:
+            job_id: Job ID to check
+
+        Raises:
+            JobManagerError: If the job should not be admitted
+        """
+        limit = settings.max_predicted_wait_seconds
+        if not limit:
+            return
+        with self._lock:
+            queued_seconds = self._queued_seconds
+            pending = self._pending.get(job_id)
+            if pending:
+                queued_seconds -= pending[3]
+        wait = self._backlog_seconds(queued_seconds)
+        if wait > limit:
+            raise JobManagerError(
+                f"Server is busy (estimated wait {wait / 60:.0f} minutes), try again later"
+            )
 
     def can_start_job(self) -> bool:
         """Check if a new job can be started."""
         with self._lock:
             return self._active_jobs < self._max_concurrent
 
-    def _increment_active(self) -> None:
-        """Increment active job count."""
+    def _under_load(self) -> bool:
+        """Check if jobs without a profile should fall back to draft mode."""
+        threshold = settings.draft_under_load_queued_jobs
+        if not threshold or "draft" not in settings.separation_profiles:
+            return False
+        # Active jobs are capped at max_concurrent_jobs; the queue is what grows
         with self._lock:
-            self._active_jobs += 1
+            return len(self._pending) > threshold
 
     def _decrement_active(self) -> None:
         """Decrement active job count."""
         with self._lock:
             self._active_jobs = max(0, self._active_jobs - 1)
 
+    async def _extract_stems(
+        self,
+        job_id: str,
+        file_path: str,
+        progress_callback: Callable[..., None]
+    ) -> dict[str, str]:
+        """
+        Extract the job's stems, serving repeated inputs from the result cache.
+
+        Only stems missing from the cache are separated, and those are
+        cached; with cache_all_stems a miss separates and caches every
+        model stem instead.
+
+        Args:
+            job_id: Job ID
+            file_path: Path to input audio file
+            progress_callback: Callback for progress updates
+
+        Returns:
+            Mapping of requested stem name to output file path
+        """
+        loop = asyncio.get_running_loop()
+        job = self.get_job(job_id)
+        profile = job.profile if job else None
+        preview_only = job.preview_only if job else False
+        stems = job.stems if job else ["vocals"]
+
+        cache_key = None
+        cached: dict[str, str] = {}
+        if result_cache.enabled:
+            params = vocal_extractor.separation_params(profile)
+            if preview_only:
+                params["preview_seconds"] = settings.preview_duration_seconds
+            cache_key = await loop.run_in_executor(
+                None,
+                result_cache.make_key,
+                file_path,
+                params["model"],
+                params
+            )
+            dest_paths = {
+                stem: str(vocal_extractor.output_path(job_id, stem)) for stem in stems
+            }
+            cached = await loop.run_in_executor(
+                None, result_cache.get, cache_key, dest_paths
+            )
+            if len(cached) == len(stems):
+                logger.info(f"Job {job_id} served from result cache")
+                if job:
+                    job.from_cache = True
+                return cached
+
+        missing = [stem for stem in stems if stem not in cached]
+        # Cached stems are hard links into the cache and must not be rewritten
+        if cache_key and settings.cache_all_stems and not cached:
+            missing = None
+
+        if job and job.input_duration is None:
+            duration = await loop.run_in_executor(None, probe_duration, Path(file_path))
+            self.estimate_job(job_id, duration)
+        with self._lock:
+            load = self._active_jobs
+        started = time.monotonic()
+
+        # Decode, separate and encode overlap with other jobs' stages
+        output_files = await extraction_pipeline.extract(
+            job_id,
+            file_path,
+            progress_callback,
+            profile,
+            preview_only,
+            missing
+        )
+
+        if job and job.input_duration and not preview_only:
+            await loop.run_in_executor(
+                None,
+                time_predictor.observe,
+                job.input_duration,
+                profile,
+                load,
+                time.monotonic() - started
+            )
+
+        if cache_key:
+            await loop.run_in_executor(
+                None, result_cache.put, cache_key, output_files
+            )
+        output_files.update(cached)
+        return {stem: output_files[stem] for stem in stems}
+
     async def process_file_upload(
         self,
         job_id: str,
@@ -176,6 +895,8 @@ class JobManager:
         """
         Process uploaded file for vocal extraction.
 
+        Runs in a slot granted by the dispatcher (see enqueue_job).
+
         Args:
             job_id: Job ID
             file_path: Path to uploaded file
@@ -184,23 +905,16 @@ class JobManager:
             Path to extracted vocal file
         """
         try:
-            self._increment_active()
             self.update_job_status(job_id, JobStatus.PROCESSING, 0)
 
-            def progress_callback(progress: float):
-                self.update_job_progress(job_id, progress)
+            def progress_callback(progress: float, **details):
+                self.update_job_progress(job_id, progress, **details)
 
-            # Run vocal extraction in thread pool
-            loop = asyncio.get_event_loop()
-            output_path = await loop.run_in_executor(
-                None,
-                vocal_extractor.extract_vocals,
-                file_path,
-                job_id,
-                progress_callback
+            output_files = await self._extract_stems(
+                job_id, file_path, progress_callback
             )
 
-            self.set_job_output(job_id, output_path)
+            output_path = self.set_job_outputs(job_id, output_files)
             self.update_job_status(job_id, JobStatus.COMPLETED, 100)
 
             # Set processing time
@@ -218,8 +932,6 @@ class JobManager:
         except Exception as e:
             self.set_job_error(job_id, "Processing failed", str(e))
             raise JobManagerError(f"Processing failed: {e}")
-        finally:
-            self._decrement_active()
 
     async def process_youtube_download(
         self,
@@ -229,6 +941,8 @@ class JobManager:
         """
         Process YouTube URL for vocal extraction.
 
+        Runs in a slot granted by the dispatcher (see enqueue_job).
+
         Args:
             job_id: Job ID
             url: YouTube video URL
@@ -237,7 +951,6 @@ class JobManager:
             Path to extracted vocal file
         """
         try:
-            self._increment_active()
             self.update_job_status(job_id, JobStatus.DOWNLOADING, 0)
 
             # Download progress callback
@@ -264,20 +977,16 @@ class JobManager:
             # Now process for vocal extraction
             self.update_job_status(job_id, JobStatus.PROCESSING, 40)
 
-            def extraction_progress(progress: float):
+            def extraction_progress(progress: float, **details):
                 # Extraction is 40-100% of total progress
                 total_progress = 40 + (progress * 0.6)
-                self.update_job_progress(job_id, total_progress)
+                self.update_job_progress(job_id, total_progress, **details)
 
-            output_path = await loop.run_in_executor(
-                None,
-                vocal_extractor.extract_vocals,
-                file_path,
-                job_id,
-                extraction_progress
+            output_files = await self._extract_stems(
+                job_id, file_path, extraction_progress
             )
 
-            self.set_job_output(job_id, output_path)
+            output_path = self.set_job_outputs(job_id, output_files)
             self.update_job_status(job_id, JobStatus.COMPLETED, 100)
 
             # Set processing time
@@ -298,8 +1007,48 @@ class JobManager:
         except Exception as e:
             self.set_job_error(job_id, "Processing failed", str(e))
             raise JobManagerError(f"Processing failed: {e}")
-        finally:
-            self._decrement_active()
+
+    def recover_jobs(self) -> int:
+        """
+        Requeue in-flight jobs left behind by a stopped or crashed process.
+
+        Uploads restart from their saved input (separation resumes from its
+        checkpoint); YouTube jobs download again. Jobs whose input is gone
+        are failed. Must be called from the event loop.
+
+        Returns:
+            Number of requeued jobs
+        """
+        requeued = 0
+        for job in job_store.recover():
+            with self._lock:
+                self._jobs[job.job_id] = job
+            if (
+                job.job_type == JobType.FILE_UPLOAD
+                and job.input_file_path
+                and Path(job.input_file_path).exists()
+            ):
+                handler, argument = self.process_file_upload, job.input_file_path
+            elif job.job_type == JobType.YOUTUBE_DOWNLOAD and job.input_url:
+                handler, argument = self.process_youtube_download, job.input_url
+            else:
+                self.set_job_error(job.job_id, "Job was interrupted by a server restart")
+                continue
+
+            job.update_status(JobStatus.PENDING, 0.0)
+            job.eta_seconds = None
+            job.preview_ready = False
+            job_store.save(job)
+            try:
+                self.enqueue_job(job.job_id, handler, argument)
+            except ClientLimitError as e:
+                self.set_job_error(job.job_id, str(e))
+                continue
+            requeued += 1
+
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted jobs")
+        return requeued
 
     def cleanup_expired_jobs(self) -> int:
         """
@@ -313,37 +1062,41 @@ class JobManager:
         )
         cleaned_count = 0
 
-        with self._lock:
-            expired_jobs = [
-                job_id for job_id, job in self._jobs.items()
-                if job.created_at < expiry_threshold
-                and job.status in [JobStatus.COMPLETED, JobStatus.FAILED]
-            ]
+        expired_jobs = job_store.list_expired(
+            expiry_threshold,
+            (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+        )
 
+        # Only the in-memory removal needs the lock; files and rows are
+        # deleted without blocking enqueues and status polls
+        with self._lock:
             for job_id in expired_jobs:
-                # Clean up files
-                file_processor.cleanup_job_files(job_id)
-                # Remove job from memory
-                del self._jobs[job_id]
-                cleaned_count += 1
-                logger.info(f"Cleaned up expired job: {job_id}")
+                self._jobs.pop(job_id, None)
+
+        for job_id in expired_jobs:
+            file_processor.cleanup_job_files(job_id)
+            job_store.delete(job_id)
+            cancellation.clear(job_id)
+            cleaned_count += 1
+            logger.info(f"Cleaned up expired job: {job_id}")
 
         return cleaned_count
 
     def get_stats(self) -> dict:
         """Get job manager statistics."""
+        status_counts = job_store.count_by_status()
         with self._lock:
-            status_counts = {}
-            for job in self._jobs.values():
-                status = job.status.value
-                status_counts[status] = status_counts.get(status, 0) + 1
-
             return {
-                "total_jobs": len(self._jobs),
+                "total_jobs": sum(status_counts.values()),
                 "active_jobs": self._active_jobs,
-                "queued_jobs": len(self._processing_queue),
+                "queued_jobs": len(self._pending),
+                "clients": len(self._clients),
                 "max_concurrent": self._max_concurrent,
                 "status_counts": status_counts,
+                "cache": result_cache.get_stats(),
+                "threads": thread_budget.get_stats(),
+                "pipeline": extraction_pipeline.get_stats(),
+                "predictor": time_predictor.get_stats(),
             }
 
 
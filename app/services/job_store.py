@@ -0,0 +1,408 @@
+"""Pluggable job persistence: in-memory or SQLite."""
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+from app.logging_config import logger
+from app.models.job import Job, JobStatus
+
+
+class JobStoreError(Exception):
+    """Custom exception for job store errors."""
+    pass
+
+
+# Jobs that were running when their owning process stopped
+IN_FLIGHT_STATUSES = (JobStatus.PENDING, JobStatus.DOWNLOADING, JobStatus.PROCESSING)
+
+
+class JobStore(ABC):
+    """
+    Interface of a job store.
+
+    save writes a job at once; save_progress may batch writes and is meant
+    for frequent progress updates. Jobs record the process that owns them
+    so in-flight jobs of a dead process can be recovered. A store shared
+    by several processes also carries cancel requests to a job's owner.
+    """
+
+    # Whether other processes see this store's jobs
+    shared = False
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID."""
+
+    @abstractmethod
+    def save(self, job: Job) -> None:
+        """Write a job (and any batched progress) now."""
+
+    def save_progress(self, job: Job) -> None:
+        """Write a job's progress, possibly batched with other updates."""
+        self.save(job)
+
+    @abstractmethod
+    def delete(self, job_id: str) -> None:
+        """Delete a job."""
+
+    @abstractmethod
+    def list_by_status(self, statuses: tuple[JobStatus, ...]) -> list[Job]:
+        """Get jobs in any of the given statuses."""
+
+    @abstractmethod
+    def list_expired(
+        self,
+        created_before: datetime,
+        statuses: tuple[JobStatus, ...]
+    ) -> list[str]:
+        """Get IDs of jobs created before a time in any of the given statuses."""
+
+    @abstractmethod
+    def count_by_status(self) -> dict[str, int]:
+        """Count jobs per status."""
+
+    def recover(self) -> list[Job]:
+        """Claim in-flight jobs whose owning process is gone."""
+        return []
+
+    def request_cancel(self, job_id: str) -> None:
+        """Ask the process that owns a job to cancel it."""
+        pass
+
+    def take_cancel_requests(self) -> list[str]:
+        """Get and clear cancel requests for jobs this process owns."""
+        return []
+
+    def flush(self) -> None:
+        """Write batched progress updates."""
+        pass
+
+    def close(self) -> None:
+        """Flush and release the store."""
+        self.flush()
+
+
+class InMemoryJobStore(JobStore):
+    """Job store in a dict; jobs are lost when the process exits."""
+
+    def __init__(self):
+        """Initialize in-memory job store."""
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID."""
+        return self._jobs.get(job_id)
+
+    def save(self, job: Job) -> None:
+        """Write a job."""
+        with self._lock:
+            self._jobs[job.job_id] = job
+
+    def delete(self, job_id: str) -> None:
+        """Delete a job."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def list_by_status(self, statuses: tuple[JobStatus, ...]) -> list[Job]:
+        """Get jobs in any of the given statuses."""
+        with self._lock:
+            return [job for job in self._jobs.values() if job.status in statuses]
+
+    def list_expired(
+        self,
+        created_before: datetime,
+        statuses: tuple[JobStatus, ...]
+    ) -> list[str]:
+        """Get IDs of jobs created before a time in any of the given statuses."""
+        with self._lock:
+            return [
+                job_id for job_id, job in self._jobs.items()
+                if job.created_at < created_before and job.status in statuses
+            ]
+
+    def count_by_status(self) -> dict[str, int]:
+        """Count jobs per status."""
+        counts: dict[str, int] = {}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.status.value] = counts.get(job.status.value, 0) + 1
+        return counts
+
+
+class SqliteJobStore(JobStore):
+    """
+    Job store in a SQLite database in WAL mode.
+
+    Jobs are stored as JSON next to indexed status and created_at columns,
+    so several server processes can share one database. Progress updates
+    are kept in memory and written together at most once per flush
+    interval; every other save (status changes, results) writes at once
+    and takes pending progress with it.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+        CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at);
+        CREATE TABLE IF NOT EXISTS cancel_requests (
+            job_id TEXT PRIMARY KEY,
+            requested_at TEXT NOT NULL
+        );
+    """
+
+    shared = True
+
+    def __init__(self, path: Path, flush_interval: float = 1.0):
+        """
+        Initialize SQLite job store.
+
+        Args:
+            path: Database file path
+            flush_interval: Seconds between batched progress writes
+
+        Raises:
+            JobStoreError: If the database cannot be opened
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._dirty: dict[str, Job] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                str(path), check_same_thread=False, isolation_level=None, timeout=30
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # WAL keeps commits atomic and durable across crashes with NORMAL
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+        except sqlite3.Error as e:
+            raise JobStoreError(f"Failed to open job store {path}: {e}")
+
+    def _row(self, job: Job) -> tuple:
+        """Column values of a job; the owner is only used for new rows."""
+        return (
+            job.job_id,
+            job.status.value,
+            job.created_at.isoformat(),
+            job.updated_at.isoformat(),
+            self.owner,
+            job.model_dump_json(),
+        )
+
+    def _write(self, jobs: list[Job]) -> None:
+        """Write jobs in one transaction. Caller must hold the lock."""
+        try:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    # The owner only changes when recover() claims the job,
+                    # not when a worker or another server saves a snapshot
+                    "INSERT INTO jobs "
+                    "(job_id, status, created_at, updated_at, owner, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (job_id) DO UPDATE SET status = excluded.status, "
+                    "created_at = excluded.created_at, updated_at = excluded.updated_at, "
+                    "data = excluded.data",
+                    [self._row(job) for job in jobs]
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Job store write failed: {e}")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID."""
+        with self._lock:
+            dirty = self._dirty.get(job_id)
+            if dirty is not None:
+                return dirty
+            row = self._conn.execute(
+                "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return Job.model_validate_json(row[0]) if row else None
+
+    def save(self, job: Job) -> None:
+        """Write a job and any batched progress now."""
+        with self._lock:
+            self._dirty[job.job_id] = job
+            self._flush_locked()
+
+    def save_progress(self, job: Job) -> None:
+        """Batch a progress update; written at most once per flush interval."""
+        with self._lock:
+            self._dirty[job.job_id] = job
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        """Write batched progress updates. Caller must hold the lock."""
+        if self._dirty:
+            self._write(list(self._dirty.values()))
+            self._dirty.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self) -> None:
+        """Write batched progress updates."""
+        with self._lock:
+            self._flush_locked()
+
+    def delete(self, job_id: str) -> None:
+        """Delete a job."""
+        with self._lock:
+            self._dirty.pop(job_id, None)
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM cancel_requests WHERE job_id = ?", (job_id,))
+
+    def list_by_status(self, statuses: tuple[JobStatus, ...]) -> list[Job]:
+        """Get jobs in any of the given statuses."""
+        placeholders = ", ".join("?" * len(statuses))
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                f"SELECT data FROM jobs WHERE status IN ({placeholders})",
+                [status.value for status in statuses]
+            ).fetchall()
+        return [Job.model_validate_json(row[0]) for row in rows]
+
+    def list_expired(
+        self,
+        created_before: datetime,
+        statuses: tuple[JobStatus, ...]
+    ) -> list[str]:
+        """Get IDs of jobs created before a time in any of the given statuses."""
+        placeholders = ", ".join("?" * len(statuses))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT job_id FROM jobs WHERE created_at < ? AND status IN ({placeholders})",
+                [created_before.isoformat()] + [status.value for status in statuses]
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count_by_status(self) -> dict[str, int]:
+        """Count jobs per status."""
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def _owner_alive(self, owner: str) -> bool:
+        """Check if the process that owns a job is still running."""
+        host, _, pid = owner.rpartition(":")
+        if host != socket.gethostname():
+            # Cannot tell for another machine; leave its jobs alone
+            return True
+        if not pid.isdigit() or int(pid) == os.getpid():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def recover(self) -> list[Job]:
+        """
+        Claim in-flight jobs whose owning process is gone.
+
+        The claim runs in one write transaction, so when several server
+        processes start together each orphaned job goes to exactly one.
+
+        Returns:
+            Claimed jobs as last written by their previous owner
+        """
+        placeholders = ", ".join("?" * len(IN_FLIGHT_STATUSES))
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    rows = self._conn.execute(
+                        f"SELECT job_id, owner, data FROM jobs "
+                        f"WHERE status IN ({placeholders})",
+                        [status.value for status in IN_FLIGHT_STATUSES]
+                    ).fetchall()
+                    orphans = [row for row in rows if not self._owner_alive(row[1])]
+                    self._conn.executemany(
+                        "UPDATE jobs SET owner = ? WHERE job_id = ?",
+                        [(self.owner, row[0]) for row in orphans]
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Job recovery failed: {e}")
+                return []
+        return [Job.model_validate_json(row[2]) for row in orphans]
+
+    def request_cancel(self, job_id: str) -> None:
+        """Ask the process that owns a job to cancel it."""
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cancel_requests (job_id, requested_at) "
+                    "VALUES (?, ?)",
+                    (job_id, datetime.now().isoformat())
+                )
+            except sqlite3.Error as e:
+                raise JobStoreError(f"Failed to request cancellation of {job_id}: {e}")
+
+    def take_cancel_requests(self) -> list[str]:
+        """Get and clear cancel requests for jobs this process owns."""
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    rows = self._conn.execute(
+                        "SELECT r.job_id FROM cancel_requests r "
+                        "JOIN jobs j ON j.job_id = r.job_id WHERE j.owner = ?",
+                        (self.owner,)
+                    ).fetchall()
+                    self._conn.executemany(
+                        "DELETE FROM cancel_requests WHERE job_id = ?", rows
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Reading cancel requests failed: {e}")
+                return []
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        """Flush and close the database."""
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+def create_job_store() -> JobStore:
+    """
+    Create the job store selected in settings.
+
+    Returns:
+        JobStore (in-memory if SQLite cannot be opened)
+    """
+    if settings.job_store == "sqlite":
+        try:
+            return SqliteJobStore(
+                settings.job_store_path, settings.job_store_flush_interval_seconds
+            )
+        except JobStoreError as e:
+            logger.warning(f"{e}; keeping jobs in memory")
+    return InMemoryJobStore()
+
+
+# Singleton instance
+job_store = create_job_store()
@@ -0,0 +1,269 @@
+"""Staged extraction pipeline: decode -> separate -> encode."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Callable
+
+from app.config import settings
+from app.logging_config import logger
+from app.services.shared_buffers import shared_buffers
+from app.services.vocal_extractor import vocal_extractor, RetryableExtractionError
+from app.services.worker_pool import separation_pool
+
+
+class _PipelineJob:
+    """State of one job moving through the pipeline stages."""
+
+    def __init__(
+        self,
+        job_id: str,
+        input_path: str,
+        profile: Optional[str],
+        progress_callback: Optional[Callable[..., None]],
+        future: asyncio.Future,
+        preview_only: bool = False,
+        stems: Optional[list[str]] = None
+    ):
+        self.job_id = job_id
+        self.input_path = input_path
+        self.profile = profile
+        self.preview_only = preview_only
+        self.stems = stems
+        self.progress_callback = progress_callback
+        self.future = future
+        self.decoded: Optional[dict] = None
+        self.output: Optional[dict] = None
+        self.separated: Optional[dict] = None
+
+    def release_input(self) -> None:
+        """Return the decoded input's shared buffer to the pool."""
+        if self.decoded:
+            shared_buffers.release(self.decoded.get("buffer"))
+            self.decoded = None
+
+    def release(self) -> None:
+        """Return every shared buffer the job still holds."""
+        self.release_input()
+        shared_buffers.release(self.output)
+        self.output = None
+
+
+class ExtractionPipeline:
+    """
+    Runs extraction as three stages connected by bounded queues.
+
+    Decoding the next job and encoding the previous one happen on their own
+    threads while the current job is in the model, so the separation
+    workers never wait on ffmpeg or disk. Full queues block the stage in
+    front of them, which bounds the number of decoded tracks held at once.
+    Decoded input and separated stems travel between stages (and worker
+    processes) as shared-memory handles, released as soon as the next
+    stage is done with them.
+    """
+
+    def __init__(self):
+        """Initialize extraction pipeline."""
+        self.decode_workers = max(1, settings.pipeline_decode_workers)
+        # Set on start, once autotuning has sized the separation pool
+        self.separate_workers = 0
+        self.encode_workers = max(1, settings.pipeline_encode_workers)
+        self.queue_size = max(1, settings.pipeline_queue_size)
+        self._decode_queue: Optional[asyncio.Queue] = None
+        self._separate_queue: Optional[asyncio.Queue] = None
+        self._encode_queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        """Check if stage workers are running."""
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Start the stage workers on the running event loop."""
+        if self.running:
+            return
+
+        # Without worker processes every running job separates at once so
+        # their segments share the batcher
+        self.separate_workers = settings.pipeline_separate_workers or max(
+            1, separation_pool.size if separation_pool.enabled else settings.max_concurrent_jobs
+        )
+        self._decode_queue = asyncio.Queue()
+        self._separate_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._encode_queue = asyncio.Queue(maxsize=self.queue_size)
+        # Decode and encode are I/O bound and get their own threads
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.decode_workers + self.encode_workers,
+            thread_name_prefix="pipeline"
+        )
+
+        stages = [
+            (self.decode_workers, self._decode_queue, self._separate_queue, self._decode),
+            (self.separate_workers, self._separate_queue, self._encode_queue, self._separate),
+            (self.encode_workers, self._encode_queue, None, self._encode),
+        ]
+        for workers, inbox, outbox, work in stages:
+            for _ in range(workers):
+                self._tasks.append(asyncio.create_task(self._run_stage(inbox, outbox, work)))
+        logger.info(
+            f"Extraction pipeline started (decode={self.decode_workers}, "
+            f"separate={self.separate_workers}, encode={self.encode_workers})"
+        )
+
+    async def stop(self) -> None:
+        """Stop the stage workers."""
+        if not self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        logger.info("Extraction pipeline stopped")
+
+    async def extract(
+        self,
+        job_id: str,
+        input_path: str,
+        progress_callback: Optional[Callable[..., None]] = None,
+        profile: Optional[str] = None,
+        preview_only: bool = False,
+        stems: Optional[list[str]] = None
+    ) -> dict[str, str]:
+        """
+        Extract stems through the pipeline.
+
+        Args:
+            job_id: Job ID
+            input_path: Path to input audio file
+            progress_callback: Optional callback for progress updates
+            profile: Separation profile name
+            preview_only: Only separate the preview window
+            stems: Stems to write (all model stems if None)
+
+        Returns:
+            Mapping of stem name to output file path
+
+        Raises:
+            VocalExtractorError: If any stage fails
+        """
+        if vocal_extractor.backend == "subprocess":
+            # The demucs CLI decodes and writes its own files
+            return await separation_pool.extract_stems(
+                input_path, job_id, progress_callback, profile, preview_only, stems
+            )
+
+        loop = asyncio.get_running_loop()
+        if separation_pool.enabled and not separation_pool.started:
+            await loop.run_in_executor(None, separation_pool.start)
+        self.start()
+        future = loop.create_future()
+        await self._decode_queue.put(
+            _PipelineJob(
+                job_id, input_path, profile, progress_callback, future, preview_only, stems
+            )
+        )
+        return await future
+
+    async def _run_stage(
+        self,
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        work: Callable
+    ) -> None:
+        """Take jobs from inbox, process them and pass them on."""
+        while True:
+            job: _PipelineJob = await inbox.get()
+            try:
+                if job.future.done():
+                    self._drop(job)
+                    continue
+                result = await work(job)
+                if job.future.done():
+                    # Cancelled while this stage was running
+                    self._drop(job)
+                elif outbox is not None:
+                    await outbox.put(job)
+                else:
+                    job.release()
+                    job.future.set_result(result)
+            except asyncio.CancelledError:
+                job.release()
+                raise
+            except Exception as e:
+                if job.future.done():
+                    self._drop(job)
+                else:
+                    job.release()
+                    job.future.set_exception(e)
+            finally:
+                inbox.task_done()
+
+    def _drop(self, job: _PipelineJob) -> None:
+        """Discard a job whose caller went away, with any partial output."""
+        job.release()
+        if job.future.cancelled():
+            vocal_extractor.discard_outputs(job.job_id)
+
+    async def _decode(self, job: _PipelineJob) -> None:
+        """Decode stage."""
+        loop = asyncio.get_running_loop()
+        job.decoded = await loop.run_in_executor(
+            self._executor,
+            vocal_extractor.decode_input,
+            job.input_path,
+            job.job_id,
+            job.profile
+        )
+
+    async def _separate(self, job: _PipelineJob) -> None:
+        """Separation stage; interrupted runs resume from their checkpoint."""
+        job.output = vocal_extractor.allocate_output(job.decoded, job.preview_only, job.stems)
+        attempt = 0
+        while True:
+            try:
+                job.separated = await separation_pool.separate(
+                    job.input_path,
+                    job.job_id,
+                    job.progress_callback,
+                    job.profile,
+                    job.decoded,
+                    job.preview_only,
+                    job.stems,
+                    job.output
+                )
+                job.release_input()
+                return
+            except RetryableExtractionError as e:
+                attempt += 1
+                if attempt > settings.separation_max_retries:
+                    raise
+                logger.warning(f"Job {job.job_id} interrupted ({e}), retrying")
+
+    async def _encode(self, job: _PipelineJob) -> dict[str, str]:
+        """Encode stage."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            vocal_extractor.encode_output,
+            job.job_id,
+            job.separated,
+            job.progress_callback
+        )
+
+    def get_stats(self) -> dict:
+        """Get pipeline statistics."""
+        if not self.running:
+            return {"running": False}
+        return {
+            "running": True,
+            "decode_queue": self._decode_queue.qsize(),
+            "separate_queue": self._separate_queue.qsize(),
+            "encode_queue": self._encode_queue.qsize(),
+            "shared_buffers": shared_buffers.get_stats(),
+        }
+
+
+# Singleton instance
+extraction_pipeline = ExtractionPipeline()
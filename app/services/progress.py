@@ -0,0 +1,130 @@
+"""Segment-based progress tracking for separation jobs."""
+import time
+from typing import Callable, Optional
+
+
+class SegmentProgress:
+    """
+    Reports real separation progress as segments finish.
+
+    Progress is mapped onto [start_progress, end_progress] and callbacks are
+    throttled to at most max_updates_per_second. Per-segment timings are
+    recorded so ETA and throughput can be derived.
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[..., None]],
+        start_progress: float = 0.0,
+        end_progress: float = 100.0,
+        max_updates_per_second: float = 2.0
+    ):
+        """
+        Initialize progress tracker.
+
+        Args:
+            callback: Called as callback(progress, **details)
+            start_progress: Progress value reported before the first segment
+            end_progress: Progress value reported after the last segment
+            max_updates_per_second: Callback rate limit
+        """
+        self.callback = callback
+        self.start_progress = start_progress
+        self.end_progress = end_progress
+        self.min_interval = 1.0 / max_updates_per_second if max_updates_per_second > 0 else 0.0
+        self.total = 0
+        self.done = 0
+        self._resumed = 0
+        self.segment_seconds = 0.0
+        self.segment_times: list[float] = []
+        # Extra fields sent with every report
+        self.details: dict = {}
+        self._started_at = time.monotonic()
+        self._last_segment_at = self._started_at
+        self._last_report_at = 0.0
+
+    def begin(self, total: int, segment_seconds: float = 0.0, done: int = 0) -> None:
+        """
+        Start tracking a run.
+
+        Args:
+            total: Total number of segments to process
+            segment_seconds: Audio duration covered by one segment
+            done: Segments already finished (when resuming)
+        """
+        self.total = total
+        self.done = done
+        self._resumed = done
+        self.segment_seconds = segment_seconds
+        self.segment_times = []
+        self._started_at = time.monotonic()
+        self._last_segment_at = self._started_at
+        self._report(force=True)
+
+    def segment_done(self, count: int = 1) -> None:
+        """Record finished segments and report progress if due."""
+        now = time.monotonic()
+        elapsed = now - self._last_segment_at
+        self.segment_times.extend([elapsed / count] * count)
+        self._last_segment_at = now
+        self.done = min(self.total, self.done + count)
+        self._report(force=self.done >= self.total)
+
+    def notify(self, **details) -> None:
+        """Attach details to every later report and send one right away."""
+        self.details.update(details)
+        self._report(force=True)
+
+    @property
+    def fraction(self) -> float:
+        """Finished fraction of the run (0-1)."""
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def progress(self) -> float:
+        """Progress mapped onto the configured range."""
+        span = self.end_progress - self.start_progress
+        return self.start_progress + span * self.fraction
+
+    @property
+    def segments_per_second(self) -> Optional[float]:
+        """Measured segment throughput."""
+        elapsed = self._last_segment_at - self._started_at
+        finished = self.done - self._resumed
+        if not finished or elapsed <= 0:
+            return None
+        return finished / elapsed
+
+    @property
+    def realtime_factor(self) -> Optional[float]:
+        """Audio seconds separated per wall-clock second."""
+        rate = self.segments_per_second
+        if rate is None or not self.segment_seconds:
+            return None
+        return rate * self.segment_seconds
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Estimated remaining time for this run."""
+        rate = self.segments_per_second
+        if rate is None:
+            return None
+        return (self.total - self.done) / rate
+
+    def _report(self, force: bool = False) -> None:
+        """Invoke the callback, honoring the rate limit."""
+        if not self.callback:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_report_at < self.min_interval:
+            return
+        self._last_report_at = now
+
+        eta = self.eta_seconds
+        self.callback(
+            self.progress,
+            segments_done=self.done,
+            segments_total=self.total,
+            eta_seconds=round(eta, 1) if eta is not None else None,
+            **self.details,
+        )
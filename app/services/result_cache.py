@@ -0,0 +1,310 @@
+"""Content-addressed cache of separation results."""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+from app.logging_config import logger
+from app.services.file_lock import locked
+
+
+class ResultCache:
+    """
+    Stores separated stems keyed by a hash of the input audio, the model
+    name and the separation parameters.
+
+    The index is persisted as JSON next to the cached files so it survives
+    restarts. Entries are evicted by LRU or LFU once the size cap is hit.
+    Processes sharing the cache directory (server processes and workers)
+    change the index only under a file lock and after reloading it, so
+    none of them drops entries another one added.
+    """
+
+    INDEX_FILENAME = "index.json"
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self):
+        """Initialize result cache and load the persisted index."""
+        self.enabled = settings.cache_enabled
+        self.cache_dir = settings.cache_dir
+        self.max_size_bytes = settings.cache_max_size_mb * 1024 * 1024
+        self.policy = settings.cache_eviction_policy
+        self._index: dict[str, dict] = {}
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.enabled:
+            self._load_index()
+
+    @property
+    def _index_path(self) -> Path:
+        return self.cache_dir / self.INDEX_FILENAME
+
+    def _load_index(self) -> None:
+        """Load index from disk, dropping entries whose files are gone."""
+        if not self._index_path.exists():
+            return
+        index = self._read_index()
+        if index is None:
+            return
+        self._index = index
+        self._mtime = self._index_path.stat().st_mtime_ns
+        logger.info(f"Loaded result cache index ({len(self._index)} entries)")
+
+    def _refresh(self) -> None:
+        """Reload the index if another process changed it. Caller must hold the lock."""
+        try:
+            mtime = self._index_path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        index = self._read_index()
+        if index is not None:
+            self._index = index
+        self._mtime = mtime
+
+    def _read_index(self) -> Optional[dict[str, dict]]:
+        """
+        Read the persisted index.
+
+        Entries whose files were removed outside the cache are left out.
+
+        Returns:
+            Index by cache key, or None if it could not be read
+        """
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read result cache index: {e}")
+            return None
+
+        return {
+            key: entry for key, entry in index.items()
+            if entry.get("files")
+            and all((self.cache_dir / name).exists() for name in entry["files"].values())
+        }
+
+    def _save_index(self) -> None:
+        """Persist index atomically. Caller must hold the lock."""
+        tmp_path = self._index_path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self._index_path)
+            self._mtime = self._index_path.stat().st_mtime_ns
+        except OSError as e:
+            logger.warning(f"Could not write result cache index: {e}")
+
+    def hash_file(self, file_path: str) -> str:
+        """Compute SHA-256 of a file's contents."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def make_key(self, file_path: str, model_name: str, params: dict) -> str:
+        """
+        Build cache key for an input file and separation settings.
+
+        Args:
+            file_path: Path to input audio file
+            model_name: Demucs model name
+            params: Separation parameters affecting the output
+
+        Returns:
+            Hex digest identifying the result
+        """
+        payload = json.dumps(
+            {"audio": self.hash_file(file_path), "model": model_name, "params": params},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, dest_paths: dict[str, str]) -> dict[str, str]:
+        """
+        Materialize cached stems.
+
+        The lookup counts as one hit if every stem is cached and one miss
+        otherwise. Files are linked or copied outside the locks.
+
+        Args:
+            key: Cache key
+            dest_paths: Mapping of stem name (e.g. vocals) to where to place it
+
+        Returns:
+            Mapping of stem name to path for the stems that were cached
+        """
+        if not self.enabled:
+            return {}
+
+        with self._lock, locked(self._index_path):
+            self._refresh()
+            entry = self._index.get(key)
+            files = {
+                stem: entry["files"][stem]
+                for stem in dest_paths
+                if entry and stem in entry["files"]
+            }
+
+        found = {}
+        unreadable = False
+        for stem, filename in files.items():
+            try:
+                self._link_or_copy(self.cache_dir / filename, Path(dest_paths[stem]))
+            except OSError as e:
+                logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+                unreadable = True
+                break
+            found[stem] = dest_paths[stem]
+
+        removed = []
+        with self._lock, locked(self._index_path):
+            self._refresh()
+            entry = self._index.get(key)
+            if unreadable:
+                removed = self._remove_entry(key)
+                found = {}
+            elif entry and found:
+                entry["last_access"] = time.time()
+                entry["hits"] = entry.get("hits", 0) + 1
+            if len(found) == len(dest_paths):
+                self.hits += 1
+            else:
+                self.misses += 1
+            if removed or found:
+                self._save_index()
+        self._unlink(removed)
+        return found
+
+    def put(self, key: str, stem_files: dict[str, str]) -> None:
+        """
+        Store separated stems under a cache key.
+
+        Stems already cached under the key are kept, so an entry grows as
+        jobs request different stems of the same input. Files are linked or
+        copied outside the locks.
+
+        Args:
+            key: Cache key
+            stem_files: Mapping of stem name to file path
+        """
+        if not self.enabled:
+            return
+
+        files = {}
+        sizes = {}
+        try:
+            for stem, file_path in stem_files.items():
+                filename = f"{key}_{stem}{Path(file_path).suffix}"
+                self._link_or_copy(Path(file_path), self.cache_dir / filename)
+                files[stem] = filename
+                sizes[stem] = (self.cache_dir / filename).stat().st_size
+        except OSError as e:
+            logger.warning(f"Could not store result in cache: {e}")
+            self._unlink(list(files.values()))
+            return
+
+        with self._lock, locked(self._index_path):
+            now = time.time()
+            self._refresh()
+            entry = self._index.get(key)
+            if entry:
+                for stem, filename in entry["files"].items():
+                    if stem in files:
+                        continue
+                    try:
+                        sizes[stem] = (self.cache_dir / filename).stat().st_size
+                    except OSError:
+                        continue
+                    files[stem] = filename
+            self._index[key] = {
+                "files": files,
+                "size": sum(sizes.values()),
+                "created": entry["created"] if entry else now,
+                "last_access": now,
+                "hits": entry["hits"] if entry else 0,
+            }
+            evicted = self._evict()
+            self._save_index()
+        self._unlink(evicted)
+
+    def _evict(self) -> list[str]:
+        """
+        Evict entries until the cache fits. Caller must hold the lock.
+
+        Returns:
+            Files of the evicted entries, to be deleted once the lock is released
+        """
+        evicted = []
+        total = sum(entry["size"] for entry in self._index.values())
+        while total > self.max_size_bytes and self._index:
+            if self.policy == "lfu":
+                victim = min(
+                    self._index,
+                    key=lambda k: (self._index[k]["hits"], self._index[k]["last_access"])
+                )
+            else:
+                victim = min(self._index, key=lambda k: self._index[k]["last_access"])
+            total -= self._index[victim]["size"]
+            evicted.extend(self._remove_entry(victim))
+            self.evictions += 1
+            logger.info(f"Evicted cache entry: {victim}")
+        return evicted
+
+    def _remove_entry(self, key: str) -> list[str]:
+        """
+        Drop an entry from the index. Caller must hold the lock.
+
+        Returns:
+            Files of the entry, to be deleted once the lock is released
+        """
+        entry = self._index.pop(key, None)
+        return list(entry["files"].values()) if entry else []
+
+    def _unlink(self, filenames: list[str]) -> None:
+        """Delete cached files."""
+        for filename in filenames:
+            (self.cache_dir / filename).unlink(missing_ok=True)
+
+    @staticmethod
+    def _link_or_copy(src: Path, dest: Path) -> None:
+        """Hard-link src to dest, falling back to a copy across filesystems."""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.unlink(missing_ok=True)
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
+
+    def get_stats(self) -> dict:
+        """Get cache statistics."""
+        with self._lock:
+            self._refresh()
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._index),
+                "size_mb": round(
+                    sum(entry["size"] for entry in self._index.values()) / (1024 * 1024), 2
+                ),
+                "max_size_mb": settings.cache_max_size_mb,
+                "policy": self.policy,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+# Singleton instance
+result_cache = ResultCache()
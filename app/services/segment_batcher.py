@@ -0,0 +1,146 @@
+"""Cross-job micro-batching of model segments."""
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+import torch
+
+from app.logging_config import logger
+
+
+class SegmentBatcher:
+    """
+    Collects fixed-length segments from all active jobs and runs them
+    through the model as one batched forward pass.
+
+    Priority segments (e.g. a job's preview window) are taken before any
+    normal segment already waiting.
+    """
+
+    PRIORITY_HIGH = 0
+    PRIORITY_NORMAL = 1
+    # Stop requests sort after all queued work
+    _PRIORITY_STOP = 2
+
+    def __init__(
+        self,
+        run_batch: Callable[[str, torch.Tensor], torch.Tensor],
+        max_batch_size: int,
+        max_wait_ms: float
+    ):
+        """
+        Initialize segment batcher.
+
+        Args:
+            run_batch: Function running a model on a (batch, channels, samples)
+                tensor and returning (batch, sources, channels, samples)
+            max_batch_size: Maximum number of segments per forward pass
+            max_wait_ms: Maximum time to wait for a batch to fill up
+        """
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches_run = 0
+        self.segments_run = 0
+
+    def submit(
+        self,
+        model_key: str,
+        segment: torch.Tensor,
+        priority: bool = False
+    ) -> Future:
+        """
+        Queue a segment for separation.
+
+        Args:
+            model_key: Resident model to run the segment through
+            segment: Tensor of shape (channels, samples)
+            priority: Run ahead of normal segments
+
+        Returns:
+            Future resolving to a tensor of shape (sources, channels, samples)
+        """
+        self._ensure_started()
+        future: Future = Future()
+        level = self.PRIORITY_HIGH if priority else self.PRIORITY_NORMAL
+        self._put(level, (model_key, segment, future))
+        return future
+
+    def _put(self, level: int, item: Optional[tuple]) -> None:
+        """Queue an item; the sequence number keeps FIFO order per level."""
+        self._queue.put((level, next(self._sequence), item))
+
+    def stop(self) -> None:
+        """Stop the batching thread."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._put(self._PRIORITY_STOP, None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _ensure_started(self) -> None:
+        """Start the batching thread on first use."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> Optional[list]:
+        """Block for the first segment, then gather more until full or timed out."""
+        _, _, first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                _, _, item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                # Let the main loop see the stop request after this batch
+                self._put(self._PRIORITY_STOP, None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        """Batching loop."""
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+
+            # Only segments for the same model and length can be stacked
+            groups: dict[tuple, list] = {}
+            for model_key, segment, future in batch:
+                key = (model_key, tuple(segment.shape))
+                groups.setdefault(key, []).append((segment, future))
+
+            for (model_key, _), items in groups.items():
+                futures = [future for _, future in items]
+                try:
+                    stacked = torch.stack([segment for segment, _ in items])
+                    results = self._run_batch(model_key, stacked)
+                except Exception as e:
+                    logger.error(f"Batched separation failed ({model_key}): {e}")
+                    for future in futures:
+                        future.set_exception(e)
+                    continue
+
+                self.batches_run += 1
+                self.segments_run += len(items)
+                for future, result in zip(futures, results):
+                    future.set_result(result)
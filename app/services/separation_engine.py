@@ -0,0 +1,473 @@
+"""Resident in-process Demucs separation engine."""
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from demucs.audio import AudioFile
+
+from app.config import settings
+from app.logging_config import logger
+from app.services.audio_io import (
+    DecodedAudio, StreamingAudio, AudioDecodeError, probe_duration
+)
+from app.services.checkpoint import SeparationCheckpoint
+from app.services.inference_backend import (
+    InferenceBackend, InferenceBackendError, load_backend
+)
+from app.services.progress import SegmentProgress
+from app.services.segment_batcher import SegmentBatcher
+from app.services.silence import find_silent_spans, is_silent, silence_gain
+from app.services.thread_budget import thread_budget
+
+
+class SeparationEngineError(Exception):
+    """Custom exception for separation engine errors."""
+    pass
+
+
+class SeparationTimeoutError(SeparationEngineError):
+    """Separation exceeded the job timeout (resumable from a checkpoint)."""
+    pass
+
+
+class SeparationCancelledError(SeparationEngineError):
+    """Separation was stopped because its job was cancelled."""
+    pass
+
+
+def _transition_weight(length: int) -> torch.Tensor:
+    """Triangular overlap-add window, the same shape demucs uses."""
+    weight = torch.cat([
+        torch.arange(1, length // 2 + 1),
+        torch.arange(length - length // 2, 0, -1),
+    ]).float()
+    return weight / weight.max()
+
+
+def plan_segments(
+    length: int,
+    segment_length: int,
+    overlap: float,
+    shifts: int,
+    max_shift: int,
+    seed: int = 0
+) -> list[int]:
+    """
+    Compute segment start offsets for overlap-add separation.
+
+    Each random shift adds a full grid of segments offset to the left by up
+    to max_shift samples, which is equivalent to the demucs shift trick.
+
+    Args:
+        length: Track length in samples
+        segment_length: Segment length in samples
+        overlap: Overlap ratio between consecutive segments
+        shifts: Number of random shifts (0 disables shifting)
+        max_shift: Maximum shift in samples
+        seed: Seed for the shift offsets
+
+    Returns:
+        Sorted list of segment start offsets (may be negative)
+    """
+    stride = max(1, int((1 - overlap) * segment_length))
+    if shifts <= 0:
+        return list(range(0, length, stride))
+
+    rng = random.Random(seed)
+    starts = []
+    for _ in range(shifts):
+        shift = rng.randint(0, max_shift)
+        starts.extend(range(-shift, length, stride))
+    return sorted(starts)
+
+
+class SeparationEngine:
+    """Keeps Demucs models resident in memory and separates decoded audio."""
+
+    def __init__(self):
+        """Initialize separation engine."""
+        self.device = settings.torch_device
+        self.backend = settings.inference_backend
+        self._models: dict[str, InferenceBackend] = {}
+        self._lock = threading.Lock()
+        self.batcher = SegmentBatcher(
+            self._run_batch,
+            max_batch_size=settings.separation_batch_size,
+            max_wait_ms=settings.separation_batch_wait_ms
+        )
+
+    @staticmethod
+    def model_key(model_name: str, quantize: bool = False) -> str:
+        """Key identifying a resident model variant."""
+        return f"{model_name}:int8" if quantize else model_name
+
+    def load_model(self, model_name: str, quantize: bool = False) -> InferenceBackend:
+        """
+        Load a Demucs model once and keep it resident.
+
+        Args:
+            model_name: Pretrained Demucs model name (e.g. htdemucs)
+            quantize: Apply dynamic int8 quantization (CPU only)
+
+        Returns:
+            Inference backend exposing samplerate, audio_channels and sources
+
+        Raises:
+            SeparationEngineError: If the model cannot be loaded
+        """
+        key = self.model_key(model_name, quantize)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model
+
+            logger.info(f"Loading Demucs model: {key} ({self.backend})")
+            try:
+                model = load_backend(self.backend, model_name, key, quantize, self.device)
+            except InferenceBackendError as e:
+                raise SeparationEngineError(str(e))
+            except Exception as e:
+                raise SeparationEngineError(f"Failed to load model {model_name}: {e}")
+
+            self._models[key] = model
+            logger.info(f"Demucs model ready: {key} ({model.name})")
+            return model
+
+    def is_loaded(self, model_name: str, quantize: bool = False) -> bool:
+        """Check if a model is already resident."""
+        return self.model_key(model_name, quantize) in self._models
+
+    def open_audio(
+        self,
+        input_path: str,
+        model: InferenceBackend,
+        streaming: bool = False,
+        decoded: Optional[dict] = None,
+        samplerate: Optional[int] = None,
+        channels: Optional[int] = None
+    ) -> Union[DecodedAudio, StreamingAudio]:
+        """
+        Open an audio file in the model's sample rate and channel layout.
+
+        Args:
+            input_path: Path to input audio file
+            model: Model whose format to match
+            streaming: Decode windows on demand instead of the whole track
+            decoded: Audio decoded ahead of time, as a raw PCM file (path)
+                or a mapped (channels, samples) array (array), with its
+                samplerate and channels; used if it matches the requested
+                format
+            samplerate: Decode sample rate (model's if None)
+            channels: Decode channel count (model's if None)
+
+        Returns:
+            DecodedAudio or StreamingAudio
+        """
+        path = Path(input_path)
+        samplerate = samplerate or model.samplerate
+        channels = channels or model.audio_channels
+        try:
+            if (
+                decoded
+                and decoded["samplerate"] == samplerate
+                and decoded["channels"] == channels
+            ):
+                if "array" in decoded:
+                    return DecodedAudio(path, torch.from_numpy(decoded["array"]), samplerate)
+                return DecodedAudio.from_raw(path, Path(decoded["path"]), samplerate, channels)
+            if streaming:
+                return StreamingAudio(path, samplerate, channels)
+            wav = AudioFile(path).read(
+                streams=0,
+                samplerate=samplerate,
+                channels=channels
+            )
+            return DecodedAudio(path, wav, samplerate)
+        except Exception as e:
+            raise SeparationEngineError(f"Failed to decode audio: {e}")
+
+    def use_streaming(self, input_path: str) -> bool:
+        """Check if a track is long enough to be separated in streaming mode."""
+        duration = probe_duration(Path(input_path))
+        return duration is not None and duration > settings.streaming_threshold_seconds
+
+    def _run_batch(self, model_key: str, batch: torch.Tensor) -> torch.Tensor:
+        """Run one forward pass over a batch of equal-length segments."""
+        thread_budget.rebalance()
+        return self._models[model_key].forward(batch)
+
+    def separate(
+        self,
+        input_path: str,
+        model_name: str,
+        shifts: int = 1,
+        overlap: float = 0.25,
+        segment: Optional[float] = None,
+        stems: Optional[list[str]] = None,
+        progress: Optional[SegmentProgress] = None,
+        work_dir: Optional[Path] = None,
+        quantize: bool = False,
+        decoded: Optional[dict] = None,
+        preview_samples: int = 0,
+        on_preview: Optional[Callable[[dict[str, torch.Tensor]], None]] = None,
+        max_samples: Optional[int] = None,
+        samplerate: Optional[int] = None,
+        mono: bool = False,
+        output_array: Optional[np.ndarray] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> dict[str, torch.Tensor]:
+        """
+        Separate an audio file into sources in-process.
+
+        Segments are submitted to the shared batcher so that concurrent jobs
+        run through the model together, then overlap-added back here in
+        order. Samples no later segment can touch are finalized into the
+        output buffer. With a work directory the output is memory-mapped and
+        checkpointed, and long tracks are decoded in windows, so peak memory
+        does not grow with track length.
+
+        Args:
+            input_path: Path to input audio file
+            model_name: Demucs model name
+            shifts: Number of random shifts to average
+            overlap: Overlap ratio between segments
+            segment: Segment length in seconds (capped at the model maximum,
+                ignored by exported backends traced at a fixed length)
+            stems: Sources to keep (all model sources if None)
+            progress: Optional tracker notified as segments finish
+            work_dir: Directory for the memory-mapped output and checkpoints
+                (None keeps everything in memory)
+            quantize: Use the dynamic int8 quantized model
+            decoded: Audio produced by the pipeline's decode stage
+            preview_samples: Length of the preview window; its segments are
+                batched with priority
+            on_preview: Called with the separated preview window as soon as
+                it is final
+            max_samples: Stop after this many samples (preview-only runs)
+            samplerate: Internal sample rate (model's if None). A lower rate
+                covers more audio per segment at reduced fidelity.
+            mono: Separate a mono downmix; it is fed to the model on every
+                channel and the outputs are averaged back to mono
+            output_array: Caller-provided (stems, channels, samples) buffer,
+                e.g. shared memory; used instead of the work directory's
+                output (without checkpoints) if its shape matches
+            should_stop: Polled before each segment; separation is abandoned
+                once it returns True
+
+        Returns:
+            Mapping of source name to tensor of shape (channels, samples)
+
+        Raises:
+            SeparationEngineError: If separation fails
+            SeparationTimeoutError: If separation exceeds the job timeout
+            SeparationCancelledError: If should_stop returned True
+        """
+        model = self.load_model(model_name, quantize)
+        model_key = self.model_key(model_name, quantize)
+        stems = stems or list(model.sources)
+        unknown = set(stems) - set(model.sources)
+        if unknown:
+            raise SeparationEngineError(f"Unknown stems for {model_name}: {sorted(unknown)}")
+        stem_index = torch.tensor([model.sources.index(stem) for stem in stems])
+
+        samplerate = samplerate or model.samplerate
+        streaming = (
+            work_dir is not None and decoded is None and self.use_streaming(input_path)
+        )
+        audio = self.open_audio(
+            input_path, model, streaming, decoded, samplerate, 1 if mono else None
+        )
+        channels, length = audio.channels, audio.length
+        if max_samples:
+            length = min(length, max_samples)
+        preview_samples = min(preview_samples, length) if on_preview else 0
+        if streaming:
+            logger.info(f"Streaming separation of {length / samplerate:.0f}s track")
+
+        silent_spans = []
+        if settings.silence_skip_enabled:
+            silent_spans = find_silent_spans(
+                audio.rms_db,
+                samplerate,
+                settings.silence_threshold_db,
+                settings.silence_min_duration_seconds
+            )
+        fade = int(settings.silence_fade_ms * samplerate / 1000)
+        mean, std = audio.mean, audio.std
+
+        segment_length = model.segment_length
+        if segment and not model.fixed_shape:
+            segment_length = min(int(segment * samplerate), segment_length)
+        weight = _transition_weight(segment_length)
+        starts = plan_segments(
+            length, segment_length, overlap, shifts,
+            max_shift=int(0.5 * samplerate)
+        )
+
+        # Segments lying entirely in silence never reach the model
+        if silent_spans:
+            total_segments = len(starts)
+            starts = [
+                start for start in starts
+                if not is_silent(start, start + segment_length, silent_spans)
+            ]
+            skipped_seconds = sum(
+                min(end, length) - start for start, end in silent_spans if start < length
+            ) / samplerate
+            logger.info(
+                f"Silence skip: {total_segments - len(starts)}/{total_segments} segments, "
+                f"{skipped_seconds:.1f}s of silence"
+            )
+            if progress:
+                progress.details["silence_skipped_seconds"] = round(skipped_seconds, 2)
+
+        checkpoint = None
+        state = None
+        if output_array is not None and output_array.shape == (len(stems), channels, length):
+            output = torch.from_numpy(output_array)
+        elif work_dir is not None:
+            input_stat = Path(input_path).stat()
+            checkpoint = SeparationCheckpoint(work_dir, {
+                "input_size": input_stat.st_size,
+                "input_mtime": input_stat.st_mtime_ns,
+                "model": model_key,
+                "stems": stems,
+                "length": length,
+                "samplerate": samplerate,
+                "channels": channels,
+                "segment_length": segment_length,
+                "starts": len(starts),
+                "shifts": shifts,
+                "overlap": overlap,
+            })
+            if settings.checkpoint_enabled:
+                state = checkpoint.load()
+            output_buffer = checkpoint.open_output(
+                (len(stems), channels, length), resume=state is not None
+            )
+            output = torch.from_numpy(output_buffer)
+        else:
+            output = torch.zeros(len(stems), channels, length)
+
+        # Rolling accumulator covering [committed, committed + acc length)
+        if state:
+            next_index, committed = state["next_index"], state["committed"]
+            acc, acc_weight = state["acc"], state["weight"]
+        else:
+            next_index, committed = 0, 0
+            acc, acc_weight = torch.zeros(len(stems), channels, 0), torch.zeros(0)
+
+        if progress:
+            progress.begin(len(starts), segment_length / samplerate, done=next_index)
+
+        deadline = time.monotonic() + settings.job_timeout_seconds
+        preview_sent = False
+
+        def publish_preview() -> None:
+            nonlocal preview_sent
+            if preview_samples and not preview_sent and committed >= preview_samples:
+                preview_sent = True
+                on_preview(dict(zip(stems, output[..., :preview_samples])))
+
+        def accumulate(index: int, start: int, future) -> None:
+            nonlocal acc, acc_weight, committed
+            result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            result = result.index_select(0, stem_index)
+            if result.shape[1] != channels:
+                result = result.mean(1, keepdim=True)
+
+            lo, hi = max(start, 0), min(start + segment_length, length)
+            if hi - committed > acc.shape[-1]:
+                grow = hi - committed - acc.shape[-1]
+                acc = F.pad(acc, (0, grow))
+                acc_weight = F.pad(acc_weight, (0, grow))
+            window = weight[lo - start:hi - start]
+            acc[..., lo - committed:hi - committed] += result[..., lo - start:hi - start] * window
+            acc_weight[lo - committed:hi - committed] += window
+
+            # Nothing after this segment starts before the next one
+            final = length if index + 1 == len(starts) else min(max(starts[index + 1], 0), length)
+            if final > committed:
+                count = min(final - committed, acc.shape[-1])
+                if count:
+                    end = committed + count
+                    chunk = acc[..., :count] / acc_weight[:count].clamp_min(1e-8)
+                    chunk = chunk * std + mean
+                    if silent_spans:
+                        chunk *= silence_gain(committed, end, silent_spans, fade)
+                    output[..., committed:end] = chunk
+                    acc, acc_weight = acc[..., count:].clone(), acc_weight[count:].clone()
+                    committed = end
+                # Skipped silent segments leave a gap up to the next one
+                if final > committed:
+                    output[..., committed:final] = 0.0
+                    committed = final
+                publish_preview()
+
+            if (
+                checkpoint
+                and settings.checkpoint_enabled
+                and (index + 1) % settings.checkpoint_interval_segments == 0
+            ):
+                checkpoint.save(output_buffer, index + 1, committed, acc, acc_weight)
+            if progress:
+                progress.segment_done()
+
+        # Keep a bounded number of segments in flight per job
+        in_flight: deque = deque()
+        max_in_flight = 2 * self.batcher.max_batch_size
+        try:
+            for index in range(next_index, len(starts)):
+                if should_stop and should_stop():
+                    raise SeparationCancelledError("Separation cancelled")
+                start = starts[index]
+                segment_wav = audio.window(start, segment_length)
+                if channels != model.audio_channels:
+                    segment_wav = segment_wav.expand(model.audio_channels, -1)
+                future = self.batcher.submit(
+                    model_key, segment_wav, priority=start < preview_samples
+                )
+                in_flight.append((index, start, future))
+                if len(in_flight) >= max_in_flight:
+                    accumulate(*in_flight.popleft())
+            while in_flight:
+                accumulate(*in_flight.popleft())
+        except TimeoutError:
+            raise SeparationTimeoutError(
+                f"Processing timed out ({settings.job_timeout_seconds // 60} minutes)"
+            )
+        except SeparationCancelledError:
+            raise
+        except AudioDecodeError as e:
+            raise SeparationEngineError(str(e))
+        except Exception as e:
+            raise SeparationEngineError(f"Separation failed: {e}")
+        finally:
+            audio.close()
+
+        # Nothing was separated past this point (the rest is silence)
+        if committed < length:
+            output[..., committed:] = 0.0
+            committed = length
+        publish_preview()
+        if checkpoint is not None:
+            # The output file is handed to the encode stage
+            output_buffer.flush()
+
+        if progress and progress.realtime_factor:
+            logger.info(
+                f"Separated {len(starts)} segments at "
+                f"{progress.realtime_factor:.2f}x realtime"
+            )
+
+        return dict(zip(stems, output))
+
+
+# Singleton instance
+separation_engine = SeparationEngine()
@@ -0,0 +1,229 @@
+"""Reference-counted shared-memory buffers for cross-process audio handoff."""
+import os
+import threading
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Iterator, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.logging_config import logger
+
+
+class SharedBufferError(Exception):
+    """Custom exception for shared buffer errors."""
+    pass
+
+
+# Buffers are allocated in whole pages of this size so they can be recycled
+ALLOCATION_UNIT = 1024 * 1024
+
+# tmpfs backing POSIX shared memory on Linux
+SHM_PATH = "/dev/shm"
+
+
+class SharedBufferPool:
+    """
+    Pool of shared-memory blocks owned by the API process.
+
+    Decoded input and separated stems are written into these blocks, and
+    processes exchange only handles: {"name", "shape", "dtype"} dicts.
+    The owner counts references per block; when the last one is released
+    the block goes back to a free list (up to the idle size cap) and is
+    handed out again for any request it is large enough for.
+    """
+
+    def __init__(self):
+        """Initialize shared buffer pool."""
+        self.enabled = settings.shared_buffers_enabled
+        if self.enabled is None:
+            # In-process separation reads decoded audio directly; copying it
+            # to /dev/shm only pays off for worker processes
+            self.enabled = (
+                settings.separation_workers > 0 and settings.separation_backend == "inprocess"
+            )
+        self.max_idle_bytes = settings.shared_buffer_pool_mb * 1024 * 1024
+        self._blocks: dict[str, shared_memory.SharedMemory] = {}
+        self._refcounts: dict[str, int] = {}
+        self._free: list[str] = []
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, shape: tuple, dtype: str = "float32") -> dict:
+        """
+        Get a buffer for an array of the given shape (refcount 1).
+
+        Args:
+            shape: Array shape
+            dtype: Array dtype
+
+        Returns:
+            Buffer handle
+
+        Raises:
+            SharedBufferError: If shared memory cannot be allocated
+        """
+        nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        with self._lock:
+            # Smallest idle block that fits, unless it would waste over half
+            candidates = [
+                name for name in self._free
+                if nbytes <= self._blocks[name].size <= 2 * nbytes + ALLOCATION_UNIT
+            ]
+            if candidates:
+                name = min(candidates, key=lambda n: self._blocks[n].size)
+                self._free.remove(name)
+                self.reuses += 1
+            else:
+                size = -(-nbytes // ALLOCATION_UNIT) * ALLOCATION_UNIT
+                block = self._create(size)
+                name = block.name
+                self._blocks[name] = block
+                self.allocations += 1
+            self._refcounts[name] = 1
+        return {"name": name, "shape": tuple(shape), "dtype": dtype}
+
+    def _create(self, size: int) -> shared_memory.SharedMemory:
+        """
+        Create a block whose pages are reserved up front.
+
+        A segment is only sized with ftruncate, and touching a page the
+        tmpfs has no room for raises SIGBUS, which would kill the process.
+        Space is therefore checked and reserved before the block is used.
+
+        Raises:
+            SharedBufferError: If /dev/shm cannot hold the block
+        """
+        try:
+            stat = os.statvfs(SHM_PATH)
+        except OSError:
+            stat = None
+        if stat is not None and size > stat.f_bavail * stat.f_frsize:
+            raise SharedBufferError(
+                f"Not enough space in {SHM_PATH} for {size // (1024 * 1024)} MB "
+                f"({stat.f_bavail * stat.f_frsize // (1024 * 1024)} MB free)"
+            )
+        try:
+            block = shared_memory.SharedMemory(create=True, size=size)
+        except OSError as e:
+            raise SharedBufferError(f"Failed to allocate shared memory: {e}")
+        fd = getattr(block, "_fd", -1)
+        if fd >= 0 and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError as e:
+                block.close()
+                block.unlink()
+                raise SharedBufferError(f"Failed to reserve shared memory: {e}")
+        return block
+
+    def array(self, handle: dict) -> np.ndarray:
+        """
+        View a buffer as an array in the owning process.
+
+        The view must be dropped before the buffer is released.
+
+        Args:
+            handle: Buffer handle
+
+        Returns:
+            Array of the handle's shape and dtype
+        """
+        with self._lock:
+            block = self._blocks[handle["name"]]
+        return np.ndarray(handle["shape"], dtype=handle["dtype"], buffer=block.buf)
+
+    def retain(self, handle: dict) -> None:
+        """Add a reference to a buffer."""
+        with self._lock:
+            self._refcounts[handle["name"]] += 1
+
+    def release(self, handle: Optional[dict]) -> None:
+        """Drop a reference; unreferenced buffers are recycled."""
+        if not handle:
+            return
+        name = handle["name"]
+        with self._lock:
+            if name not in self._refcounts:
+                return
+            self._refcounts[name] -= 1
+            if self._refcounts[name] > 0:
+                return
+            del self._refcounts[name]
+            self._free.append(name)
+            self._trim()
+
+    def _trim(self) -> None:
+        """Unlink the oldest idle blocks over the cap. Caller must hold the lock."""
+        idle = sum(self._blocks[name].size for name in self._free)
+        while self._free and idle > self.max_idle_bytes:
+            name = self._free.pop(0)
+            block = self._blocks.pop(name)
+            idle -= block.size
+            block.unlink()
+            try:
+                block.close()
+            except BufferError:
+                # A view is still alive; the mapping goes away with it
+                pass
+
+    def close(self) -> None:
+        """Unlink every block (at shutdown)."""
+        with self._lock:
+            for block in self._blocks.values():
+                try:
+                    block.unlink()
+                    block.close()
+                except (OSError, BufferError) as e:
+                    logger.warning(f"Could not release shared buffer {block.name}: {e}")
+            self._blocks.clear()
+            self._refcounts.clear()
+            self._free.clear()
+
+    def get_stats(self) -> dict:
+        """Get shared buffer statistics."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "blocks": len(self._blocks),
+                "in_use": len(self._refcounts),
+                "idle_mb": round(
+                    sum(self._blocks[name].size for name in self._free) / (1024 * 1024), 2
+                ),
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+            }
+
+
+@contextmanager
+def attach(handle: dict) -> Iterator[np.ndarray]:
+    """
+    Map a buffer into this process as an array.
+
+    Views of the array must not outlive the context.
+
+    Args:
+        handle: Buffer handle from SharedBufferPool.acquire
+
+    Yields:
+        Array of the handle's shape and dtype
+    """
+    # Spawned workers share the owner's resource tracker, so attaching does
+    # not hand the block to a second tracker that would unlink it on exit
+    block = shared_memory.SharedMemory(name=handle["name"])
+    array = np.ndarray(handle["shape"], dtype=handle["dtype"], buffer=block.buf)
+    try:
+        yield array
+    finally:
+        del array
+        try:
+            block.close()
+        except BufferError:
+            # A view is still alive; the mapping goes away with it
+            pass
+
+
+# Singleton instance
+shared_buffers = SharedBufferPool()
@@ -0,0 +1,107 @@
+"""Silence detection used to skip separation of empty regions."""
+import bisect
+import math
+
+import torch
+
+
+RMS_FRAME_LENGTH = 2048
+
+
+def frame_rms_db(mono: torch.Tensor) -> torch.Tensor:
+    """
+    Compute per-frame RMS level in dBFS (vectorized).
+
+    Trailing samples that do not fill a whole frame are ignored.
+
+    Args:
+        mono: Tensor of shape (samples,)
+
+    Returns:
+        Tensor of shape (frames,)
+    """
+    n_frames = mono.shape[-1] // RMS_FRAME_LENGTH
+    frames = mono[:n_frames * RMS_FRAME_LENGTH].reshape(n_frames, RMS_FRAME_LENGTH)
+    return 20 * torch.log10(frames.pow(2).mean(1).sqrt() + 1e-10)
+
+
+def find_silent_spans(
+    rms_db: torch.Tensor,
+    samplerate: int,
+    threshold_db: float,
+    min_duration: float
+) -> list[tuple[int, int]]:
+    """
+    Find silent spans from per-frame RMS levels.
+
+    Args:
+        rms_db: Frame levels from frame_rms_db
+        samplerate: Sample rate in Hz
+        threshold_db: Frames with RMS below this level (dBFS) are silent
+        min_duration: Minimum span length in seconds
+
+    Returns:
+        Sorted list of (start, end) sample offsets
+    """
+    if rms_db.numel() == 0:
+        return []
+    silent = (rms_db < threshold_db).int()
+
+    # Run boundaries of the silent mask
+    edges = torch.diff(torch.cat([torch.zeros(1, dtype=torch.int), silent,
+                                  torch.zeros(1, dtype=torch.int)]))
+    run_starts = (edges == 1).nonzero().flatten().tolist()
+    run_ends = (edges == -1).nonzero().flatten().tolist()
+
+    min_frames = math.ceil(min_duration * samplerate / RMS_FRAME_LENGTH)
+    return [
+        (start * RMS_FRAME_LENGTH, end * RMS_FRAME_LENGTH)
+        for start, end in zip(run_starts, run_ends)
+        if end - start >= min_frames
+    ]
+
+
+def is_silent(start: int, end: int, spans: list[tuple[int, int]]) -> bool:
+    """Check if [start, end) lies entirely inside one silent span."""
+    index = bisect.bisect_right(spans, (start, math.inf)) - 1
+    return index >= 0 and spans[index][0] <= start and end <= spans[index][1]
+
+
+def silence_gain(
+    start: int,
+    end: int,
+    spans: list[tuple[int, int]],
+    fade: int
+) -> torch.Tensor:
+    """
+    Build the gain envelope for [start, end) that mutes silent spans with
+    short crossfades at their boundaries.
+
+    Args:
+        start: First sample of the window
+        end: End sample of the window (exclusive)
+        spans: Silent spans as (start, end) sample offsets
+        fade: Crossfade length in samples at each span boundary
+
+    Returns:
+        Tensor of shape (end - start,)
+    """
+    gain = torch.ones(end - start)
+    first = max(0, bisect.bisect_right(spans, (start, math.inf)) - 1)
+    for span_start, span_end in spans[first:]:
+        if span_start >= end:
+            break
+        if span_end <= start:
+            continue
+
+        lo, hi = max(span_start, start), min(span_end, end)
+        span_length = span_end - span_start
+        span_fade = min(fade, span_length // 2)
+        if span_fade > 1:
+            # Linear ramps down/up at both edges of the span
+            pos = torch.arange(lo - span_start, hi - span_start, dtype=torch.float32)
+            distance = torch.minimum(pos, span_length - 1 - pos)
+            gain[lo - start:hi - start] = (1 - distance / (span_fade - 1)).clamp(0, 1)
+        else:
+            gain[lo - start:hi - start] = 0.0
+    return gain
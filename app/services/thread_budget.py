@@ -0,0 +1,212 @@
+"""CPU thread budgeting across concurrent separations."""
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import torch
+
+from app.config import settings
+from app.logging_config import logger
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def configure_threads(threads: int, interop_threads: int = 1) -> None:
+    """
+    Pin the thread pools of the current process.
+
+    Must run before torch does any parallel work so the inter-op pool size
+    can still be changed; OMP/MKL read their variables when first used.
+
+    Args:
+        threads: Intra-op threads
+        interop_threads: Inter-op threads
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        # Already set or parallel work already started in this process
+        pass
+
+
+class ThreadBudget:
+    """
+    Splits the machine's cores across the separations currently running.
+
+    The parent process counts active separations in shared memory; each
+    worker process divides the budget by that count before every forward
+    pass, so threads are rebalanced as jobs start and finish.
+    """
+
+    def __init__(self):
+        """Initialize thread budget."""
+        self.total_threads = settings.cpu_thread_budget or os.cpu_count() or 1
+        # Fixed per-worker threads disable rebalancing
+        self.fixed_threads = settings.separation_worker_threads
+        self._active = None
+        self._lock = threading.Lock()
+        self._current = 0
+
+    def create_counter(self, context) -> object:
+        """Create (once) the shared active-separation counter for workers."""
+        if self._active is None:
+            self._active = context.Value("i", 0)
+        return self._active
+
+    def attach(self, active) -> None:
+        """Use a counter created by the parent (called in worker processes)."""
+        self._active = active
+
+    @property
+    def active(self) -> int:
+        """Number of separations currently running."""
+        return self._active.value if self._active is not None else 0
+
+    def job_started(self) -> None:
+        """Count a separation that is about to start."""
+        if self._active is not None:
+            with self._active.get_lock():
+                self._active.value += 1
+
+    def job_finished(self) -> None:
+        """Count a separation that has finished."""
+        if self._active is not None:
+            with self._active.get_lock():
+                self._active.value = max(0, self._active.value - 1)
+
+    def reset(self) -> None:
+        """Forget separations of worker processes that died."""
+        if self._active is not None:
+            with self._active.get_lock():
+                self._active.value = 0
+
+    def threads_per_job(self) -> int:
+        """Intra-op threads each running separation may use."""
+        if self.fixed_threads:
+            return self.fixed_threads
+        return max(1, self.total_threads // max(1, self.active))
+
+    def rebalance(self) -> None:
+        """Resize this process's intra-op pool to its current share."""
+        threads = self.threads_per_job()
+        if threads == self._current:
+            return
+        with self._lock:
+            if threads != self._current:
+                torch.set_num_threads(threads)
+                if self._current:
+                    logger.debug(f"Worker {os.getpid()} rebalanced to {threads} threads")
+                self._current = threads
+
+    def get_stats(self) -> dict:
+        """Get thread budget statistics."""
+        return {
+            "total_threads": self.total_threads,
+            "active_separations": self.active,
+            "threads_per_job": self.threads_per_job(),
+        }
+
+
+def _init_benchmark(threads: int, model_name: str) -> None:
+    """Prepare an autotuning process."""
+    from app.services.separation_engine import separation_engine
+
+    configure_threads(threads)
+    separation_engine.load_model(model_name)
+
+
+def _benchmark_segments(model_name: str, segments: int) -> float:
+    """Run segments through the model and return the elapsed seconds."""
+    from app.services.separation_engine import separation_engine
+
+    backend = separation_engine.load_model(model_name)
+    batch = torch.randn(1, backend.audio_channels, backend.segment_length)
+    start = time.perf_counter()
+    for _ in range(segments):
+        backend.forward(batch)
+    return time.perf_counter() - start
+
+
+def _measure_split(workers: int, threads: int, model_name: str, segments: int) -> float:
+    """Aggregate segments per second with workers x threads processes."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_benchmark,
+        initargs=(threads, model_name),
+    ) as executor:
+        # Warm up (spawns every process and loads the model) before timing
+        list(executor.map(_benchmark_segments, [model_name] * workers, [1] * workers))
+        start = time.perf_counter()
+        list(executor.map(
+            _benchmark_segments, [model_name] * workers, [segments] * workers
+        ))
+        elapsed = time.perf_counter() - start
+    return workers * segments / elapsed
+
+
+def autotune(model_name: Optional[str] = None) -> tuple[int, int]:
+    """
+    Benchmark jobs x threads splits of the thread budget.
+
+    The best split is stored in the cache directory and reused while the
+    core count and model stay the same.
+
+    Args:
+        model_name: Model to benchmark (default profile's model if None)
+
+    Returns:
+        (workers, threads per worker) with the highest throughput
+    """
+    model_name = model_name or settings.get_profile().model
+    total = settings.cpu_thread_budget or os.cpu_count() or 1
+    results_path = settings.cache_dir / "thread_tuning.json"
+    tuning_key = f"{model_name}:{settings.inference_backend}:{total}"
+
+    tunings = {}
+    try:
+        with open(results_path, encoding="utf-8") as f:
+            tunings = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if tuning_key in tunings:
+        return tunings[tuning_key]["workers"], tunings[tuning_key]["threads"]
+
+    best = (settings.separation_workers, max(1, total // max(1, settings.separation_workers)))
+    best_rate = 0.0
+    for workers in settings.thread_autotune_splits:
+        if workers < 1 or workers > total:
+            continue
+        threads = total // workers
+        try:
+            rate = _measure_split(
+                workers, threads, model_name, settings.thread_autotune_segments
+            )
+        except Exception as e:
+            logger.warning(f"Autotune of {workers}x{threads} failed: {e}")
+            continue
+        logger.info(f"Autotune {workers} workers x {threads} threads: {rate:.2f} segments/s")
+        if rate > best_rate:
+            best, best_rate = (workers, threads), rate
+
+    tunings[tuning_key] = {"workers": best[0], "threads": best[1]}
+    try:
+        with open(results_path, "w", encoding="utf-8") as f:
+            json.dump(tunings, f, indent=2)
+    except OSError as e:
+        logger.warning(f"Failed to store thread tuning: {e}")
+
+    logger.info(f"Autotune picked {best[0]} workers x {best[1]} threads")
+    return best
+
+
+# Singleton instance
+thread_budget = ThreadBudget()
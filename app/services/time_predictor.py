@@ -0,0 +1,173 @@
+"""Online processing-time predictor trained from completed jobs."""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.config import settings
+from app.logging_config import logger
+from app.services.file_lock import locked
+
+
+class TimePredictor:
+    """
+    Predicts separation time from input duration, profile and load.
+
+    One linear model per profile, seconds = a + b * duration + c * duration
+    * (load - 1), where load is the number of concurrently active jobs.
+    It is fitted by exponentially weighted least squares: the normal
+    equations are accumulated per observation, older jobs fade out, and a
+    small ridge term keeps the solve stable with few samples. Profiles
+    without enough observations fall back to a fixed realtime factor.
+
+    The accumulated statistics are persisted as JSON so predictions
+    survive restarts. Every process using the cache directory (server
+    processes and workers) adds its observations to the file under a
+    lock, and predictions pick up the file whenever it has changed.
+    """
+
+    STATE_FILENAME = "time_predictor.json"
+    FEATURES = 3
+    MIN_OBSERVATIONS = 3
+    RIDGE = 1e-3
+
+    def __init__(self):
+        """Initialize predictor and load the persisted state."""
+        self.forgetting = settings.predictor_forgetting_factor
+        self.prior_factor = settings.predictor_prior_seconds_per_audio_second
+        self.default_duration = settings.predictor_default_duration_seconds
+        self._models: dict[str, dict] = {}
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+        self._refresh()
+
+    @property
+    def _state_path(self) -> Path:
+        return settings.cache_dir / self.STATE_FILENAME
+
+    @staticmethod
+    def _features(duration: float, load: int) -> np.ndarray:
+        return np.array([1.0, duration, duration * max(load - 1, 0)])
+
+    def _refresh(self) -> None:
+        """Reload statistics if another process changed them. Caller must hold the lock."""
+        try:
+            mtime = self._state_path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self._state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            self._models = {
+                profile: {
+                    "xtx": np.array(model["xtx"], dtype=float),
+                    "xty": np.array(model["xty"], dtype=float),
+                    "count": model["count"],
+                }
+                for profile, model in state.items()
+            }
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read time predictor state: {e}")
+        self._mtime = mtime
+
+    def _save(self) -> None:
+        """Persist statistics atomically. Caller must hold the lock."""
+        state = {
+            profile: {
+                "xtx": model["xtx"].tolist(),
+                "xty": model["xty"].tolist(),
+                "count": model["count"],
+            }
+            for profile, model in self._models.items()
+        }
+        tmp_path = self._state_path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self._state_path)
+            self._mtime = self._state_path.stat().st_mtime_ns
+        except OSError as e:
+            logger.warning(f"Could not write time predictor state: {e}")
+
+    def observe(
+        self,
+        duration: float,
+        profile: Optional[str],
+        load: int,
+        seconds: float
+    ) -> None:
+        """
+        Record a completed separation.
+
+        Args:
+            duration: Input duration in seconds
+            profile: Separation profile name
+            load: Number of active jobs when the job started
+            seconds: Measured separation time in seconds
+        """
+        if duration <= 0 or seconds <= 0:
+            return
+        profile = profile or settings.default_profile
+        x = self._features(duration, load)
+        with self._lock, locked(self._state_path):
+            self._refresh()
+            model = self._models.setdefault(profile, {
+                "xtx": np.zeros((self.FEATURES, self.FEATURES)),
+                "xty": np.zeros(self.FEATURES),
+                "count": 0,
+            })
+            model["xtx"] = self.forgetting * model["xtx"] + np.outer(x, x)
+            model["xty"] = self.forgetting * model["xty"] + x * seconds
+            model["count"] += 1
+            self._save()
+
+    def predict(
+        self,
+        duration: Optional[float],
+        profile: Optional[str],
+        load: int = 1
+    ) -> float:
+        """
+        Predict separation time.
+
+        Args:
+            duration: Input duration in seconds (default duration if unknown)
+            profile: Separation profile name
+            load: Number of jobs that will be active alongside this one
+
+        Returns:
+            Predicted separation time in seconds
+        """
+        duration = duration or self.default_duration
+        profile = profile or settings.default_profile
+        fallback = duration * self.prior_factor * max(load, 1)
+        with self._lock:
+            self._refresh()
+            model = self._models.get(profile)
+            if model is None or model["count"] < self.MIN_OBSERVATIONS:
+                return fallback
+            xtx = model["xtx"] + self.RIDGE * np.eye(self.FEATURES)
+            try:
+                coefficients = np.linalg.solve(xtx, model["xty"])
+            except np.linalg.LinAlgError:
+                return fallback
+        predicted = float(self._features(duration, load) @ coefficients)
+        # A degenerate fit must not produce negative or absurdly small times
+        return predicted if predicted > 0 else fallback
+
+    def get_stats(self) -> dict:
+        """Get predictor statistics."""
+        with self._lock:
+            return {
+                profile: {"observations": model["count"]}
+                for profile, model in self._models.items()
+            }
+
+
+# Singleton instance
+time_predictor = TimePredictor()
@@ -1,12 +1,27 @@
 """Vocal extraction service using Demucs."""
 import shutil
+import time
+from contextlib import ExitStack
 from pathlib import Path
 from typing import Optional, Callable
 import subprocess
-import threading
+
+import numpy as np
+import torch
 
 from app.config import settings
 from app.logging_config import logger
+from app.models.separation import SeparationProfile
+from app.services.audio_io import (
+    AudioDecodeError, decode_to_file, probe_duration, read_pcm_chunks, write_wav
+)
+from app.services.cancellation import cancellation
+from app.services.checkpoint import SeparationCheckpoint
+from app.services.progress import SegmentProgress
+from app.services.separation_engine import (
+    separation_engine, SeparationEngineError, SeparationTimeoutError, SeparationCancelledError
+)
+from app.services.shared_buffers import shared_buffers, attach, SharedBufferError
 
 
 class VocalExtractorError(Exception):
@@ -14,20 +29,76 @@ class VocalExtractorError(Exception):
     pass
 
 
+class RetryableExtractionError(VocalExtractorError):
+    """Extraction was interrupted and can resume from its checkpoint."""
+    pass
+
+
+class ExtractionCancelledError(VocalExtractorError):
+    """Extraction was stopped because its job was cancelled."""
+    pass
+
+
 class VocalExtractor:
     """Service for extracting vocals from audio using Demucs."""
 
+    # Demucs models run at 44.1 kHz stereo; the engine decodes again on a
+    # mismatch
+    DECODE_SAMPLERATE = 44100
+    DECODE_CHANNELS = 2
+    DECODED_FILENAME = "input.f32"
+
     def __init__(self):
         """Initialize vocal extractor."""
         self.output_dir = settings.output_dir
-        # htdemucs is the recommended model for vocal separation
-        self.model = "htdemucs"
+        self.backend = settings.separation_backend
+
+    def preload_model(self) -> None:
+        """Load the default profile's model into the resident engine."""
+        profile = self.get_profile()
+        separation_engine.load_model(profile.model, profile.quantize)
+
+    def get_profile(self, name: Optional[str] = None) -> SeparationProfile:
+        """
+        Resolve a separation profile by name.
+
+        Args:
+            name: Profile name (default profile if None)
+
+        Returns:
+            SeparationProfile with its model resolved
+
+        Raises:
+            VocalExtractorError: If the profile does not exist
+        """
+        try:
+            return settings.get_profile(name)
+        except KeyError:
+            raise VocalExtractorError(f"Unknown separation profile: {name}")
+
+    def output_path(self, job_id: str, stem: str = "vocals") -> Path:
+        """Final output path of a separated stem."""
+        return self.output_dir / job_id / f"{job_id}_{stem}.wav"
+
+    def preview_path(self, job_id: str) -> Path:
+        """Path of the early vocal preview."""
+        return self.output_dir / job_id / f"{job_id}_preview.wav"
+
+    def discard_outputs(self, job_id: str) -> None:
+        """Remove everything written for a job (after cancellation)."""
+        shutil.rmtree(self.output_dir / job_id, ignore_errors=True)
+
+    def separation_params(self, profile: Optional[str] = None) -> dict:
+        """Parameters that affect the separated output (used for caching)."""
+        return self.get_profile(profile).model_dump()
 
     def extract_vocals(
         self,
         input_path: str,
         job_id: str,
-        progress_callback: Optional[Callable[[float], None]] = None
+        progress_callback: Optional[Callable[..., None]] = None,
+        profile: Optional[str] = None,
+        preview_only: bool = False
     ) -> str:
         """
         Extract vocals from audio file using Demucs.
@@ -35,7 +106,11 @@ class VocalExtractor:
         Args:
             input_path: Path to input audio file
             job_id: Job ID for output directory naming
-            progress_callback: Optional callback for progress updates
+            progress_callback: Optional callback, called as
+                callback(progress, **details)
+            profile: Separation profile name (default profile if None)
+            preview_only: Only separate the preview window (ignored by the
+                subprocess backend)
 
         Returns:
             Path to extracted vocal file
@@ -43,28 +118,405 @@ class VocalExtractor:
         Raises:
             VocalExtractorError: If extraction fails
         """
+        return self.extract_stems(
+            input_path, job_id, progress_callback, profile, preview_only, ["vocals"]
+        )["vocals"]
+
+    def extract_stems(
+        self,
+        input_path: str,
+        job_id: str,
+        progress_callback: Optional[Callable[..., None]] = None,
+        profile: Optional[str] = None,
+        preview_only: bool = False,
+        stems: Optional[list[str]] = None
+    ) -> dict[str, str]:
+        """
+        Separate stems from audio file using Demucs.
+
+        Runs the decode, separate and encode stages back to back; the
+        extraction pipeline runs them concurrently across jobs instead.
+
+        Args:
+            input_path: Path to input audio file
+            job_id: Job ID for output directory naming
+            progress_callback: Optional callback, called as
+                callback(progress, **details)
+            profile: Separation profile name (default profile if None)
+            preview_only: Only separate the preview window (ignored by the
+                subprocess backend)
+            stems: Stems to write (all model stems if None)
+
+        Returns:
+            Mapping of stem name to output file path
+
+        Raises:
+            VocalExtractorError: If extraction fails
+        """
+        if self.backend == "subprocess":
+            input_path = Path(input_path)
+            if not input_path.exists():
+                raise VocalExtractorError(f"Input file not found: {input_path}")
+            job_output_dir = self.output_dir / job_id
+            job_output_dir.mkdir(parents=True, exist_ok=True)
+            return self._extract_subprocess(
+                input_path,
+                job_id,
+                job_output_dir,
+                self.get_profile(profile),
+                progress_callback,
+                stems
+            )
+
+        separated = self.separate(
+            input_path, job_id, progress_callback, profile, preview_only=preview_only, stems=stems
+        )
+        return self.encode_output(job_id, separated, progress_callback)
+
+    def decode_input(
+        self,
+        input_path: str,
+        job_id: str,
+        profile: Optional[str] = None
+    ) -> Optional[dict]:
+        """
+        Decode stage: decode the input to raw PCM ahead of separation.
+
+        Samples go to a shared-memory buffer when the pool is enabled and
+        to a raw file in the job directory otherwise. Long tracks are left to
+        the engine's streaming decoder.
+
+        Args:
+            input_path: Path to input audio file
+            job_id: Job ID for output directory naming
+            profile: Separation profile name (sets rate and channel count)
+
+        Returns:
+            Decoded audio description (buffer and length, or path, plus
+            samplerate and channels) or None; the caller releases the buffer
+
+        Raises:
+            VocalExtractorError: If the input cannot be decoded
+        """
         input_path = Path(input_path)
         if not input_path.exists():
             raise VocalExtractorError(f"Input file not found: {input_path}")
+        if cancellation.is_cancelled(job_id):
+            raise ExtractionCancelledError(f"Job {job_id} was cancelled")
+        if self.backend == "subprocess" or separation_engine.use_streaming(str(input_path)):
+            return None
+
+        separation_profile = self.get_profile(profile)
+        samplerate = separation_profile.sample_rate or self.DECODE_SAMPLERATE
+        channels = 1 if separation_profile.mono else self.DECODE_CHANNELS
+
+        if shared_buffers.enabled:
+            try:
+                return self._decode_shared(input_path, samplerate, channels)
+            except SharedBufferError as e:
+                logger.warning(f"Falling back to a raw PCM file: {e}")
+
+        dest = self.output_dir / job_id / self.DECODED_FILENAME
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            decode_to_file(input_path, dest, samplerate, channels)
+        except AudioDecodeError as e:
+            dest.unlink(missing_ok=True)
+            raise VocalExtractorError(str(e))
+        return {
+            "path": str(dest),
+            "samplerate": samplerate,
+            "channels": channels,
+        }
+
+    def _decode_shared(self, input_path: Path, samplerate: int, channels: int) -> dict:
+        """
+        Decode into a shared buffer sized from the probed duration.
+
+        Raises:
+            SharedBufferError: If shared memory runs out (nothing is kept)
+            VocalExtractorError: If the input cannot be decoded
+        """
+        # One second of slack; the buffer is regrown if the probe was short
+        capacity = int((probe_duration(input_path) or 0.0) * samplerate) + samplerate
+        handle = None
+        length = 0
+        try:
+            handle = shared_buffers.acquire((channels, capacity))
+            for chunk in read_pcm_chunks(input_path, samplerate, channels):
+                frames = chunk.shape[0]
+                if length + frames > capacity:
+                    capacity = max(2 * capacity, length + frames)
+                    grown = shared_buffers.acquire((channels, capacity))
+                    target = shared_buffers.array(grown)
+                    target[:, :length] = shared_buffers.array(handle)[:, :length]
+                    del target
+                    shared_buffers.release(handle)
+                    handle = grown
+                samples = shared_buffers.array(handle)
+                samples[:, length:length + frames] = chunk.T
+                del samples
+                length += frames
+        except SharedBufferError:
+            shared_buffers.release(handle)
+            raise
+        except AudioDecodeError as e:
+            shared_buffers.release(handle)
+            raise VocalExtractorError(str(e))
+        if length == 0:
+            shared_buffers.release(handle)
+            raise VocalExtractorError(f"Failed to decode audio: {input_path}")
+        return {
+            "buffer": handle,
+            "length": length,
+            "samplerate": samplerate,
+            "channels": channels,
+        }
+
+    def allocate_output(
+        self,
+        decoded: Optional[dict],
+        preview_only: bool = False,
+        stems: Optional[list[str]] = None
+    ) -> Optional[dict]:
+        """
+        Get a shared buffer for the separated stems of a decoded input.
+
+        Checkpointed runs keep their memory-mapped output file instead,
+        since a checkpoint must survive the process.
+
+        Args:
+            decoded: Output of decode_input
+            preview_only: Only the preview window will be separated
+            stems: Stems to keep (all model stems if None)
+
+        Returns:
+            Buffer handle (released by the caller) or None
+        """
+        if not decoded or "buffer" not in decoded or settings.checkpoint_enabled:
+            return None
+        length = decoded["length"]
+        if preview_only:
+            length = min(length, settings.preview_duration_seconds * decoded["samplerate"])
+        count = len(stems) if stems else len(settings.available_stems)
+        try:
+            return shared_buffers.acquire((count, decoded["channels"], length))
+        except SharedBufferError as e:
+            logger.warning(f"Falling back to a file-backed output buffer: {e}")
+            return None
+
+    def separate(
+        self,
+        input_path: str,
+        job_id: str,
+        progress_callback: Optional[Callable[..., None]] = None,
+        profile: Optional[str] = None,
+        decoded: Optional[dict] = None,
+        preview_only: bool = False,
+        stems: Optional[list[str]] = None,
+        output: Optional[dict] = None
+    ) -> dict:
+        """
+        Separation stage: run the resident engine over the input.
+
+        Every requested stem comes out of the same forward passes. The
+        first preview_duration_seconds are separated with priority and the
+        vocals written to the preview file as soon as they are final, which
+        is reported as preview_ready.
+
+        Args:
+            input_path: Path to input audio file
+            job_id: Job ID for output directory naming
+            progress_callback: Optional callback for progress updates
+            profile: Separation profile name (default profile if None)
+            decoded: Output of decode_input (decodes here if None)
+            preview_only: Stop after the preview window
+            stems: Stems to keep (all model stems if None)
+            output: Shared buffer from allocate_output to separate into
+
+        Returns:
+            Separated output description (buffer or output path, stems,
+            samplerate)
+
+        Raises:
+            VocalExtractorError: If separation fails
+            RetryableExtractionError: If separation timed out (resumable)
+        """
+        input_path = Path(input_path)
+        if not input_path.exists():
+            raise VocalExtractorError(f"Input file not found: {input_path}")
+        separation_profile = self.get_profile(profile)
 
         # Create job-specific output directory
         job_output_dir = self.output_dir / job_id
         job_output_dir.mkdir(parents=True, exist_ok=True)
 
+        logger.info(f"Starting in-process vocal extraction: {input_path}")
+        if progress_callback:
+            progress_callback(10)
+
+        try:
+            model = separation_engine.load_model(
+                separation_profile.model, separation_profile.quantize
+            )
+            if progress_callback:
+                progress_callback(20)
+
+            progress = SegmentProgress(
+                progress_callback,
+                start_progress=20,
+                end_progress=90,
+                max_updates_per_second=settings.progress_updates_per_second
+            )
+            # Memory-mapped output and checkpoints live here until encoded
+            work_dir = job_output_dir / "work"
+            samplerate = separation_profile.sample_rate or model.samplerate
+            preview_samples = settings.preview_duration_seconds * samplerate
+
+            def write_preview(preview: dict) -> None:
+                if "vocals" not in preview:
+                    return
+                write_wav(self.preview_path(job_id), preview["vocals"], samplerate)
+                logger.info(f"Preview ready for job {job_id}")
+                progress.notify(preview_ready=True)
+
+            with ExitStack() as stack:
+                # Shared buffers are mapped, not copied, into this process
+                if decoded and "buffer" in decoded:
+                    samples = stack.enter_context(attach(decoded["buffer"]))
+                    decoded = {**decoded, "array": samples[:, :decoded["length"]]}
+                    del samples
+                output_array = stack.enter_context(attach(output)) if output else None
+                sources = separation_engine.separate(
+                    str(input_path),
+                    separation_profile.model,
+                    shifts=separation_profile.shifts,
+                    overlap=separation_profile.overlap,
+                    segment=separation_profile.segment,
+                    stems=stems,
+                    progress=progress,
+                    work_dir=work_dir,
+                    quantize=separation_profile.quantize,
+                    decoded=decoded,
+                    preview_samples=preview_samples,
+                    on_preview=write_preview,
+                    max_samples=preview_samples if preview_only else None,
+                    samplerate=samplerate,
+                    mono=separation_profile.mono,
+                    output_array=output_array,
+                    should_stop=lambda: cancellation.is_cancelled(job_id)
+                )
+                separated = {"stems": list(sources), "samplerate": samplerate}
+                # The engine falls back to its own buffer on a shape mismatch
+                first = next(iter(sources.values()))
+                if output_array is not None and np.may_share_memory(first.numpy(), output_array):
+                    separated["buffer"] = output
+                else:
+                    separated["output"] = str(work_dir / SeparationCheckpoint.OUTPUT_FILENAME)
+                del first, sources, decoded, output_array
+            return separated
+
+        except SeparationTimeoutError as e:
+            logger.error(f"Vocal extraction timed out: {e}")
+            raise RetryableExtractionError(str(e))
+        except SeparationCancelledError as e:
+            logger.info(f"Vocal extraction cancelled for job {job_id}")
+            self.discard_outputs(job_id)
+            raise ExtractionCancelledError(str(e))
+        except SeparationEngineError as e:
+            logger.error(f"Vocal extraction error: {e}")
+            raise VocalExtractorError(str(e))
+        except Exception as e:
+            logger.error(f"Vocal extraction error: {e}")
+            raise VocalExtractorError(f"Extraction failed: {e}")
+
+    def encode_output(
+        self,
+        job_id: str,
+        separated: dict,
+        progress_callback: Optional[Callable[..., None]] = None
+    ) -> dict[str, str]:
+        """
+        Encode stage: write the separated stems and drop intermediates.
+
+        Args:
+            job_id: Job ID for output file naming
+            separated: Output of separate
+            progress_callback: Optional callback for progress updates
+
+        Returns:
+            Mapping of stem name to output file path
+
+        Raises:
+            VocalExtractorError: If the output cannot be written
+        """
+        output_files = {}
+        try:
+            if "buffer" in separated:
+                output = torch.from_numpy(shared_buffers.array(separated["buffer"]))
+            else:
+                output = torch.from_numpy(np.load(separated["output"], mmap_mode="c"))
+            # Each stem is written straight to its final path
+            for stem, audio in zip(separated["stems"], output):
+                stem_path = self.output_path(job_id, stem)
+                write_wav(stem_path, audio, separated["samplerate"])
+                output_files[stem] = str(stem_path)
+            del output, audio
+        except (OSError, ValueError) as e:
+            logger.error(f"Vocal extraction error: {e}")
+            raise VocalExtractorError(f"Failed to write output: {e}")
+
+        shutil.rmtree(self.output_dir / job_id / "work", ignore_errors=True)
+        (self.output_dir / job_id / self.DECODED_FILENAME).unlink(missing_ok=True)
+
+        if progress_callback:
+            progress_callback(100)
+
+        logger.info(f"Extraction complete for job {job_id}: {', '.join(output_files)}")
+        return output_files
+
+    def _extract_subprocess(
+        self,
+        input_path: Path,
+        job_id: str,
+        job_output_dir: Path,
+        profile: SeparationProfile,
+        progress_callback: Optional[Callable[..., None]] = None,
+        stems: Optional[list[str]] = None
+    ) -> dict[str, str]:
+        """
+        Extract stems by running the demucs CLI (fallback mode).
+
+        Args:
+            input_path: Path to input audio file
+            job_id: Job ID for output file naming
+            job_output_dir: Job-specific output directory
+            profile: Resolved separation profile
+            progress_callback: Optional callback for progress updates
+            stems: Stems to keep (all model stems if None)
+
+        Returns:
+            Mapping of stem name to output file path
+        """
         logger.info(f"Starting vocal extraction with Demucs: {input_path}")
         if progress_callback:
             progress_callback(10)
 
         try:
             # Run demucs separation
-            # --two-stems=vocals extracts only vocals and accompaniment
             cmd = [
                 "python", "-m", "demucs",
-                "--two-stems", "vocals",
-                "-n", self.model,
+                "-n", profile.model,
+                "--shifts", str(profile.shifts),
+                "--overlap", str(profile.overlap),
                 "-o", str(job_output_dir),
                 str(input_path)
             ]
+            if profile.segment:
+                cmd[-1:-1] = ["--segment", str(int(profile.segment))]
+            if stems == ["vocals"]:
+                # --two-stems=vocals extracts only vocals and accompaniment
+                cmd[3:3] = ["--two-stems", "vocals"]
 
             logger.debug(f"Running command: {' '.join(cmd)}")
 
@@ -79,11 +531,20 @@ class VocalExtractor:
                 text=True
             )
 
-            # Monitor progress
-            if progress_callback:
-                self._simulate_progress(process, progress_callback, 20, 90)
-
-            stdout, stderr = process.communicate(timeout=600)  # 10 minute timeout
+            # 10 minute timeout; a cancelled job kills the process early
+            deadline = time.monotonic() + 600
+            while True:
+                try:
+                    stdout, stderr = process.communicate(timeout=1)
+                    break
+                except subprocess.TimeoutExpired:
+                    if cancellation.is_cancelled(job_id):
+                        process.kill()
+                        process.communicate()
+                        self.discard_outputs(job_id)
+                        raise ExtractionCancelledError(f"Job {job_id} was cancelled")
+                    if time.monotonic() > deadline:
+                        raise
 
             if process.returncode != 0:
                 logger.error(f"Demucs error: {stderr}")
@@ -92,34 +553,40 @@ class VocalExtractor:
             if progress_callback:
                 progress_callback(90)
 
-            # Find the vocal file
-            # Demucs output structure: {output_dir}/{model}/{input_stem}/vocals.wav
+            # Find the stem files
+            # Demucs output structure: {output_dir}/{model}/{input_stem}/{stem}.wav
             input_stem = input_path.stem
-            demucs_output_dir = job_output_dir / self.model / input_stem
-
-            vocal_file = demucs_output_dir / "vocals.wav"
-            if not vocal_file.exists():
+            demucs_output_dir = job_output_dir / profile.model / input_stem
+            if not demucs_output_dir.exists():
                 # Try alternative locations
                 possible_files = list(job_output_dir.rglob("vocals.wav"))
-                if possible_files:
-                    vocal_file = possible_files[0]
-                else:
+                if not possible_files:
                     raise VocalExtractorError("Vocal file not found in output")
-
-            # Move vocal file to a cleaner location
-            final_output_path = job_output_dir / f"{job_id}_vocals.wav"
-            shutil.move(str(vocal_file), str(final_output_path))
+                demucs_output_dir = possible_files[0].parent
+
+            # Move stem files to a cleaner location
+            output_files = {}
+            for stem_file in demucs_output_dir.glob("*.wav"):
+                stem = stem_file.stem
+                if stems and stem not in stems:
+                    continue
+                final_output_path = self.output_path(job_id, stem)
+                shutil.move(str(stem_file), str(final_output_path))
+                output_files[stem] = str(final_output_path)
+            missing = set(stems or []) - set(output_files)
+            if missing:
+                raise VocalExtractorError(f"Stems not found in output: {sorted(missing)}")
 
             # Clean up demucs subdirectories
-            model_dir = job_output_dir / self.model
+            model_dir = job_output_dir / profile.model
             if model_dir.exists():
                 shutil.rmtree(model_dir)
 
             if progress_callback:
                 progress_callback(100)
 
-            logger.info(f"Vocal extraction complete: {final_output_path}")
-            return str(final_output_path)
+            logger.info(f"Extraction complete for job {job_id}: {', '.join(output_files)}")
+            return output_files
 
         except subprocess.TimeoutExpired:
             process.kill()
@@ -130,37 +597,6 @@ class VocalExtractor:
             logger.error(f"Vocal extraction error: {e}")
             raise VocalExtractorError(f"Extraction failed: {e}")
 
-    def _simulate_progress(
-        self,
-        process: subprocess.Popen,
-        callback: Callable[[float], None],
-        start_progress: float,
-        end_progress: float
-    ):
-        """
-        Simulate progress updates while demucs is running.
-
-        Args:
-            process: Running subprocess
-            callback: Progress callback function
-            start_progress: Starting progress percentage
-            end_progress: Ending progress percentage
-        """
-        import time
-
-        def update_progress():
-            progress = start_progress
-            increment = (end_progress - start_progress) / 30  # 30 steps
-
-            while process.poll() is None and progress < end_progress:
-                time.sleep(2)
-                progress = min(progress + increment, end_progress - 5)
-                callback(progress)
-
-        thread = threading.Thread(target=update_progress)
-        thread.daemon = True
-        thread.start()
-
 
 # Singleton instance
 vocal_extractor = VocalExtractor()
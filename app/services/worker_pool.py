@@ -0,0 +1,321 @@
+"""Pool of long-lived separation worker processes."""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Callable
+
+from app.config import settings
+from app.logging_config import logger
+from app.services.cancellation import cancellation
+from app.services.separation_engine import SeparationEngineError
+from app.services.thread_budget import thread_budget, configure_threads, autotune
+from app.services.vocal_extractor import vocal_extractor, RetryableExtractionError
+
+
+# Event queue of the current worker process (set by the initializer)
+_worker_events = None
+
+
+def _init_worker(events, active, cancelled, torch_threads: int) -> None:
+    """Prepare a worker process: pin torch threads and load the model once."""
+    global _worker_events
+    _worker_events = events
+    configure_threads(torch_threads)
+    thread_budget.attach(active)
+    cancellation.attach(cancelled)
+    try:
+        vocal_extractor.preload_model()
+    except SeparationEngineError as e:
+        logger.warning(f"Model preload failed, will retry on first job: {e}")
+    logger.info(f"Separation worker {os.getpid()} ready ({torch_threads} threads)")
+
+
+def _ping() -> int:
+    """No-op task used to make sure every worker process is started."""
+    return os.getpid()
+
+
+def _report_progress(job_id: str) -> Callable[..., None]:
+    """Progress callback forwarding updates to the parent process."""
+    def progress_callback(progress: float, **details):
+        _worker_events.put((job_id, progress, details))
+
+    return progress_callback
+
+
+def _run_counted(fn: Callable, *args):
+    """Run a task, counting it as a running separation while it runs."""
+    # Running workers shrink their thread pools to make room
+    thread_budget.job_started()
+    try:
+        return fn(*args)
+    finally:
+        thread_budget.job_finished()
+
+
+def _run_extraction(
+    input_path: str,
+    job_id: str,
+    profile: Optional[str],
+    preview_only: bool,
+    stems: Optional[list[str]]
+) -> dict[str, str]:
+    """Run stem extraction inside a worker process."""
+    return vocal_extractor.extract_stems(
+        input_path, job_id, _report_progress(job_id), profile, preview_only, stems
+    )
+
+
+def _run_separation(
+    input_path: str,
+    job_id: str,
+    profile: Optional[str],
+    decoded: Optional[dict],
+    preview_only: bool,
+    stems: Optional[list[str]],
+    output: Optional[dict]
+) -> dict:
+    """Run only the separation stage inside a worker process."""
+    return vocal_extractor.separate(
+        input_path, job_id, _report_progress(job_id), profile, decoded, preview_only, stems,
+        output
+    )
+
+
+class SeparationWorkerPool:
+    """Dispatches separation jobs to pre-started worker processes."""
+
+    def __init__(self):
+        """Initialize worker pool."""
+        self.size = settings.separation_workers
+        self.torch_threads = settings.separation_worker_threads or max(
+            1, thread_budget.total_threads // max(1, self.size)
+        )
+        self._tuned = False
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._events = None
+        self._listener: Optional[threading.Thread] = None
+        self._callbacks: dict[str, Callable[..., None]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Check if separation runs in worker processes."""
+        return self.size > 0 and settings.separation_backend == "inprocess"
+
+    @property
+    def started(self) -> bool:
+        """Check if worker processes are running."""
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Start worker processes and wait until every model is loaded."""
+        if not self.enabled or self._executor is not None:
+            return
+
+        if settings.thread_autotune and not self._tuned:
+            self.size, self.torch_threads = autotune()
+            self._tuned = True
+
+        context = multiprocessing.get_context("spawn")
+        self._events = context.Queue()
+        active = thread_budget.create_counter(context)
+        cancelled = cancellation.create_array(context)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._events, active, cancelled, self.torch_threads),
+        )
+
+        self._listener = threading.Thread(target=self._dispatch_events, daemon=True)
+        self._listener.start()
+
+        # Workers are spawned on demand; submit one task per worker up front
+        pings = [self._executor.submit(_ping) for _ in range(self.size)]
+        pids = {ping.result() for ping in pings}
+        logger.info(f"Started {len(pids)} separation workers")
+
+    def shutdown(self) -> None:
+        """Stop worker processes."""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        self._events.put(None)
+        self._listener.join(timeout=5)
+        self._listener = None
+        logger.info("Stopped separation workers")
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Replace a broken executor (only once if several jobs notice it)."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        # Every task of the broken pool has failed, including ones whose
+        # process died before it could count itself finished
+        thread_budget.reset()
+        self._events.put(None)
+        self.start()
+
+    def _dispatch_events(self) -> None:
+        """Forward progress events from workers to job callbacks."""
+        while True:
+            event = self._events.get()
+            if event is None:
+                break
+            job_id, progress, details = event
+            with self._lock:
+                callback = self._callbacks.get(job_id)
+            if callback:
+                try:
+                    callback(progress, **details)
+                except Exception as e:
+                    logger.warning(f"Progress callback failed for {job_id}: {e}")
+
+    async def extract_stems(
+        self,
+        input_path: str,
+        job_id: str,
+        progress_callback: Optional[Callable[..., None]] = None,
+        profile: Optional[str] = None,
+        preview_only: bool = False,
+        stems: Optional[list[str]] = None
+    ) -> dict[str, str]:
+        """
+        Extract stems in a worker process.
+
+        Falls back to the default thread pool when workers are disabled.
+
+        Args:
+            input_path: Path to input audio file
+            job_id: Job ID
+            progress_callback: Optional callback for progress updates
+            profile: Separation profile name
+            preview_only: Only separate the preview window
+            stems: Stems to write (all model stems if None)
+
+        Returns:
+            Mapping of stem name to output file path
+
+        Raises:
+            VocalExtractorError: If extraction fails
+        """
+        if not self.enabled:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None,
+                vocal_extractor.extract_stems,
+                input_path,
+                job_id,
+                progress_callback,
+                profile,
+                preview_only,
+                stems
+            )
+        return await self._submit(
+            job_id,
+            progress_callback,
+            _run_extraction,
+            input_path,
+            job_id,
+            profile,
+            preview_only,
+            stems
+        )
+
+    async def separate(
+        self,
+        input_path: str,
+        job_id: str,
+        progress_callback: Optional[Callable[..., None]] = None,
+        profile: Optional[str] = None,
+        decoded: Optional[dict] = None,
+        preview_only: bool = False,
+        stems: Optional[list[str]] = None,
+        output: Optional[dict] = None
+    ) -> dict:
+        """
+        Run the separation stage in a worker process.
+
+        Falls back to the default thread pool when workers are disabled.
+
+        Args:
+            input_path: Path to input audio file
+            job_id: Job ID
+            progress_callback: Optional callback for progress updates
+            profile: Separation profile name
+            decoded: Output of the decode stage (buffers travel as handles)
+            preview_only: Only separate the preview window
+            stems: Stems to keep (all model stems if None)
+            output: Shared buffer to separate into
+
+        Returns:
+            Separated output description (see VocalExtractor.separate)
+
+        Raises:
+            VocalExtractorError: If separation fails
+        """
+        if not self.enabled:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None,
+                vocal_extractor.separate,
+                input_path,
+                job_id,
+                progress_callback,
+                profile,
+                decoded,
+                preview_only,
+                stems,
+                output
+            )
+        return await self._submit(
+            job_id,
+            progress_callback,
+            _run_separation,
+            input_path,
+            job_id,
+            profile,
+            decoded,
+            preview_only,
+            stems,
+            output
+        )
+
+    async def _submit(
+        self,
+        job_id: str,
+        progress_callback: Optional[Callable[..., None]],
+        fn: Callable,
+        *args
+    ):
+        """Run a task in a worker process, forwarding its progress events."""
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            await loop.run_in_executor(None, self.start)
+
+        if progress_callback:
+            with self._lock:
+                self._callbacks[job_id] = progress_callback
+        executor = self._executor
+        try:
+            # Counted by the worker once it starts the task, not while queued
+            future = executor.submit(_run_counted, fn, *args)
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            logger.error("Separation worker died, restarting pool")
+            await loop.run_in_executor(None, self._restart, executor)
+            raise RetryableExtractionError("Separation worker crashed")
+        finally:
+            with self._lock:
+                self._callbacks.pop(job_id, None)
+
+
+# Singleton instance
+separation_pool = SeparationWorkerPool()
@@ -6,6 +6,7 @@ import yt_dlp
 
 from app.config import settings
 from app.logging_config import logger
+from app.services.cancellation import cancellation
 
 
 class YouTubeDownloaderError(Exception):
@@ -100,6 +101,9 @@ class YouTubeDownloader:
         """
         Download audio from YouTube video.
 
+        The download is aborted at the next progress update once the job
+        is cancelled.
+
         Args:
             url: YouTube video URL
             job_id: Job ID for creating unique filename
@@ -117,6 +121,8 @@ class YouTubeDownloader:
         output_template = str(self.upload_dir / f"{job_id}.%(ext)s")
 
         def progress_hook(d):
+            if cancellation.is_cancelled(job_id):
+                raise yt_dlp.utils.DownloadCancelled(f"Job {job_id} was cancelled")
             if d["status"] == "downloading" and progress_callback:
                 if "total_bytes" in d and d["total_bytes"]:
                     progress = (d["downloaded_bytes"] / d["total_bytes"]) * 100
@@ -165,6 +171,11 @@ class YouTubeDownloader:
                 logger.info(f"YouTube download complete: {output_path}")
                 return str(output_path), video_info
 
+        except yt_dlp.utils.DownloadCancelled:
+            logger.info(f"YouTube download cancelled for job {job_id}")
+            for partial in self.upload_dir.glob(f"{job_id}.*"):
+                partial.unlink(missing_ok=True)
+            raise YouTubeDownloaderError("Download cancelled")
         except yt_dlp.utils.DownloadError as e:
             error_msg = str(e)
             logger.error(f"YouTube download error: {error_msg}")
@@ -125,9 +125,9 @@ async function handleFileUpload(file) {
         return;
     }
 
-    const maxSize = 50 * 1024 * 1024; // 50MB
-    if (file.size > maxSize) {
-        showError('ファイルサイズが50MBを超えています');
+    const maxSizeMb = Number(elements.fileInput.dataset.maxSizeMb);
+    if (file.size > maxSizeMb * 1024 * 1024) {
+        showError(`ファイルサイズが${maxSizeMb}MBを超えています`);
         return;
     }
 
@@ -228,7 +228,11 @@ async function checkStatus() {
             throw new Error(data.detail || 'ステータスの取得に失敗しました');
         }
 
-        updateProgress(data.progress, data.message);
+        let message = data.message;
+        if (data.eta_seconds != null) {
+            message += ` (残り約${Math.ceil(data.eta_seconds)}秒)`;
+        }
+        updateProgress(data.progress, message);
 
         if (data.status === 'completed') {
             stopStatusPolling();
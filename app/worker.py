@@ -0,0 +1,202 @@
+"""
+Worker process: runs downloads and separation for jobs from the broker.
+
+Start one or more next to the API with JOB_BROKER=redis and the same
+upload and output directories (e.g. on a shared volume):
+
+    python -m app.worker [--concurrency 2]
+
+The API keeps queuing, priorities and fair sharing; workers take jobs
+in the order the API dispatches them and publish job snapshots back.
+"""
+import argparse
+import asyncio
+import signal
+import time
+from typing import Optional
+
+from app.config import settings
+from app.logging_config import logger
+from app.services.broker import BrokerError, JobBroker, job_broker
+from app.services.cancellation import cancellation
+from app.services.job_manager import job_manager, JobManagerError
+from app.services.job_store import job_store
+from app.services.pipeline import extraction_pipeline
+from app.services.separation_engine import SeparationEngineError
+from app.services.shared_buffers import shared_buffers
+from app.services.vocal_extractor import vocal_extractor
+from app.services.worker_pool import separation_pool
+
+
+class JobWorker:
+    """
+    Pulls job messages from a broker and runs them with the job manager.
+
+    While a job runs its snapshot is published whenever it changes, at
+    most every PUBLISH_INTERVAL seconds, and once more when it ends; the
+    job's lease is renewed three times per lease period meanwhile.
+    """
+
+    # Handlers a job message may name
+    HANDLERS = ("process_file_upload", "process_youtube_download")
+    PUBLISH_INTERVAL = 0.5
+
+    def __init__(self, broker: JobBroker, concurrency: int):
+        """
+        Initialize job worker.
+
+        Args:
+            broker: Broker to take jobs from
+            concurrency: Jobs run at the same time
+        """
+        self.broker = broker
+        self.concurrency = max(1, concurrency)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stop taking jobs; running jobs finish first."""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """Take and run jobs until stopped."""
+        slots = asyncio.Semaphore(self.concurrency)
+        listener = asyncio.create_task(self._listen_for_cancellations())
+        logger.info(f"Worker started ({self.concurrency} slots)")
+        try:
+            while not self._stopping.is_set():
+                await slots.acquire()
+                try:
+                    message = await self.broker.next_job(timeout=1.0)
+                except BrokerError as e:
+                    slots.release()
+                    logger.error(f"Broker unavailable: {e}")
+                    await asyncio.sleep(5)
+                    continue
+                if message is None:
+                    slots.release()
+                    continue
+                job_id = message["job"]["job_id"]
+                task = asyncio.create_task(self._run_job(message))
+                self._tasks[job_id] = task
+                task.add_done_callback(lambda _, job_id=job_id: self._tasks.pop(job_id, None))
+                task.add_done_callback(lambda _: slots.release())
+            if self._tasks:
+                await asyncio.wait(list(self._tasks.values()))
+        finally:
+            listener.cancel()
+            logger.info("Worker stopped")
+
+    async def _listen_for_cancellations(self) -> None:
+        """Cancel running jobs the API cancels."""
+        while True:
+            try:
+                async for job_id in self.broker.cancellations():
+                    cancellation.cancel(job_id)
+                    task = self._tasks.get(job_id)
+                    if task:
+                        task.cancel()
+                        logger.info(f"Job {job_id} cancelled by the API")
+            except BrokerError as e:
+                logger.error(f"Broker unavailable: {e}")
+            except ConnectionError as e:
+                logger.warning(f"Lost cancellation channel, reconnecting: {e}")
+            await asyncio.sleep(1)
+
+    async def _run_job(self, message: dict) -> None:
+        """Run one job message and publish its snapshots."""
+        job_id = message["job"]["job_id"]
+        handler_name = message.get("handler")
+        adopted = job_manager.adopt_job(message["job"])
+        job = job_manager.get_job(job_id)
+        reporter: Optional[asyncio.Task] = None
+        try:
+            if await self.broker.is_cancelled(job_id):
+                logger.info(f"Job {job_id} was cancelled before it started")
+                job = None
+                return
+            if handler_name not in self.HANDLERS:
+                job_manager.set_job_error(
+                    job_id, "Processing failed", f"Unknown handler {handler_name!r}"
+                )
+                return
+            reporter = asyncio.create_task(self._report_progress(job_id))
+            handler = getattr(job_manager, handler_name)
+            try:
+                await handler(job_id, *message.get("args", []))
+            except JobManagerError:
+                # Already recorded on the job
+                pass
+        except asyncio.CancelledError:
+            if job:
+                job.cancel()
+        finally:
+            if reporter:
+                reporter.cancel()
+            if job:
+                await self.broker.publish_event(job_id, job.model_dump(mode="json"))
+            await self.broker.finish_job(job_id)
+            if adopted:
+                job_manager.forget_job(job_id)
+
+    async def _report_progress(self, job_id: str) -> None:
+        """Publish a running job's snapshot whenever it changes and keep its lease."""
+        last_update = None
+        last_renewal = time.monotonic()
+        interval = min(self.PUBLISH_INTERVAL, self.broker.lease_seconds / 3)
+        while True:
+            job = job_manager.get_job(job_id)
+            if job and job.updated_at != last_update:
+                last_update = job.updated_at
+                await self.broker.publish_event(job_id, job.model_dump(mode="json"))
+            if time.monotonic() - last_renewal >= self.broker.lease_seconds / 3:
+                await self.broker.renew_lease(job_id)
+                last_renewal = time.monotonic()
+            await asyncio.sleep(interval)
+
+
+async def run_worker(concurrency: int) -> None:
+    """
+    Run a worker against the configured broker until SIGINT or SIGTERM.
+
+    Args:
+        concurrency: Jobs run at the same time
+    """
+    if job_broker is None:
+        raise SystemExit("Set JOB_BROKER=redis to run a separate worker")
+
+    loop = asyncio.get_running_loop()
+    if separation_pool.enabled:
+        await loop.run_in_executor(None, separation_pool.start)
+    elif settings.separation_backend == "inprocess" and settings.preload_model:
+        try:
+            await loop.run_in_executor(None, vocal_extractor.preload_model)
+        except SeparationEngineError as e:
+            logger.warning(f"Model preload failed, will retry on first job: {e}")
+
+    worker = JobWorker(job_broker, concurrency)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await extraction_pipeline.stop()
+        await loop.run_in_executor(None, separation_pool.shutdown)
+        shared_buffers.close()
+        job_store.close()
+        await job_broker.close()
+
+
+def main() -> None:
+    """Run the worker."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--concurrency", type=int,
+        default=settings.worker_concurrency or settings.max_concurrent_jobs
+    )
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
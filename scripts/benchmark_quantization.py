@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark dynamic int8 quantized inference against the float model.
+
+Builds synthetic mixtures (a vocal-like harmonic source over drums, bass
+and pads), separates them with both model variants and reports speedup and
+the SDR of the vocal estimate against the known reference.
+
+Usage:
+    python scripts/benchmark_quantization.py [--model htdemucs] [--tracks 3]
+"""
+import argparse
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.audio_io import write_wav  # noqa: E402
+from app.services.separation_engine import separation_engine  # noqa: E402
+
+
+def synth_vocals(length: int, samplerate: int, generator: torch.Generator) -> torch.Tensor:
+    """Harmonic tone with vibrato and syllable-like amplitude envelope."""
+    t = torch.arange(length) / samplerate
+    base = 180 + 120 * torch.rand(1, generator=generator).item()
+    # Melody steps every half second
+    steps = torch.randint(-5, 6, (int(length / samplerate * 2) + 1,), generator=generator)
+    pitch = base * 2 ** (steps[(t * 2).long()] / 12)
+    freq = pitch * (1 + 0.01 * torch.sin(2 * math.pi * 5.5 * t))
+    phase = 2 * math.pi * torch.cumsum(freq, 0) / samplerate
+    voice = sum(torch.sin(k * phase) / k for k in range(1, 8))
+    envelope = (torch.sin(2 * math.pi * 2 * t).abs() ** 0.5)
+    mono = 0.3 * voice * envelope
+    return torch.stack([mono, mono])
+
+
+def synth_accompaniment(length: int, samplerate: int, generator: torch.Generator) -> torch.Tensor:
+    """Kick, hi-hat noise, bass line and sustained chord pad."""
+    t = torch.arange(length) / samplerate
+    beat = (t * 2) % 1
+    kick = torch.sin(2 * math.pi * 60 * t) * torch.exp(-beat * 30)
+    hats = torch.randn(length, generator=generator) * torch.exp(-((t * 4) % 1) * 60) * 0.1
+    bass = 0.3 * torch.sin(2 * math.pi * 55 * t)
+    pad = 0.1 * sum(torch.sin(2 * math.pi * f * t) for f in (220, 277.2, 329.6))
+    left = 0.5 * kick + hats + bass + pad
+    right = 0.5 * kick + hats.roll(100) + bass + pad
+    return torch.stack([left, right])
+
+
+def sdr(reference: torch.Tensor, estimate: torch.Tensor) -> float:
+    """Signal-to-distortion ratio in dB."""
+    length = min(reference.shape[-1], estimate.shape[-1])
+    reference, estimate = reference[..., :length], estimate[..., :length]
+    noise = (reference - estimate).pow(2).sum()
+    return 10 * math.log10(reference.pow(2).sum().item() / max(noise.item(), 1e-10))
+
+
+def separate(path: Path, model: str, quantize: bool) -> tuple[torch.Tensor, float]:
+    """Separate one file and return (vocals, seconds)."""
+    start = time.perf_counter()
+    sources = separation_engine.separate(
+        str(path), model, shifts=0, stems=["vocals"], quantize=quantize
+    )
+    return sources["vocals"].clone(), time.perf_counter() - start
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default="htdemucs")
+    parser.add_argument("--tracks", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    float_model = separation_engine.load_model(args.model)
+    separation_engine.load_model(args.model, quantize=True)
+    samplerate = float_model.samplerate
+    length = int(args.seconds * samplerate)
+    generator = torch.Generator().manual_seed(args.seed)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for index in range(args.tracks):
+            vocals = synth_vocals(length, samplerate, generator)
+            mixture = vocals + synth_accompaniment(length, samplerate, generator)
+            path = Path(tmp_dir) / f"mix_{index}.wav"
+            write_wav(path, mixture, samplerate)
+            # Reference goes through the same 16-bit quantization as the input
+            scale = 1 / (1.01 * mixture.abs().max().item()) if mixture.abs().max() > 1 else 1
+
+            float_vocals, float_time = separate(path, args.model, quantize=False)
+            int8_vocals, int8_time = separate(path, args.model, quantize=True)
+            rows.append((
+                float_time,
+                int8_time,
+                sdr(vocals * scale, float_vocals),
+                sdr(vocals * scale, int8_vocals),
+                sdr(float_vocals, int8_vocals),
+            ))
+
+    print(f"{'track':>5} {'float s':>8} {'int8 s':>8} {'speedup':>8} "
+          f"{'SDR fp':>7} {'SDR q':>7} {'delta':>7} {'q vs fp':>8}")
+    for index, (float_time, int8_time, float_sdr, int8_sdr, match_sdr) in enumerate(rows):
+        print(f"{index:>5} {float_time:>8.2f} {int8_time:>8.2f} "
+              f"{float_time / int8_time:>7.2f}x {float_sdr:>7.2f} {int8_sdr:>7.2f} "
+              f"{int8_sdr - float_sdr:>+7.2f} {match_sdr:>8.2f}")
+
+    total_float = sum(row[0] for row in rows)
+    total_int8 = sum(row[1] for row in rows)
+    mean_delta = sum(row[3] - row[2] for row in rows) / len(rows)
+    print(f"\nSpeedup: {total_float / total_int8:.2f}x, mean SDR delta: {mean_delta:+.2f} dB")
+
+
+if __name__ == "__main__":
+    main()
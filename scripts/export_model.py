@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Export a Demucs model as a TorchScript or ONNX segment graph.
+
+The graph is traced at the model's full segment length and the configured
+separation batch size, and saved to EXPORTED_MODEL_DIR together with a JSON
+metadata file. Set INFERENCE_BACKEND to the exported format to serve it.
+
+Usage:
+    python scripts/export_model.py --format torchscript [--model htdemucs] [--quantize]
+    python scripts/export_model.py --format onnx [--model htdemucs]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings  # noqa: E402
+from app.services.inference_backend import (  # noqa: E402
+    BACKEND_EXTENSIONS, InferenceBackendError, export_model
+)
+
+
+def main() -> None:
+    """Run the export."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--format", required=True, choices=sorted(BACKEND_EXTENSIONS))
+    parser.add_argument("--model", default=settings.demucs_model)
+    parser.add_argument("--quantize", action="store_true",
+                        help="export the dynamic int8 variant (TorchScript only)")
+    parser.add_argument("--batch-size", type=int, default=settings.separation_batch_size)
+    args = parser.parse_args()
+
+    try:
+        path = export_model(args.model, args.format, args.quantize, args.batch_size)
+    except InferenceBackendError as e:
+        sys.exit(f"Export failed: {e}")
+    print(f"Exported {args.model} to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -49,6 +49,15 @@ resource "aws_ecs_task_definition" "app" {
         {
           name  = "DEBUG"
           value = "false"
+        },
+        # Only the ALB can reach the tasks (see the ecs_tasks security group)
+        {
+          name  = "FORWARDED_ALLOW_IPS"
+          value = "*"
+        },
+        {
+          name  = "TRUSTED_PROXY_HOPS"
+          value = "1"
         }
       ]
 
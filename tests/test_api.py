@@ -0,0 +1,58 @@
+"""Tests for API request handling."""
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.config import settings
+from app.models.job import JobStatus, JobType
+from app.routers import api as api_module
+from app.routers.api import _client_id
+from app.services.job_manager import JobManager
+
+
+def _request(headers: dict[str, str], host: str = "10.0.1.5") -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": (host, 1234),
+    })
+
+
+def test_unknown_api_key_counts_as_the_ip(monkeypatch):
+    monkeypatch.setattr(settings, "api_keys", ["known"])
+
+    assert _client_id(_request({"X-API-Key": "made-up"})) == "ip:10.0.1.5"
+    assert _client_id(_request({"X-API-Key": "known"})).startswith("key:")
+
+
+def test_forwarded_client_ip_is_read_behind_trusted_proxies(monkeypatch):
+    # The client's own entry is followed by the one the proxy appended
+    request = _request({"X-Forwarded-For": "1.2.3.4, 203.0.113.7"})
+
+    assert _client_id(request) == "ip:10.0.1.5"
+    monkeypatch.setattr(settings, "trusted_proxy_hops", 1)
+    assert _client_id(request) == "ip:203.0.113.7"
+
+
+@pytest.mark.asyncio
+async def test_preview_is_served_once_ready_while_processing(monkeypatch, tmp_path):
+    manager = JobManager()
+    monkeypatch.setattr(api_module, "job_manager", manager)
+    monkeypatch.setattr(api_module.vocal_extractor, "output_dir", tmp_path)
+    job = manager.create_job(JobType.FILE_UPLOAD)
+    job.update_status(JobStatus.PROCESSING, 50.0)
+
+    with pytest.raises(HTTPException) as not_ready:
+        await api_module.preview_vocal(job.job_id)
+    assert not_ready.value.status_code == 400
+    assert (await api_module.get_job_status(job.job_id)).preview_url is None
+
+    preview_path = api_module.vocal_extractor.preview_path(job.job_id)
+    preview_path.parent.mkdir(parents=True)
+    preview_path.write_bytes(b"RIFF")
+    manager.update_job_progress(job.job_id, 60.0, preview_ready=True)
+
+    response = await api_module.preview_vocal(job.job_id)
+    assert response.path == str(preview_path)
+    status = await api_module.get_job_status(job.job_id)
+    assert status.preview_url == f"/api/preview/{job.job_id}"
@@ -0,0 +1,176 @@
+"""Tests for the job brokers and the worker round trip."""
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.models.job import Job, JobStatus, JobType  # noqa: E402
+from app.services import job_manager as job_manager_module  # noqa: E402
+from app.services.broker import (  # noqa: E402
+    JOB_LOST, JOB_QUEUED, JOB_RUNNING, InProcessBroker, RedisBroker
+)
+from app.services.job_manager import job_manager  # noqa: E402
+from app.worker import JobWorker  # noqa: E402
+
+
+def _message(job_id: str = "job-1") -> dict:
+    return {"job": {"job_id": job_id}, "handler": "process_file_upload", "args": ["in.wav"]}
+
+
+@pytest.fixture(params=["inprocess", "redis"])
+def broker(request):
+    if request.param == "inprocess":
+        return InProcessBroker(lease_seconds=0.2)
+    return RedisBroker(
+        "redis://unused", prefix="test", lease_seconds=0.2,
+        client=fakeredis.aioredis.FakeRedis()
+    )
+
+
+@pytest.mark.asyncio
+async def test_job_round_trip(broker):
+    await broker.submit_job(_message())
+    assert await broker.job_state("job-1") == JOB_QUEUED
+
+    message = await broker.next_job(timeout=1)
+    assert message == _message()
+    assert await broker.job_state("job-1") == JOB_RUNNING
+
+    await broker.publish_event("job-1", {"progress": 50})
+    await broker.publish_event("job-1", {"progress": 100})
+    async with aclosing(broker.events("job-1", timeout=1)) as events:
+        assert await anext(events) == {"progress": 50}
+        assert await anext(events) == {"progress": 100}
+
+    await broker.finish_job("job-1")
+    assert await broker.job_state("job-1") == JOB_LOST
+    assert await broker.next_job(timeout=1) is None
+
+
+@pytest.mark.asyncio
+async def test_events_time_out_with_none(broker):
+    await broker.submit_job(_message())
+    async with aclosing(broker.events("job-1", timeout=1)) as events:
+        assert await anext(events) is None
+
+
+@pytest.mark.asyncio
+async def test_unrenewed_lease_marks_job_lost(broker):
+    await broker.submit_job(_message())
+    await broker.next_job(timeout=1)
+
+    await asyncio.sleep(0.1)
+    await broker.renew_lease("job-1")
+    await asyncio.sleep(0.15)
+    assert await broker.job_state("job-1") == JOB_RUNNING
+
+    await asyncio.sleep(0.25)
+    assert await broker.job_state("job-1") == JOB_LOST
+
+
+@pytest.mark.asyncio
+async def test_removed_job_is_not_delivered(broker):
+    await broker.submit_job(_message("job-1"))
+    await broker.submit_job(_message("job-2"))
+
+    await broker.remove_job("job-1")
+
+    assert (await broker.next_job(timeout=1))["job"]["job_id"] == "job-2"
+
+
+@pytest.mark.asyncio
+async def test_cancellations_reach_listeners(broker):
+    received = []
+
+    async def listen():
+        async for job_id in broker.cancellations():
+            received.append(job_id)
+            return
+
+    await broker.submit_job(_message())
+    await broker.next_job(timeout=1)
+    listener = asyncio.create_task(listen())
+    await asyncio.sleep(0.05)
+
+    await broker.cancel_job("job-1")
+    await asyncio.wait_for(listener, 2)
+
+    assert received == ["job-1"]
+    assert await broker.is_cancelled("job-1")
+    await broker.finish_job("job-1")
+    assert not await broker.is_cancelled("job-1")
+
+
+@pytest.mark.asyncio
+async def test_in_process_events_after_reader_left_are_dropped():
+    broker = InProcessBroker()
+    await broker.submit_job(_message())
+    async with aclosing(broker.events("job-1", timeout=0.01)) as events:
+        await anext(events)
+
+    await broker.publish_event("job-1", {"progress": 100})
+
+    assert broker._events == {}
+
+
+@pytest.fixture
+def worker_broker(monkeypatch):
+    broker = InProcessBroker(lease_seconds=0.1)
+    monkeypatch.setattr(job_manager_module, "job_broker", broker)
+    return broker
+
+
+async def process_file_upload(job_id: str, file_path: str) -> str:
+    """Stands in for JobManager.process_file_upload."""
+    job_manager.update_job_status(job_id, JobStatus.PROCESSING, 0)
+    await asyncio.sleep(0.05)
+    job_manager.update_job_progress(job_id, 50)
+    await asyncio.sleep(0.05)
+    job_manager.update_job_status(job_id, JobStatus.COMPLETED, 100)
+    return file_path
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_job_and_reports_back(worker_broker, monkeypatch):
+    monkeypatch.setattr(job_manager, "process_file_upload", process_file_upload)
+    job = job_manager.create_job(JobType.FILE_UPLOAD)
+    worker = JobWorker(worker_broker, concurrency=1)
+    worker_task = asyncio.create_task(worker.run())
+
+    await asyncio.wait_for(
+        job_manager._run_on_worker(job.job_id, process_file_upload, ("in.wav",)), 5
+    )
+
+    assert job_manager.get_job(job.job_id).status == JobStatus.COMPLETED
+    worker.stop()
+    await worker_task
+
+
+@pytest.mark.asyncio
+async def test_job_of_lost_worker_is_submitted_again(worker_broker, monkeypatch):
+    monkeypatch.setattr(job_manager, "process_file_upload", process_file_upload)
+    job = job_manager.create_job(JobType.FILE_UPLOAD)
+    api = asyncio.create_task(
+        job_manager._run_on_worker(job.job_id, process_file_upload, ("in.wav",))
+    )
+
+    # A worker takes the job and dies without reporting
+    lost = await worker_broker.next_job(timeout=1)
+    assert lost["job"]["job_id"] == job.job_id
+
+    worker = JobWorker(worker_broker, concurrency=1)
+    worker_task = asyncio.create_task(worker.run())
+    await asyncio.wait_for(api, 5)
+
+    assert job_manager.get_job(job.job_id).status == JobStatus.COMPLETED
+    worker.stop()
+    await worker_task
+
+
+def test_job_snapshots_round_trip_through_json():
+    job = Job(job_type=JobType.YOUTUBE_DOWNLOAD, input_url="https://youtu.be/x")
+    job.update_status(JobStatus.PROCESSING, 40)
+
+    assert Job.model_validate(job.model_dump(mode="json")) == job
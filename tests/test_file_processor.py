@@ -0,0 +1,35 @@
+"""Tests for upload handling."""
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from app.services.file_processor import FileProcessor, FileProcessorError
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    monkeypatch.setattr(FileProcessor, "MAX_FILE_SIZE", 2500)
+    monkeypatch.setattr(FileProcessor, "UPLOAD_CHUNK_SIZE", 1000)
+    processor = FileProcessor()
+    processor.upload_dir = tmp_path
+    return processor
+
+
+@pytest.mark.asyncio
+async def test_upload_is_written_in_chunks(processor, tmp_path):
+    upload = UploadFile(io.BytesIO(b"x" * 2500), filename="set.wav")
+
+    file_path, file_size = await processor.save_upload_file(upload, "job-1")
+
+    assert file_size == 2500
+    assert (tmp_path / "job-1.wav").read_bytes() == b"x" * 2500
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_is_rejected_and_removed(processor, tmp_path):
+    upload = UploadFile(io.BytesIO(b"x" * 2501), filename="set.wav")
+
+    with pytest.raises(FileProcessorError):
+        await processor.save_upload_file(upload, "job-1")
+    assert not (tmp_path / "job-1.wav").exists()
@@ -0,0 +1,256 @@
+"""Tests for the job manager's queue scheduling."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.job import JobStatus, JobType
+from app.routers import api as api_module
+from app.services import job_manager as job_manager_module
+from app.services.cancellation import cancellation
+from app.services.job_manager import JobManager
+
+
+class FakeClock:
+    """Stands in for the time module so enqueue times can be chosen."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(job_manager_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def manager(clock):
+    manager = JobManager()
+    manager._max_concurrent = 1
+    return manager
+
+
+class Recorder:
+    """Handler that records start order and runs until released."""
+
+    def __init__(self):
+        self.started: list[str] = []
+        self.release: dict[str, asyncio.Event] = {}
+
+    async def __call__(self, job_id: str) -> None:
+        self.started.append(job_id)
+        await self.release.setdefault(job_id, asyncio.Event()).wait()
+
+    async def finish(self, job_id: str) -> None:
+        self.release.setdefault(job_id, asyncio.Event()).set()
+        # Let the task end and the done callback start the next job
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+
+def _queue(manager, handler, seconds: float, client_id: str = "client-a", **kwargs) -> str:
+    job = manager.create_job(JobType.FILE_UPLOAD, client_id=client_id, **kwargs)
+    job.estimated_duration = seconds
+    manager.enqueue_job(job.job_id, handler)
+    return job.job_id
+
+
+@pytest.mark.asyncio
+async def test_shorter_jobs_start_first(manager):
+    handler = Recorder()
+    blocker = _queue(manager, handler, 10)
+    long_job = _queue(manager, handler, 300)
+    short_job = _queue(manager, handler, 20)
+    await asyncio.sleep(0)
+
+    await handler.finish(blocker)
+    await handler.finish(short_job)
+
+    assert handler.started == [blocker, short_job, long_job]
+
+
+@pytest.mark.asyncio
+async def test_waiting_job_ages_ahead_of_newer_shorter_jobs(manager, clock):
+    handler = Recorder()
+    blocker = _queue(manager, handler, 10)
+    long_job = _queue(manager, handler, 300)
+    clock.now += 400
+    short_job = _queue(manager, handler, 20)
+    await asyncio.sleep(0)
+
+    await handler.finish(blocker)
+
+    assert handler.started == [blocker, long_job]
+    await handler.finish(long_job)
+    assert handler.started[-1] == short_job
+
+
+@pytest.mark.asyncio
+async def test_batch_class_waits_behind_interactive(manager):
+    handler = Recorder()
+    blocker = _queue(manager, handler, 10)
+    batch = _queue(manager, handler, 10, priority_class="batch")
+    interactive = _queue(manager, handler, 600)
+    await asyncio.sleep(0)
+
+    await handler.finish(blocker)
+
+    assert handler.started == [blocker, interactive]
+    await handler.finish(interactive)
+    assert handler.started[-1] == batch
+
+
+@pytest.mark.asyncio
+async def test_queue_positions_and_waits(manager, clock):
+    handler = Recorder()
+    blocker = _queue(manager, handler, 100)
+    first = _queue(manager, handler, 30)
+    second = _queue(manager, handler, 50)
+
+    assert manager.get_queue_position(blocker) == 0
+    assert manager.get_queue_position(first) == 1
+    assert manager.get_queue_position(second) == 2
+    # The running job's 100 s plus the 30 s queued ahead
+    assert manager.get_estimated_wait_time(second) == pytest.approx(130)
+    assert manager.get_estimated_wait_time(blocker) is None
+
+
+@pytest.mark.asyncio
+async def test_queue_positions_refresh_at_most_once_per_interval(manager, clock):
+    handler = Recorder()
+    _queue(manager, handler, 100)
+    first = _queue(manager, handler, 30)
+    manager.get_queue_position(first)
+
+    # Shorter, so it would go ahead; the snapshot puts it last until refreshed
+    shorter = _queue(manager, handler, 10)
+    assert manager.get_queue_position(shorter) == 2
+    assert manager.get_estimated_wait_time(shorter) == pytest.approx(130)
+
+    clock.now += JobManager.QUEUE_ORDER_REFRESH_SECONDS
+    assert manager.get_queue_position(shorter) == 1
+    assert manager.get_queue_position(first) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_leaves_the_queue(manager):
+    handler = Recorder()
+    blocker = _queue(manager, handler, 10)
+    cancelled = _queue(manager, handler, 20)
+    kept = _queue(manager, handler, 30)
+
+    manager.cancel_job(cancelled)
+
+    assert manager.get_stats()["queued_jobs"] == 1
+    await handler.finish(blocker)
+    assert handler.started == [blocker, kept]
+
+
+@pytest.mark.asyncio
+async def test_clients_take_turns(manager, clock):
+    handler = Recorder()
+    blocker = _queue(manager, handler, 100)
+    first = _queue(manager, handler, 100)
+    second = _queue(manager, handler, 100)
+    other = _queue(manager, handler, 100, client_id="client-b")
+
+    for job_id in (blocker, first, other):
+        clock.now += 100
+        await handler.finish(job_id)
+
+    assert handler.started == [blocker, first, other, second]
+
+
+@pytest.mark.asyncio
+async def test_overrunning_client_is_charged_and_later_forgotten(manager, clock):
+    handler = Recorder()
+    overrun = _queue(manager, handler, 10)
+    clock.now += 1000
+    await handler.finish(overrun)
+
+    debt = manager._clients["client-a"].deficit
+    assert debt < -900
+
+    # Debt is forgiven while idle; the client is dropped once it owes nothing
+    clock.now += JobManager.CLIENT_SWEEP_SECONDS
+    _queue(manager, handler, 10, client_id="client-b")
+    assert manager._clients["client-a"].deficit == pytest.approx(
+        debt + JobManager.CLIENT_SWEEP_SECONDS * JobManager.DEBT_FORGIVENESS_RATE
+    )
+    clock.now += -debt / JobManager.DEBT_FORGIVENESS_RATE
+    _queue(manager, handler, 10, client_id="client-b")
+    assert "client-a" not in manager._clients
+
+
+@pytest.mark.asyncio
+async def test_jobs_started_with_a_long_queue_fall_back_to_draft(manager, monkeypatch):
+    monkeypatch.setattr(job_manager_module.settings, "draft_under_load_queued_jobs", 1)
+    saved = []
+    monkeypatch.setattr(job_manager_module.job_store, "save", saved.append)
+    monkeypatch.setattr(
+        job_manager_module.time_predictor, "predict",
+        lambda duration, profile, load=1: 3.0 if profile == "draft" else 10.0
+    )
+    handler = Recorder()
+    blocker, first, second, third = (_queue(manager, handler, 10) for _ in range(4))
+    saved.clear()
+
+    await handler.finish(blocker)
+    await handler.finish(first)
+
+    assert manager.get_job(blocker).profile is None
+    assert manager.get_job(first).profile == "draft"
+    assert manager.get_job(first).estimated_duration == 3.0
+    assert [job.job_id for job in saved] == [first]
+    assert manager.get_job(second).profile is None
+
+
+@pytest.mark.asyncio
+async def test_expired_jobs_are_cleaned_up_without_holding_the_lock(manager, monkeypatch):
+    job = manager.create_job(JobType.FILE_UPLOAD)
+    locked_during_cleanup = []
+    monkeypatch.setattr(
+        job_manager_module.job_store, "list_expired", lambda threshold, statuses: [job.job_id]
+    )
+    monkeypatch.setattr(
+        job_manager_module.file_processor, "cleanup_job_files",
+        lambda job_id: locked_during_cleanup.append(manager._lock.locked())
+    )
+
+    assert manager.cleanup_expired_jobs() == 1
+
+    assert locked_during_cleanup == [False]
+    assert manager.get_job(job.job_id) is None
+
+
+@pytest.mark.asyncio
+async def test_delete_endpoint_cancels_queued_and_running_jobs(manager, monkeypatch):
+    monkeypatch.setattr(api_module, "job_manager", manager)
+    handler = Recorder()
+    running = _queue(manager, handler, 10)
+    queued = _queue(manager, handler, 20)
+    after = _queue(manager, handler, 30)
+    await asyncio.sleep(0)
+
+    response = await api_module.cancel_job(queued)
+    assert (response.status, response.message) == (JobStatus.CANCELLED, "Job cancelled")
+
+    response = await api_module.cancel_job(running)
+    assert response.status == JobStatus.CANCELLED
+    assert cancellation.is_cancelled(running)
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+    # The running job's slot went to the next job; the cancelled one never started
+    assert handler.started == [running, after]
+    with pytest.raises(HTTPException) as finished:
+        await api_module.cancel_job(running)
+    assert finished.value.status_code == 409
+    with pytest.raises(HTTPException) as missing:
+        await api_module.cancel_job("no-such-job")
+    assert missing.value.status_code == 404
@@ -0,0 +1,115 @@
+"""Tests for the SQLite job store."""
+import os
+import socket
+
+import pytest
+
+from app.models.job import Job, JobStatus, JobType
+from app.services.job_store import SqliteJobStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "jobs.db"
+
+
+def _job(status: JobStatus = JobStatus.PROCESSING) -> Job:
+    job = Job(job_type=JobType.FILE_UPLOAD, input_file_path="/tmp/input.wav")
+    job.update_status(status, 10)
+    return job
+
+
+def test_progress_is_batched_until_flush(db_path):
+    writer = SqliteJobStore(db_path, flush_interval=3600)
+    reader = SqliteJobStore(db_path, flush_interval=3600)
+    job = _job()
+    writer.save(job)
+
+    job.progress = 55.0
+    writer.save_progress(job)
+
+    assert writer.get(job.job_id).progress == 55.0
+    assert reader.get(job.job_id).progress == 10
+    writer.flush()
+    assert reader.get(job.job_id).progress == 55.0
+
+
+def test_save_writes_pending_progress_of_other_jobs(db_path):
+    writer = SqliteJobStore(db_path, flush_interval=3600)
+    reader = SqliteJobStore(db_path, flush_interval=3600)
+    first, second = _job(), _job()
+    writer.save(first)
+    first.progress = 70.0
+    writer.save_progress(first)
+
+    writer.save(second)
+
+    assert reader.get(first.job_id).progress == 70.0
+
+
+def test_recover_claims_jobs_of_dead_owner_once(db_path):
+    dead = SqliteJobStore(db_path)
+    # A pid that cannot exist on this host
+    dead.owner = f"{socket.gethostname()}:{2 ** 22 + 1}"
+    orphan = _job()
+    finished = _job(JobStatus.COMPLETED)
+    dead.save(orphan)
+    dead.save(finished)
+
+    survivor = SqliteJobStore(db_path)
+    # Stands in for another live process on this host
+    survivor.owner = f"{socket.gethostname()}:{os.getppid()}"
+    recovered = survivor.recover()
+
+    assert [job.job_id for job in recovered] == [orphan.job_id]
+    assert SqliteJobStore(db_path).recover() == []
+
+
+def test_saves_by_other_processes_keep_the_owner(db_path):
+    owner = SqliteJobStore(db_path)
+    worker = SqliteJobStore(db_path)
+    worker.owner = "worker-host:1"
+    job = _job()
+    owner.save(job)
+
+    job.update_status(JobStatus.COMPLETED, 100)
+    worker.save(job)
+    worker.request_cancel(job.job_id)
+
+    assert worker.get(job.job_id).status == JobStatus.COMPLETED
+    assert worker.take_cancel_requests() == []
+    assert owner.take_cancel_requests() == [job.job_id]
+
+
+def test_jobs_on_other_hosts_are_left_alone(db_path):
+    remote = SqliteJobStore(db_path)
+    remote.owner = "other-host:1"
+    remote.save(_job())
+
+    assert SqliteJobStore(db_path).recover() == []
+
+
+def test_cancel_requests_reach_only_the_owner(db_path):
+    owner = SqliteJobStore(db_path)
+    other = SqliteJobStore(db_path)
+    other.owner = "other-host:1"
+    job = _job()
+    owner.save(job)
+
+    other.request_cancel(job.job_id)
+
+    assert other.take_cancel_requests() == []
+    assert owner.take_cancel_requests() == [job.job_id]
+    assert owner.take_cancel_requests() == []
+
+
+def test_count_and_expiry_queries(db_path):
+    store = SqliteJobStore(db_path)
+    running, done = _job(), _job(JobStatus.COMPLETED)
+    store.save(running)
+    store.save(done)
+
+    assert store.count_by_status() == {"processing": 1, "completed": 1}
+    assert store.list_expired(done.created_at.max, (JobStatus.COMPLETED,)) == [done.job_id]
+    store.delete(done.job_id)
+    assert store.get(done.job_id) is None
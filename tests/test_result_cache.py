@@ -0,0 +1,96 @@
+"""Tests for the separation result cache."""
+import os
+
+import pytest
+
+from app.services.result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ResultCache, "_load_index", lambda self: None)
+    cache = ResultCache()
+    cache.enabled = True
+    cache.cache_dir = tmp_path / "cache"
+    cache.cache_dir.mkdir()
+    cache.max_size_bytes = 250
+    cache.policy = "lru"
+    return cache
+
+
+def _stem(tmp_path, name: str, size: int = 100) -> str:
+    path = tmp_path / f"{name}.wav"
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def _dest(tmp_path, *stems: str) -> dict[str, str]:
+    return {stem: str(tmp_path / "out" / f"{stem}.wav") for stem in stems}
+
+
+def test_stems_of_later_jobs_join_the_entry(cache, tmp_path):
+    cache.put("key", {"vocals": _stem(tmp_path, "vocals")})
+    cache.put("key", {"drums": _stem(tmp_path, "drums", 50)})
+
+    assert set(cache.get("key", _dest(tmp_path, "vocals", "drums"))) == {"vocals", "drums"}
+    assert cache._index["key"]["size"] == 150
+
+
+def test_partial_hit_counts_once_as_a_miss(cache, tmp_path):
+    cache.put("key", {"vocals": _stem(tmp_path, "vocals")})
+
+    found = cache.get("key", _dest(tmp_path, "vocals", "bass"))
+
+    assert list(found) == ["vocals"]
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (0, 1)
+
+
+def test_least_recently_used_entry_is_evicted(cache, tmp_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("app.services.result_cache.time.time", lambda: next(clock))
+    cache.put("old", {"vocals": _stem(tmp_path, "a")})
+    cache.put("used", {"vocals": _stem(tmp_path, "b")})
+    cache.get("old", _dest(tmp_path, "vocals"))
+
+    cache.put("new", {"vocals": _stem(tmp_path, "c")})
+
+    assert set(cache._index) == {"old", "new"}
+    assert not (cache.cache_dir / "used_vocals.wav").exists()
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_least_frequently_used_entry_is_evicted(cache, tmp_path):
+    cache.policy = "lfu"
+    cache.put("popular", {"vocals": _stem(tmp_path, "a")})
+    cache.put("rare", {"vocals": _stem(tmp_path, "b")})
+    for _ in range(2):
+        cache.get("popular", _dest(tmp_path, "vocals"))
+
+    cache.put("new", {"vocals": _stem(tmp_path, "c")})
+
+    assert "rare" not in cache._index
+    assert "popular" in cache._index
+
+
+def test_unreadable_entry_is_dropped(cache, tmp_path):
+    cache.put("key", {"vocals": _stem(tmp_path, "vocals")})
+    (cache.cache_dir / "key_vocals.wav").unlink()
+
+    assert cache.get("key", _dest(tmp_path, "vocals")) == {}
+    assert "key" not in cache._index
+
+
+def test_entries_whose_files_were_removed_are_dropped_on_refresh(cache, tmp_path):
+    cache.put("kept", {"vocals": _stem(tmp_path, "a")})
+    cache.put("removed", {"vocals": _stem(tmp_path, "b")})
+
+    # Deleted outside the cache while another process touched the index
+    (cache.cache_dir / "removed_vocals.wav").unlink()
+    index_path = cache.cache_dir / ResultCache.INDEX_FILENAME
+    mtime = index_path.stat().st_mtime_ns + 1
+    os.utime(index_path, ns=(mtime, mtime))
+
+    assert cache.get_stats()["entries"] == 1
+    assert set(cache._index) == {"kept"}
+    assert cache.get("removed", _dest(tmp_path, "vocals")) == {}
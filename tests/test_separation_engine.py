@@ -0,0 +1,235 @@
+"""Tests for overlap-add separation, silence skipping and checkpoint resume."""
+import io
+
+import pytest
+import torch
+
+from app.config import settings
+from app.services import audio_io
+from app.services import separation_engine as separation_engine_module
+from app.services.audio_io import StreamingAudio
+from app.services.inference_backend import InferenceBackend
+from app.services.progress import SegmentProgress
+from app.services.separation_engine import (
+    SeparationCancelledError, SeparationEngine, plan_segments
+)
+from app.services.silence import RMS_FRAME_LENGTH
+
+
+SAMPLERATE = 1000
+SOURCES = ["drums", "bass", "other", "vocals"]
+
+
+class IdentityBackend(InferenceBackend):
+    """Returns every segment unchanged as each source."""
+
+    name = "identity"
+
+    def __init__(self):
+        super().__init__({
+            "samplerate": SAMPLERATE,
+            "audio_channels": 2,
+            "sources": SOURCES,
+            "segment_length": 1000,
+        })
+
+    @property
+    def fixed_shape(self) -> bool:
+        return False
+
+    def _forward(self, batch: torch.Tensor) -> torch.Tensor:
+        return batch.unsqueeze(1).repeat(1, len(SOURCES), 1, 1)
+
+
+@pytest.fixture
+def engine():
+    engine = SeparationEngine()
+    engine._models["identity"] = IdentityBackend()
+    yield engine
+    engine.batcher.stop()
+
+
+def _track(frames: int, silent_frames: list[range]) -> torch.Tensor:
+    generator = torch.Generator().manual_seed(0)
+    wav = torch.rand(2, frames * RMS_FRAME_LENGTH, generator=generator) - 0.5
+    for frame_range in silent_frames:
+        wav[:, frame_range.start * RMS_FRAME_LENGTH:frame_range.stop * RMS_FRAME_LENGTH] = 0.0
+    return wav
+
+
+def _separate(engine, wav: torch.Tensor, **kwargs) -> dict[str, torch.Tensor]:
+    decoded = {
+        "array": wav.numpy(), "samplerate": SAMPLERATE, "channels": wav.shape[0]
+    }
+    return engine.separate(
+        kwargs.pop("input_path", "track.wav"), "identity", decoded=decoded, **kwargs
+    )
+
+
+def test_plan_segments_covers_track():
+    starts = plan_segments(10_000, 1000, 0.25, shifts=0, max_shift=0)
+    assert starts[0] == 0
+    assert all(b - a == 750 for a, b in zip(starts, starts[1:]))
+    assert starts[-1] + 1000 >= 10_000
+
+
+def test_identity_model_reconstructs_input(engine, monkeypatch):
+    monkeypatch.setattr(settings, "silence_skip_enabled", False)
+    wav = _track(6, [])
+
+    result = _separate(engine, wav, stems=["vocals", "drums"])
+
+    assert set(result) == {"vocals", "drums"}
+    assert torch.allclose(result["vocals"], wav, atol=1e-4)
+    assert torch.allclose(result["drums"], wav, atol=1e-4)
+
+
+def test_silent_gap_and_tail_are_skipped(engine, monkeypatch):
+    monkeypatch.setattr(settings, "silence_skip_enabled", True)
+    # Silent middle section and silent tail, each longer than several segments
+    wav = _track(12, [range(3, 7), range(9, 12)])
+    fade = int(settings.silence_fade_ms * SAMPLERATE / 1000)
+
+    result = _separate(engine, wav, stems=["vocals"])["vocals"]
+
+    assert result.shape == wav.shape
+    for start, end in [(0, 3), (7, 9)]:
+        lo, hi = start * RMS_FRAME_LENGTH + fade, end * RMS_FRAME_LENGTH - fade
+        assert torch.allclose(result[:, lo:hi], wav[:, lo:hi], atol=1e-4)
+    for start, end in [(3, 7), (9, 12)]:
+        lo, hi = start * RMS_FRAME_LENGTH + fade, end * RMS_FRAME_LENGTH - fade
+        assert torch.count_nonzero(result[:, lo:hi]) == 0
+
+
+def test_fully_silent_track(engine, monkeypatch):
+    monkeypatch.setattr(settings, "silence_skip_enabled", True)
+    wav = torch.zeros(2, 4 * RMS_FRAME_LENGTH)
+
+    result = _separate(engine, wav, stems=["vocals"])["vocals"]
+
+    assert torch.count_nonzero(result) == 0
+
+
+def test_interrupted_separation_resumes_from_checkpoint(engine, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "silence_skip_enabled", True)
+    monkeypatch.setattr(settings, "checkpoint_enabled", True)
+    monkeypatch.setattr(settings, "checkpoint_interval_segments", 2)
+    wav = _track(10, [range(4, 7)])
+    input_path = tmp_path / "track.wav"
+    input_path.write_bytes(b"input")
+    work_dir = tmp_path / "work"
+    expected = _separate(engine, wav, stems=["vocals"])["vocals"].clone()
+
+    polls = 0
+
+    def stop_after_twelve() -> bool:
+        nonlocal polls
+        polls += 1
+        return polls > 12
+
+    with pytest.raises(SeparationCancelledError):
+        _separate(
+            engine, wav, stems=["vocals"], input_path=str(input_path),
+            work_dir=work_dir, should_stop=stop_after_twelve
+        )
+    assert (work_dir / "manifest.json").exists()
+
+    resumed = _separate(
+        engine, wav, stems=["vocals"], input_path=str(input_path), work_dir=work_dir
+    )["vocals"]
+
+    assert torch.allclose(torch.as_tensor(resumed), expected, atol=1e-5)
+
+
+def test_preview_is_reported_as_soon_as_its_window_is_final(engine, monkeypatch):
+    monkeypatch.setattr(settings, "silence_skip_enabled", False)
+    wav = _track(12, [])
+    reports = []
+    progress = SegmentProgress(
+        lambda value, **details: reports.append(details), max_updates_per_second=0
+    )
+    previews = []
+
+    # Mirrors the extractor, which writes the preview file and reports it
+    def on_preview(preview: dict) -> None:
+        previews.append((progress.done, preview["vocals"].clone()))
+        progress.notify(preview_ready=True)
+
+    result = _separate(
+        engine, wav, stems=["vocals"], progress=progress,
+        preview_samples=3000, on_preview=on_preview
+    )
+
+    assert len(previews) == 1
+    done, preview = previews[0]
+    assert done < progress.total
+    assert torch.allclose(preview, wav[:, :3000], atol=1e-4)
+    assert "preview_ready" not in reports[0]
+    assert reports[-1]["preview_ready"] is True
+    assert torch.allclose(result["vocals"], wav, atol=1e-4)
+
+
+def test_preview_only_run_stops_after_the_preview_window(engine, monkeypatch):
+    monkeypatch.setattr(settings, "silence_skip_enabled", False)
+    wav = _track(12, [])
+    full_run = SegmentProgress(None)
+    _separate(engine, wav, stems=["vocals"], progress=full_run)
+    progress = SegmentProgress(None)
+    previews = []
+
+    result = _separate(
+        engine, wav, stems=["vocals"], progress=progress,
+        preview_samples=3000, on_preview=previews.append, max_samples=3000
+    )
+
+    assert result["vocals"].shape == (2, 3000)
+    assert torch.allclose(result["vocals"], wav[:, :3000], atol=1e-4)
+    assert len(previews) == 1
+    assert progress.total < full_run.total
+
+
+class FakeDecoder:
+    """Stands in for an ffmpeg process decoding a track to float32 PCM."""
+
+    def __init__(self, wav: torch.Tensor):
+        self.stdout = io.BytesIO(wav.t().contiguous().numpy().tobytes())
+        self.returncode = 0
+
+    def wait(self) -> int:
+        return self.returncode
+
+    def kill(self) -> None:
+        pass
+
+
+def test_streaming_matches_in_memory_separation(engine, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "silence_skip_enabled", True)
+    monkeypatch.setattr(settings, "checkpoint_enabled", False)
+    wav = _track(12, [range(4, 7)])
+    input_path = tmp_path / "track.wav"
+    input_path.write_bytes(b"input")
+    expected = _separate(engine, wav, stems=["vocals", "bass"])
+
+    # Long enough to stream, decoded in chunks smaller than a segment
+    monkeypatch.setattr(settings, "streaming_threshold_seconds", 1.0)
+    monkeypatch.setattr(
+        separation_engine_module, "probe_duration", lambda path: wav.shape[-1] / SAMPLERATE
+    )
+    monkeypatch.setattr(audio_io, "CHUNK_FRAMES", 700)
+    monkeypatch.setattr(StreamingAudio, "_open", lambda self: FakeDecoder(wav))
+    opened = []
+    original_init = StreamingAudio.__init__
+
+    def record_init(self, *args):
+        original_init(self, *args)
+        opened.append(self)
+
+    monkeypatch.setattr(StreamingAudio, "__init__", record_init)
+
+    result = engine.separate(
+        str(input_path), "identity", stems=["vocals", "bass"], work_dir=tmp_path / "work"
+    )
+
+    assert len(opened) == 1
+    for stem in ("vocals", "bass"):
+        assert torch.allclose(torch.as_tensor(result[stem]), expected[stem], atol=1e-4)
@@ -0,0 +1,70 @@
+"""Tests for the shared-memory buffer pool."""
+import os
+
+import numpy as np
+import pytest
+
+from app.services import shared_buffers as shared_buffers_module
+from app.services.shared_buffers import SharedBufferError, SharedBufferPool, attach
+
+
+@pytest.fixture
+def pool():
+    pool = SharedBufferPool()
+    yield pool
+    pool.close()
+
+
+def test_released_buffer_is_reused(pool):
+    handle = pool.acquire((2, 1000))
+    pool.array(handle)[:] = 1.0
+    pool.release(handle)
+
+    again = pool.acquire((2, 900))
+
+    assert again["name"] == handle["name"]
+    assert pool.get_stats()["reuses"] == 1
+    pool.release(again)
+
+
+def test_attach_sees_owner_writes(pool):
+    handle = pool.acquire((2, 16))
+    pool.array(handle)[:] = np.arange(32, dtype=np.float32).reshape(2, 16)
+
+    with attach(handle) as array:
+        assert array[1, 15] == 31.0
+
+    pool.release(handle)
+
+
+def test_allocation_beyond_free_shm_space_is_refused(pool, monkeypatch):
+    class FullShm:
+        f_bavail = 1
+        f_frsize = 4096
+
+    monkeypatch.setattr(shared_buffers_module.os, "statvfs", lambda path: FullShm())
+
+    with pytest.raises(SharedBufferError):
+        pool.acquire((2, 1_000_000))
+    assert pool.get_stats()["blocks"] == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fallocate"), reason="needs posix_fallocate")
+def test_failed_reservation_unlinks_the_block(pool, monkeypatch):
+    def no_space(fd, offset, length):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(shared_buffers_module.os, "posix_fallocate", no_space)
+
+    with pytest.raises(SharedBufferError):
+        pool.acquire((2, 1000))
+    assert pool.get_stats()["blocks"] == 0
+
+
+@pytest.mark.parametrize("workers, expected", [(0, False), (2, True)])
+def test_enabled_by_default_only_for_worker_processes(monkeypatch, workers, expected):
+    monkeypatch.setattr(shared_buffers_module.settings, "shared_buffers_enabled", None)
+    monkeypatch.setattr(shared_buffers_module.settings, "separation_workers", workers)
+    monkeypatch.setattr(shared_buffers_module.settings, "separation_backend", "inprocess")
+
+    assert SharedBufferPool().enabled is expected
@@ -0,0 +1,52 @@
+"""Tests for the processing-time predictor."""
+import pytest
+
+from app.config import settings
+from app.services.time_predictor import TimePredictor
+
+
+@pytest.fixture
+def predictor(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "cache_dir", tmp_path)
+    return TimePredictor()
+
+
+def test_prior_is_used_until_enough_observations(predictor):
+    predictor.observe(100, "balanced", 1, 500)
+
+    assert predictor.predict(100, "balanced") == pytest.approx(100 * predictor.prior_factor)
+    assert predictor.predict(100, "balanced", load=2) == pytest.approx(
+        200 * predictor.prior_factor
+    )
+    assert predictor.predict(None, "balanced") == pytest.approx(
+        predictor.default_duration * predictor.prior_factor
+    )
+
+
+def test_learns_time_per_audio_second_and_load(predictor):
+    for duration in (60, 120, 180, 240, 300):
+        predictor.observe(duration, "balanced", 1, 5 + 0.5 * duration)
+        predictor.observe(duration, "balanced", 2, 5 + 0.8 * duration)
+
+    assert predictor.predict(200, "balanced") == pytest.approx(105, rel=0.02)
+    assert predictor.predict(200, "balanced", load=2) == pytest.approx(165, rel=0.02)
+    # Other profiles keep their own model
+    assert predictor.predict(200, "best") == pytest.approx(200 * predictor.prior_factor)
+
+
+def test_recent_jobs_outweigh_old_ones(predictor):
+    for _ in range(50):
+        predictor.observe(100, "balanced", 1, 100)
+    for _ in range(50):
+        predictor.observe(100, "balanced", 1, 50)
+
+    assert predictor.predict(100, "balanced") < 75
+
+
+def test_observations_are_shared_through_the_state_file(predictor):
+    other = TimePredictor()
+    for duration in (60, 120, 180):
+        other.observe(duration, "fast", 1, 0.25 * duration)
+
+    assert predictor.predict(200, "fast") == pytest.approx(50, rel=0.05)
+    assert predictor.get_stats() == {"fast": {"observations": 3}}
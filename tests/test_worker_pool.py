@@ -0,0 +1,43 @@
+"""Tests for the separation worker pool."""
+import multiprocessing
+
+import pytest
+
+from app.services.cancellation import cancellation
+from app.services.thread_budget import thread_budget
+from app.services.worker_pool import _run_counted
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    monkeypatch.setattr(thread_budget, "_active", None)
+    return thread_budget.create_counter(multiprocessing.get_context("spawn"))
+
+
+def test_task_counts_as_running_only_while_it_runs(counter):
+    def task():
+        return thread_budget.active
+
+    assert _run_counted(task) == 1
+    assert thread_budget.active == 0
+
+
+def test_failed_task_is_no_longer_counted(counter):
+    def task():
+        raise RuntimeError("model crashed")
+
+    with pytest.raises(RuntimeError):
+        _run_counted(task)
+    assert thread_budget.active == 0
+
+
+def test_cancellation_reaches_processes_through_the_shared_slots():
+    registry = type(cancellation)()
+    shared = registry.create_array(multiprocessing.get_context("spawn"))
+    worker_view = type(cancellation)()
+    worker_view.attach(shared)
+
+    registry.cancel("job-1")
+
+    assert worker_view.is_cancelled("job-1")
+    assert not worker_view.is_cancelled("job-2")